@@ -0,0 +1,95 @@
+import os, asyncio, weakref
+import httpx
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+
+from agent.cassette import CassetteTransport
+
+# ========== ENV SETUP ==========
+load_dotenv()
+TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+TAVILY_URL = "https://api.tavily.com/search"
+
+# ========== SHARED CLIENT ==========
+# One pooled client per event loop: under uvicorn every request shares the
+# same loop (and its keep-alive connections), under gunicorn each async view
+# runs in its own short-lived loop, which closes its client with
+# `close_client()` before the loop goes away (see app.async_to_sync).
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50)
+        )
+        client = httpx.AsyncClient(transport=CassetteTransport(transport))
+        _clients[loop] = client
+    return client
+
+
+async def close_client():
+    """Closes the running loop's client, if it has one, and its connections."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+# ========== GROQ LLM CALL ==========
+
+async def arun_groq(prompt: str, system_prompt: str, model: str = "llama-3.1-8b-instant",
+                    temperature: float = 0.7, top_p: float = 0.9, max_tokens: int = 2048,
+                    timeout: float = 12) -> str:
+    """Async twin of the per-agent `run_groq` helpers."""
+    if not GROQ_API_KEY:
+        return "[Groq API Error] Missing API Key"
+    try:
+        resp = await get_client().post(
+            GROQ_URL,
+            headers={
+                "Authorization": f"Bearer {GROQ_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": temperature,
+                "top_p": top_p,
+                "max_tokens": max_tokens
+            },
+            timeout=timeout
+        )
+        return resp.json()["choices"][0]["message"]["content"].strip()
+    except Exception as e:
+        return f"[Groq API Error] {str(e)}"
+
+# ========== TAVILY SEARCH ==========
+
+async def atavily_search(query: str, max_chars: int = 300, timeout: float = 10) -> str:
+    """Async twin of the `tavily_search` / `research_via_tavily` tools."""
+    try:
+        resp = await get_client().post(
+            TAVILY_URL,
+            headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
+            json={"query": query, "search_depth": "advanced", "include_answer": True},
+            timeout=timeout
+        )
+        data = resp.json()
+        if data.get("answer"):
+            return data["answer"]
+        elif data.get("results"):
+            texts = []
+            for result in data["results"]:
+                soup = BeautifulSoup(result.get("content", ""), "html.parser")
+                texts.append(soup.get_text(separator=" ", strip=True)[:max_chars])
+            return "\n\n".join(texts[:2])
+        return "No relevant info found."
+    except Exception as e:
+        return f"[Tavily Error] {str(e)}"
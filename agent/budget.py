@@ -1,4 +1,4 @@
-import os, json, requests
+import os, json
 from typing import Literal
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
@@ -6,11 +6,15 @@ from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.tools import tool
 from langgraph.prebuilt import ToolNode
 import markdown
 
+from agent.cassette import http
+from agent.async_client import arun_groq, atavily_search
+from tracing import traced
+from budget_engine import CATEGORIES, parse_line_items
 
 
 # === Load your Groq API key ===
@@ -19,16 +23,7 @@ load_dotenv()
 TAVILY_API_KEY= os.getenv('TAVILY_API_KEY')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
-def summarize_itinerary(itinerary_text: str) -> str:
-    """
-    Summarizes a full travel itinerary into day-wise highlights and purposes.
-    Each day should have a title, core activities, and type of experiences.
-
-    """
-    if not GROQ_API_KEY:
-        return "[Groq API Error] Missing API key."
-
-    system_prompt = (
+SUMMARY_SYSTEM_PROMPT = (
     "You are a travel assistant summarizing a day-wise itinerary for budget planning.\n\n"
     "Given a multi-day travel plan, summarize each day clearly.\n"
     "For each day, output these **seven** fields:\n"
@@ -51,8 +46,18 @@ def summarize_itinerary(itinerary_text: str) -> str:
 )
 
 
+@traced("agent.summarize_itinerary", agent="budget")
+def summarize_itinerary(itinerary_text: str) -> str:
+    """
+    Summarizes a full travel itinerary into day-wise highlights and purposes.
+    Each day should have a title, core activities, and type of experiences.
+
+    """
+    if not GROQ_API_KEY:
+        return "[Groq API Error] Missing API key."
+
     try:
-        resp = requests.post(
+        resp = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -61,7 +66,7 @@ def summarize_itinerary(itinerary_text: str) -> str:
             json={
                 "model": "llama-3.1-8b-instant",
                 "messages": [
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                     {"role": "user", "content": itinerary_text}
                 ],
                 "temperature": 0.5,
@@ -81,6 +86,71 @@ def summarize_itinerary(itinerary_text: str) -> str:
         return f"[Daywise Summary Exception] {str(e)}"
 
 
+@traced("agent.summarize_itinerary", agent="budget")
+async def asummarize_itinerary(itinerary_text: str) -> str:
+    if not GROQ_API_KEY:
+        return "[Groq API Error] Missing API key."
+    return await arun_groq(itinerary_text, SUMMARY_SYSTEM_PROMPT,
+                           temperature=0.5, top_p=0.95, max_tokens=1024, timeout=15)
+
+
+
+ITEMS_SYSTEM_PROMPT = (
+    "You are an expert travel budget planner.\n\n"
+    "From the day-wise itinerary summary and the user's preferences, propose the trip's budget "
+    "as line items. Reply with ONLY a JSON array, no prose. Each element:\n"
+    '{"category": one of ' + " | ".join(CATEGORIES) + ', '
+    '"day": trip day number (0 for whole-trip costs such as flights), '
+    '"description": short text, "quantity": number (nights, meals, tickets...), '
+    '"unit_cost": realistic cost of one unit, "currency": ISO code, '
+    '"per_person": true if the cost applies to each traveller, false if shared by the group}\n\n'
+    "Do NOT compute totals; they are calculated separately."
+)
+
+REVISE_ITEMS_SYSTEM_PROMPT = (
+    "You edit a travel budget given as a JSON array of line items "
+    "(category, day, description, quantity, unit_cost, currency, per_person). "
+    "Apply the user's change and reply with ONLY the complete updated JSON array, no prose. "
+    "Do NOT compute totals."
+)
+
+
+def _items_json(items) -> str:
+    return json.dumps([item.to_dict() for item in items])
+
+
+@traced("agent.propose_budget_items", agent="budget")
+def propose_budget_items(user_preference: str, prompt: str, summary: str = None) -> list:
+    """
+    LLM-proposed budget line items (empty if the model didn't return usable JSON).
+    Pass `summary` when the itinerary summary is already known to skip that call.
+    """
+    summary = summary or summarize_itinerary(prompt)
+    if not summary or summary.startswith("["):
+        return []
+    return parse_line_items(run_groq(f"{user_preference}\n\nItinerary summary:\n{summary}", ITEMS_SYSTEM_PROMPT))
+
+
+@traced("agent.propose_budget_items", agent="budget")
+async def apropose_budget_items(user_preference: str, prompt: str, summary: str = None) -> list:
+    summary = summary or await asummarize_itinerary(prompt)
+    if not summary or summary.startswith("["):
+        return []
+    return parse_line_items(await arun_groq(f"{user_preference}\n\nItinerary summary:\n{summary}", ITEMS_SYSTEM_PROMPT))
+
+
+@traced("agent.revise_budget_items", agent="budget")
+def revise_budget_items(items: list, edit_prompt: str) -> list:
+    """One LLM call applying a free-text edit to existing line items (no re-summarizing)."""
+    return parse_line_items(run_groq(f"Line items:\n{_items_json(items)}\n\nChange: {edit_prompt}",
+                                     REVISE_ITEMS_SYSTEM_PROMPT))
+
+
+@traced("agent.revise_budget_items", agent="budget")
+async def arevise_budget_items(items: list, edit_prompt: str) -> list:
+    return parse_line_items(await arun_groq(f"Line items:\n{_items_json(items)}\n\nChange: {edit_prompt}",
+                                            REVISE_ITEMS_SYSTEM_PROMPT))
+
 
 # ======= Environment Setup ========
 MessagesState = dict  # {"messages": [...]}
@@ -89,11 +159,12 @@ MessagesState = dict  # {"messages": [...]}
 # ================= Tavily Tool =================
 
 @tool
+@traced("tool", tool="tavily_search")
 def tavily_search(query: str) -> str:
     """Search Tavily for travel cost estimates (hotels, food, activities, etc.)."""
     #print(f"[TOOL CALL] tavily_search(query='{query}')")
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.tavily.com/search",
             headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
             json={"query": query, "search_depth": "advanced", "include_answer": True},
@@ -112,11 +183,17 @@ def tavily_search(query: str) -> str:
     except Exception as e:
         return f"[Tavily Error] {str(e)}"
 
+@traced("tool", tool="tavily_search")
+async def _atavily_search(query: str) -> str:
+    return await atavily_search(query, max_chars=300, timeout=10)
+
+tavily_search.coroutine = _atavily_search
+
 # ================= Groq LLM =================
 
 def run_groq(prompt: str, system_prompt: str) -> str:
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -145,13 +222,7 @@ class TavilyBudgetAgent:
         self.memory = MemorySaver()
         self.tool_node = ToolNode(tools=[tavily_search])
 
-    def model_node(self, state: MessagesState) -> MessagesState:
-        messages = state["messages"]
-        user_msg = messages[-1].content if messages else "Plan a travel budget"
-
-        context = "\n".join([msg.content for msg in messages if isinstance(msg, (SystemMessage, HumanMessage))])
-
-        system_prompt = (
+    system_prompt = (
     "You are an expert travel budget planner.\n\n"
     "The user will provide a summarized day-wise itinerary, along with:\n"
     "- Number of travelers\n"
@@ -185,8 +256,22 @@ class TavilyBudgetAgent:
     "Tools Used: List any `tavily_search` queries used"
 )
 
-        prompt = f"{context}\n\nUser Request: {user_msg}"
-        result = run_groq(prompt, system_prompt)
+    def build_prompt(self, messages) -> str:
+        user_msg = messages[-1].content if messages else "Plan a travel budget"
+
+        context = "\n".join([msg.content for msg in messages if isinstance(msg, (SystemMessage, HumanMessage))])
+        return f"{context}\n\nUser Request: {user_msg}"
+
+    @traced("graph.node", agent="budget", node="budget_agent")
+    def model_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        result = run_groq(self.build_prompt(messages), self.system_prompt)
+        return {"messages": messages + [AIMessage(content=result)]}
+
+    @traced("graph.node", agent="budget", node="budget_agent")
+    async def amodel_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        result = await arun_groq(self.build_prompt(messages), self.system_prompt)
         return {"messages": messages + [AIMessage(content=result)]}
 
     def router(self, state: MessagesState) -> Literal["tools", END]:
@@ -197,7 +282,7 @@ class TavilyBudgetAgent:
 
     def __call__(self):
         graph = StateGraph(MessagesState)
-        graph.add_node("budget_agent", self.model_node)
+        graph.add_node("budget_agent", RunnableLambda(self.model_node, afunc=self.amodel_node))
         graph.add_node("tools", self.tool_node)
 
         graph.set_entry_point("budget_agent")
@@ -213,7 +298,7 @@ class TavilyBudgetAgent:
 budget_agent = TavilyBudgetAgent()()
 chat_sessions = {}
 
-def budget_reply(session_id: str, user_message: str) -> str:
+def _start_turn(session_id: str, user_message: str):
     system = SystemMessage(content="You help travelers build budgets based on summarized itineraries using Tavily.")
     user = HumanMessage(content=user_message)
 
@@ -222,9 +307,9 @@ def budget_reply(session_id: str, user_message: str) -> str:
     else:
         chat_sessions[session_id].append(user)
 
-    config = RunnableConfig(configurable={"thread_id": session_id})
-    result = budget_agent.invoke({"messages": chat_sessions[session_id]}, config=config)
+    return chat_sessions[session_id], RunnableConfig(configurable={"thread_id": session_id})
 
+def _finish_turn(session_id: str, result) -> str:
     response_msg = result["messages"][-1]
     chat_sessions[session_id].append(response_msg)
 
@@ -232,9 +317,22 @@ def budget_reply(session_id: str, user_message: str) -> str:
     #print(f"\n✅ Budget Plan:\n{response_msg.content}")
     return response_msg.content
 
+@traced("agent.budget_reply", agent="budget")
+def budget_reply(session_id: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_message)
+    result = budget_agent.invoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
+@traced("agent.budget_reply", agent="budget")
+async def abudget_reply(session_id: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_message)
+    result = await budget_agent.ainvoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
 
-def generate_budget_plan(session_id: str,user_preference,prompt) -> str:
-    text=summarize_itinerary(prompt)
+@traced("agent.generate_budget_plan", agent="budget")
+def generate_budget_plan(session_id: str,user_preference,prompt, summary=None) -> str:
+    text=summary or summarize_itinerary(prompt)
     if not text:
         return "Sorry, I couldn't summarize the itinerary. Please try again with a different prompt."
     print(user_preference)
@@ -244,3 +342,31 @@ def generate_budget_plan(session_id: str,user_preference,prompt) -> str:
         return "Sorry, I couldn't generate a budget plan based on your itinerary. Please try again with a different prompt."
     return markdown.markdown(reply)  # Convert to HTML for rendering
 
+
+@traced("agent.generate_budget_plan", agent="budget")
+async def agenerate_budget_plan(session_id: str, user_preference, prompt, summary=None) -> str:
+    text = summary or await asummarize_itinerary(prompt)
+    if not text:
+        return "Sorry, I couldn't summarize the itinerary. Please try again with a different prompt."
+    user_msg = f'''Create a travel budget plan based on the following itinerary:\n\n{text}\n\n'''
+    reply = await abudget_reply(session_id, user_preference+"\n\n\n"+user_msg)
+    if not reply:
+        return "Sorry, I couldn't generate a budget plan based on your itinerary. Please try again with a different prompt."
+    return markdown.markdown(reply)
+
+
+@traced("agent.refine_budget_plan", agent="budget")
+def refine_budget_plan(session_id: str, prompt: str) -> str:
+    """Refines an existing budget plan; `prompt` carries the current plan plus the user's edit."""
+    reply = budget_reply(session_id, prompt)
+    if not reply:
+        return "Sorry, I couldn't refine the budget plan. Please try again with a different prompt."
+    return markdown.markdown(reply)
+
+
+@traced("agent.refine_budget_plan", agent="budget")
+async def arefine_budget_plan(session_id: str, prompt: str) -> str:
+    reply = await abudget_reply(session_id, prompt)
+    if not reply:
+        return "Sorry, I couldn't refine the budget plan. Please try again with a different prompt."
+    return markdown.markdown(reply)
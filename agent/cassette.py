@@ -0,0 +1,244 @@
+"""
+Record/replay cassettes for the agents' HTTP traffic (Groq, Tavily, RapidAPI).
+
+Every outbound call from the agents goes through `http` (a shared
+requests.Session) or the httpx client in async_client.py; both route through
+the active cassette when one is set:
+
+    AGENT_CASSETTE=cassettes/budget.jsonl AGENT_CASSETTE_MODE=record python ...
+    AGENT_CASSETTE=cassettes/budget.jsonl AGENT_CASSETTE_MODE=replay \
+        AGENT_CASSETTE_LATENCY=0 python ...
+
+or in a benchmark script:
+
+    with use_cassette("cassettes/budget.jsonl", "replay", latency_scale=0.5):
+        generate_budget_plan(...)
+
+A cassette is a JSON-lines file, one exchange per line.  Exchanges are matched
+on method, URL and request body (never headers, so API keys are not stored);
+identical requests replay in the order they were recorded.  Replay sleeps for
+the recorded latency times `latency_scale` (0 = instant).
+
+Both transports also open a tracing span per request (`llm.groq`, with the
+token counts from the response, or `http <host>` for tools), and count Groq
+token usage (usage.py) unless the response is a replay.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+import tracing
+import usage
+
+RECORD = "record"
+REPLAY = "replay"
+GROQ_HOST = "api.groq.com"
+
+
+class CassetteMiss(RuntimeError):
+    """Replay found no recorded exchange for a request."""
+
+
+def _key(method, url, body):
+    if isinstance(body, str):
+        body = body.encode()
+    body = body or b""
+    try:
+        # Canonical JSON so dict ordering doesn't change the key.
+        body = json.dumps(json.loads(body), sort_keys=True).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(b"\n".join([method.upper().encode(), str(url).encode(), body])).hexdigest()
+
+
+class Cassette:
+    def __init__(self, path, mode, latency_scale=1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._exchanges = defaultdict(deque)
+
+        if mode == REPLAY:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self._exchanges[exchange["key"]].append(exchange)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            open(path, "w").close()
+
+    def take(self, method, url, body):
+        """Next recorded exchange for this request (replay mode)."""
+        key = _key(method, url, body)
+        with self._lock:
+            queue = self._exchanges.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded exchange for {method} {url}")
+            # Keep the last one around so extra identical calls still replay.
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def delay(self, exchange):
+        return exchange["elapsed"] * self.latency_scale
+
+    def record(self, method, url, body, status, content_type, content, elapsed):
+        exchange = {
+            "key": _key(method, url, body),
+            "method": method.upper(),
+            "url": str(url),
+            "status": status,
+            "content_type": content_type,
+            "body": content.decode("utf-8", errors="replace"),
+            "elapsed": round(elapsed, 4),
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(exchange) + "\n")
+
+
+def active():
+    return _active
+
+
+@contextmanager
+def use_cassette(path, mode, latency_scale=1.0):
+    global _active
+    previous, _active = _active, Cassette(path, mode, latency_scale)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+def _from_env():
+    path = os.getenv("AGENT_CASSETTE")
+    if not path:
+        return None
+    return Cassette(path, os.getenv("AGENT_CASSETTE_MODE", REPLAY),
+                    float(os.getenv("AGENT_CASSETTE_LATENCY", "1.0")))
+
+
+_active = _from_env()
+
+
+def _span_name(host):
+    return "llm.groq" if host == GROQ_HOST else f"http {host}"
+
+
+def _count_usage(span, data):
+    if _active is None or _active.mode != REPLAY:
+        usage.record(data)
+    if tracing.enabled():
+        tracing.record_llm_usage(span, data)
+
+
+class CassetteAdapter(HTTPAdapter):
+    """requests transport that records to / replays from the active cassette."""
+
+    def send(self, request, **kwargs):
+        host = requests.utils.urlparse(request.url).hostname
+        with tracing.span(_span_name(host), **{"http.method": request.method, "http.host": host}) as span:
+            response = self._send(request, **kwargs)
+            span.set("http.status_code", response.status_code)
+            if _active is not None:
+                span.set("cassette", _active.mode)
+            if host == GROQ_HOST:
+                try:
+                    _count_usage(span, response.json())
+                except ValueError:
+                    pass
+            return response
+
+    def _send(self, request, **kwargs):
+        cassette = _active
+        if cassette is None:
+            return super().send(request, **kwargs)
+
+        if cassette.mode == REPLAY:
+            exchange = cassette.take(request.method, request.url, request.body)
+            time.sleep(cassette.delay(exchange))
+            response = requests.Response()
+            response.status_code = exchange["status"]
+            response.headers["Content-Type"] = exchange["content_type"]
+            response._content = exchange["body"].encode("utf-8")
+            response.encoding = "utf-8"
+            response.url = request.url
+            response.request = request
+            return response
+
+        started = time.perf_counter()
+        response = super().send(request, **kwargs)
+        cassette.record(request.method, request.url, request.body, response.status_code,
+                        response.headers.get("Content-Type", ""), response.content,
+                        time.perf_counter() - started)
+        return response
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """httpx transport counterpart of CassetteAdapter."""
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        host = request.url.host
+        with tracing.span(_span_name(host), **{"http.method": request.method, "http.host": host}) as span:
+            response = await self._handle(request)
+            span.set("http.status_code", response.status_code)
+            if _active is not None:
+                span.set("cassette", _active.mode)
+            if host == GROQ_HOST:
+                await response.aread()
+                try:
+                    _count_usage(span, response.json())
+                except ValueError:
+                    pass
+            return response
+
+    async def _handle(self, request):
+        cassette = _active
+        if cassette is None:
+            return await self.transport.handle_async_request(request)
+
+        body = await request.aread()
+        if cassette.mode == REPLAY:
+            exchange = cassette.take(request.method, request.url, body)
+            await asyncio.sleep(cassette.delay(exchange))
+            return httpx.Response(
+                exchange["status"],
+                headers={"Content-Type": exchange["content_type"]},
+                content=exchange["body"].encode("utf-8"),
+                request=request,
+            )
+
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        cassette.record(request.method, request.url, body, response.status_code,
+                        response.headers.get("Content-Type", ""), content,
+                        time.perf_counter() - started)
+        # aread() already decoded the body, so drop the transfer-level headers.
+        headers = [(k, v) for k, v in response.headers.items()
+                   if k.lower() not in ("content-encoding", "content-length", "transfer-encoding")]
+        return httpx.Response(response.status_code, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# Shared session for the agents' blocking calls: keep-alive pooling, plus the
+# cassette hook.
+http = requests.Session()
+http.mount("https://", CassetteAdapter(pool_maxsize=20))
+http.mount("http://", CassetteAdapter(pool_maxsize=20))
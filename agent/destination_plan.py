@@ -1,4 +1,4 @@
-import os, requests, markdown
+import os, markdown
 from typing import Literal
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
@@ -7,9 +7,13 @@ from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.tools import tool
 
+from agent.cassette import http
+from agent.async_client import arun_groq, atavily_search
+from tracing import traced
+
 # ========== ENV SETUP ==========
 load_dotenv()
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
@@ -20,10 +24,11 @@ MessagesState = dict  # {"messages": [...]}
 # ========== TAVILY TOOL ==========
 
 @tool
+@traced("tool", tool="research_via_tavily")
 def research_via_tavily(query: str) -> str:
     """Use Tavily to search live travel information about a destination."""
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.tavily.com/search",
             headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
             json={"query": query, "search_depth": "advanced", "include_answer": True},
@@ -42,11 +47,17 @@ def research_via_tavily(query: str) -> str:
     except Exception as e:
         return f"[Tavily Search Error] {str(e)}"
 
+@traced("tool", tool="research_via_tavily")
+async def _aresearch_via_tavily(query: str) -> str:
+    return await atavily_search(query, max_chars=300, timeout=10)
+
+research_via_tavily.coroutine = _aresearch_via_tavily
+
 # ========== GROQ LLM CALL ==========
 
 def run_groq(prompt: str, system_prompt: str) -> str:
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -68,8 +79,7 @@ def run_groq(prompt: str, system_prompt: str) -> str:
     except Exception as e:
         return f"[Groq API Error] {str(e)}"
 
-def run_research_llm(user_prompt: str, context: str = "") -> str:
-    system_prompt = (
+RESEARCH_SYSTEM_PROMPT = (
     "You are a helpful assistant in the Travy travel app.\n"
     "Users ask about things to do based on how much time they have or interest in a specific activity.\n\n"
     "Your responsibilities:\n"
@@ -84,7 +94,11 @@ def run_research_llm(user_prompt: str, context: str = "") -> str:
 
 )
 
-    return run_groq(user_prompt, system_prompt)
+def run_research_llm(user_prompt: str, context: str = "") -> str:
+    return run_groq(user_prompt, RESEARCH_SYSTEM_PROMPT)
+
+async def arun_research_llm(user_prompt: str, context: str = "") -> str:
+    return await arun_groq(user_prompt, RESEARCH_SYSTEM_PROMPT, max_tokens=512)
 
 # ========== AGENT DEFINITION ==========
 
@@ -93,6 +107,7 @@ class DestinationResearchAgent:
         self.memory = MemorySaver()
         self.tool_node = ToolNode(tools=[research_via_tavily])
 
+    @traced("graph.node", agent="research", node="research_agent")
     def model_node(self, state: MessagesState) -> MessagesState:
         messages = state["messages"]
         user_msg = messages[-1].content if messages else "Tell me about a travel destination"
@@ -101,6 +116,15 @@ class DestinationResearchAgent:
         result = run_research_llm(user_msg, context)
         return {"messages": messages + [AIMessage(content=result)]}
 
+    @traced("graph.node", agent="research", node="research_agent")
+    async def amodel_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        user_msg = messages[-1].content if messages else "Tell me about a travel destination"
+
+        context = "\n".join([msg.content for msg in messages if isinstance(msg, (SystemMessage, HumanMessage))])
+        result = await arun_research_llm(user_msg, context)
+        return {"messages": messages + [AIMessage(content=result)]}
+
     def router(self, state: MessagesState) -> Literal["tools", END]:
         last = state["messages"][-1]
         if hasattr(last, "tool_calls") and last.tool_calls:
@@ -109,7 +133,7 @@ class DestinationResearchAgent:
 
     def __call__(self):
         graph = StateGraph(MessagesState)
-        graph.add_node("research_agent", self.model_node)
+        graph.add_node("research_agent", RunnableLambda(self.model_node, afunc=self.amodel_node))
         graph.add_node("tools", self.tool_node)
 
         graph.set_entry_point("research_agent")
@@ -126,7 +150,7 @@ app= DestinationResearchAgent()()
 
 chat_sessions = {}
 
-def research_reply(session_id: str,user_query:str,user_message: str) -> str:
+def _start_turn(session_id: str, user_query: str, user_message: str):
     system = SystemMessage(content="You help travelers research destinations with facts and structure.")
     user_info = HumanMessage(content=user_query)
     user = HumanMessage(content=user_message)
@@ -136,10 +160,22 @@ def research_reply(session_id: str,user_query:str,user_message: str) -> str:
     else:
         chat_sessions[session_id].append([user, user_info])
 
-    config = RunnableConfig(configurable={"thread_id": session_id})
-    result = app.invoke({"messages": chat_sessions[session_id]}, config=config)
+    return chat_sessions[session_id], RunnableConfig(configurable={"thread_id": session_id})
 
+def _finish_turn(session_id: str, result) -> str:
     response_msg = result["messages"][-1]
     chat_sessions[session_id].append(response_msg)
 
-    return markdown.markdown(response_msg.content)  # For frontend HTML rendering
\ No newline at end of file
+    return markdown.markdown(response_msg.content)  # For frontend HTML rendering
+
+@traced("agent.research_reply", agent="research")
+def research_reply(session_id: str,user_query:str,user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_query, user_message)
+    result = app.invoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
+@traced("agent.research_reply", agent="research")
+async def aresearch_reply(session_id: str, user_query: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_query, user_message)
+    result = await app.ainvoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
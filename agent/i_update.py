@@ -1,12 +1,35 @@
 import os
-import requests
 from dotenv import load_dotenv
 
+from agent.cassette import http
+from agent.async_client import arun_groq
+from tracing import traced
+from route_optimizer import optimize_itinerary
+
 load_dotenv()
 
 TAVILY_API_KEY= os.getenv('TAVILY_API_KEY')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
+REFINE_SYSTEM_PROMPT = (
+    "You are a travel itinerary assistant that restructures existing trip plans.\n"
+    "If the user says a day is completed, do NOT regenerate that day's plan.\n"
+    "If the user asks to move a location (e.g., Johari Bazaar) to another day, do so logically.\n"
+    "If user asks to extend the trip, add more days as needed with suitable attractions.\n"
+    "Ensure timing and activity count are realistic. Avoid repeating places.\n"
+    "Output ONLY the updated part of the itinerary, starting from the next uncompleted day."
+)
+
+
+def _build_user_prompt(current_plan: str, update_prompt: str) -> str:
+    return (
+        f"Current Itinerary:\n{current_plan.strip()}\n\n"
+        f"User Instruction:\n{update_prompt.strip()}\n\n"
+        f"Give updated itinerary from the next uncompleted day onward."
+    )
+
+
+@traced("agent.refine_itinerary", agent="itinerary")
 def refine_itinerary(current_plan: str, update_prompt: str) -> str:
     """
     Restructures or updates the current itinerary using LLaMA 3.1 (Groq).
@@ -21,23 +44,10 @@ def refine_itinerary(current_plan: str, update_prompt: str) -> str:
     if not GROQ_API_KEY:
         return "[Groq API Error] Missing API key."
 
-    system_prompt = (
-        "You are a travel itinerary assistant that restructures existing trip plans.\n"
-        "If the user says a day is completed, do NOT regenerate that day's plan.\n"
-        "If the user asks to move a location (e.g., Johari Bazaar) to another day, do so logically.\n"
-        "If user asks to extend the trip, add more days as needed with suitable attractions.\n"
-        "Ensure timing and activity count are realistic. Avoid repeating places.\n"
-        "Output ONLY the updated part of the itinerary, starting from the next uncompleted day."
-    )
-
-    user_prompt = (
-        f"Current Itinerary:\n{current_plan.strip()}\n\n"
-        f"User Instruction:\n{update_prompt.strip()}\n\n"
-        f"Give updated itinerary from the next uncompleted day onward."
-    )
+    user_prompt = _build_user_prompt(current_plan, update_prompt)
 
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -46,7 +56,7 @@ def refine_itinerary(current_plan: str, update_prompt: str) -> str:
             json={
                 "model": "llama-3.1-8b-instant",
                 "messages": [
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": REFINE_SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
                 ],
                 "temperature": 0.5,
@@ -55,7 +65,18 @@ def refine_itinerary(current_plan: str, update_prompt: str) -> str:
             },
             timeout=15
         )
-        return response.json()["choices"][0]["message"]["content"].strip()
+        return optimize_itinerary(response.json()["choices"][0]["message"]["content"].strip())
 
     except Exception as e:
         return f"[Groq API Error] {str(e)}"
+
+
+@traced("agent.refine_itinerary", agent="itinerary")
+async def arefine_itinerary(current_plan: str, update_prompt: str) -> str:
+    """Async variant of `refine_itinerary` for the ASGI serving path."""
+    if not GROQ_API_KEY:
+        return "[Groq API Error] Missing API key."
+
+    reply = await arun_groq(_build_user_prompt(current_plan, update_prompt), REFINE_SYSTEM_PROMPT,
+                            temperature=0.5, top_p=0.95, max_tokens=1024, timeout=15)
+    return optimize_itinerary(reply)
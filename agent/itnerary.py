@@ -1,4 +1,4 @@
-import os, json, requests
+import os, json
 from typing import Literal
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
@@ -6,11 +6,16 @@ from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.tools import tool
 from langgraph.prebuilt import ToolNode
 import markdown
 
+from agent.cassette import http
+from agent.async_client import arun_groq, atavily_search
+from tracing import traced
+from route_optimizer import optimize_itinerary
+
 
 # === Load Environment Variables ===
 load_dotenv()
@@ -24,11 +29,12 @@ MessagesState = dict  # {"messages": [...]}
 # ===================== TOOLS =====================
 
 @tool
+@traced("tool", tool="tavily_search")
 def tavily_search(query: str) -> str:
     """Search the web using Tavily and return the top result or brief answer."""
     print(f"[TOOL CALL] tavily_search(query='{query}')")
     try:
-        resp = requests.post(
+        resp = http.post(
             "https://api.tavily.com/search",
             headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
             json={"query": query, "search_depth": "advanced", "include_answer": True},
@@ -49,7 +55,14 @@ def tavily_search(query: str) -> str:
     except Exception as e:
         return f"[Tavily Error] {str(e)}"
 
+@traced("tool", tool="tavily_search")
+async def _atavily_search(query: str) -> str:
+    return await atavily_search(query, max_chars=400, timeout=8)
+
+tavily_search.coroutine = _atavily_search
+
 @tool
+@traced("tool", tool="tripadvisor_restaurants")
 def tripadvisor_restaurants(query: str) -> str:
     """Fetch top restaurants from TripAdvisor using location query."""
     print(f"[TOOL CALL] tripadvisor_restaurants(query='{query}')")
@@ -60,7 +73,7 @@ def tripadvisor_restaurants(query: str) -> str:
             "x-rapidapi-host": "tripadvisor-scraper.p.rapidapi.com"
         }
         params = {"query": query}
-        resp = requests.get(url, headers=headers, params=params, timeout=10)
+        resp = http.get(url, headers=headers, params=params, timeout=10)
         data = resp.json()
         if data and "data" in data:
             names = [r["name"] for r in data["data"][:5]]
@@ -70,6 +83,7 @@ def tripadvisor_restaurants(query: str) -> str:
         return f"[TripAdvisor Error] {str(e)}"
 
 @tool
+@traced("tool", tool="travel_guide_places")
 def travel_guide_places(region: str, interests: list) -> str:
     """Get top places based on region and interests using Travel Guide API."""
     print(f"[TOOL CALL] travel_guide_places(region='{region}', interests={interests})")
@@ -85,7 +99,7 @@ def travel_guide_places(region: str, interests: list) -> str:
             "language": "en",
             "interests": interests
         }
-        resp = requests.post(url, json=payload, headers=headers, params={"noqueue": "1"}, timeout=12)
+        resp = http.post(url, json=payload, headers=headers, params={"noqueue": "1"}, timeout=12)
         data = resp.json()
         if data and isinstance(data, list):
             names = [place.get("name", "Unknown") for place in data[:5]]
@@ -100,7 +114,7 @@ def run_groq(prompt: str, system_prompt: str = "You are helpful.") -> str:
     if not GROQ_API_KEY:
         return "[Groq API Error] Missing API Key"
     try:
-        resp = requests.post(
+        resp = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -133,25 +147,33 @@ class ItineraryPlannerAgent:
             travel_guide_places
         ])
 
-    def model_node(self, state: MessagesState) -> MessagesState:
-        messages = state["messages"]
+    system_prompt = (
+        "You are a travel itinerary planner. "
+        "Based on the user's input (destination, duration, interests), create a personalized plan. "
+        "Structure the itinerary day-wise and include local attractions, food recommendations, and free time. "
+        "Use tools like `tripadvisor_restaurants`, `travel_guide_places`, and `tavily_search` for accuracy. "
+        "Ensure that each day's attractions are **distance-wise feasible** — group nearby places together to avoid long travel between spots. "
+        "List each day's stops as separate bullet points; their order within the day is optimized for distance afterwards. "
+        "Also, **consider the user's arrival or landing time** to plan Day 1 realistically — avoid cramming full-day activities if they arrive late."
+        "Try to complete the answer in 2048 token length"
+    )
+
+    def build_prompt(self, messages) -> str:
         user_msg = messages[-1].content if messages else "Plan an itinerary"
 
         context = "\n".join([msg.content for msg in messages if isinstance(msg, (SystemMessage, HumanMessage))])
+        return f"{context}\n\nUser Request: {user_msg}"
 
-        system_prompt = (
-            "You are a travel itinerary planner. "
-            "Based on the user's input (destination, duration, interests), create a personalized plan. "
-            "Structure the itinerary day-wise and include local attractions, food recommendations, and free time. "
-            "Use tools like `tripadvisor_restaurants`, `travel_guide_places`, and `tavily_search` for accuracy. "
-            "Ensure that each day's attractions are **distance-wise feasible** — group nearby places together to avoid long travel between spots. "
-            "Also, **consider the user's arrival or landing time** to plan Day 1 realistically — avoid cramming full-day activities if they arrive late."
-            "Try to complete the answer in 2048 token length"
-        )
-
+    @traced("graph.node", agent="itinerary", node="itinerary_agent")
+    def model_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        reply = run_groq(self.build_prompt(messages), self.system_prompt)
+        return {"messages": messages + [AIMessage(content=reply)]}
 
-        prompt = f"{context}\n\nUser Request: {user_msg}"
-        reply = run_groq(prompt, system_prompt)
+    @traced("graph.node", agent="itinerary", node="itinerary_agent")
+    async def amodel_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        reply = await arun_groq(self.build_prompt(messages), self.system_prompt, model="gemma2-9b-it")
         return {"messages": messages + [AIMessage(content=reply)]}
 
     def router(self, state: MessagesState) -> Literal["tools", END]:
@@ -162,7 +184,7 @@ class ItineraryPlannerAgent:
 
     def __call__(self):
         graph = StateGraph(MessagesState)
-        graph.add_node("itinerary_agent", self.model_node)
+        graph.add_node("itinerary_agent", RunnableLambda(self.model_node, afunc=self.amodel_node))
         graph.add_node("tools", self.tool_node)
 
         graph.set_entry_point("itinerary_agent")
@@ -178,7 +200,7 @@ class ItineraryPlannerAgent:
 itinerary_app = ItineraryPlannerAgent()()
 chat_sessions = {}
 
-def itinerary_reply(session_id: str, user_message: str) -> str:
+def _start_turn(session_id: str, user_message: str):
     system = SystemMessage(content="You help plan amazing travel itineraries with local insights and dining.")
     user = HumanMessage(content=user_message)
 
@@ -187,9 +209,9 @@ def itinerary_reply(session_id: str, user_message: str) -> str:
     else:
         chat_sessions[session_id].append(user)
 
-    config = RunnableConfig(configurable={"thread_id": session_id})
-    result = itinerary_app.invoke({"messages": chat_sessions[session_id]}, config=config)
+    return chat_sessions[session_id], RunnableConfig(configurable={"thread_id": session_id})
 
+def _finish_turn(session_id: str, result) -> str:
     response_msg = result["messages"][-1]
     chat_sessions[session_id].append(response_msg)
 
@@ -197,13 +219,32 @@ def itinerary_reply(session_id: str, user_message: str) -> str:
     print(f"✅ Response:\n{response_msg.content}")
     return response_msg.content
 
+@traced("agent.itinerary_reply", agent="itinerary")
+def itinerary_reply(session_id: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_message)
+    result = itinerary_app.invoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
+@traced("agent.itinerary_reply", agent="itinerary")
+async def aitinerary_reply(session_id: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_message)
+    result = await itinerary_app.ainvoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
 # ===================== TEST RUN =====================
 
+@traced("agent.generate_itinerary_from_prompt", agent="itinerary")
 def generate_itinerary_from_prompt(session_id,prompt):
     reply= itinerary_reply(session_id, prompt)
     if not reply:
         return "Sorry, I couldn't generate an itinerary based on your request. Please try again with a different prompt."
     
-    return markdown.markdown(reply) 
-    
+    return markdown.markdown(optimize_itinerary(reply))
+
+@traced("agent.generate_itinerary_from_prompt", agent="itinerary")
+async def agenerate_itinerary_from_prompt(session_id, prompt):
+    reply = await aitinerary_reply(session_id, prompt)
+    if not reply:
+        return "Sorry, I couldn't generate an itinerary based on your request. Please try again with a different prompt."
 
+    return markdown.markdown(optimize_itinerary(reply))
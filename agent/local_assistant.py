@@ -1,4 +1,4 @@
-import os, requests, markdown
+import os, markdown
 from typing import Literal
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
@@ -7,9 +7,13 @@ from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import ToolNode
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_core.tools import tool
 
+from agent.cassette import http
+from agent.async_client import arun_groq, atavily_search
+from tracing import traced
+
 # ========== ENV SETUP ==========
 load_dotenv()
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
@@ -20,10 +24,11 @@ MessagesState = dict  # {"messages": [...]}
 # ========== TAVILY TOOL ==========
 
 @tool
+@traced("tool", tool="research_via_tavily")
 def research_via_tavily(query: str) -> str:
     """Use Tavily to search live travel information about a destination."""
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.tavily.com/search",
             headers={"Authorization": f"Bearer {TAVILY_API_KEY}"},
             json={"query": query, "search_depth": "advanced", "include_answer": True},
@@ -42,12 +47,18 @@ def research_via_tavily(query: str) -> str:
     except Exception as e:
         return f"[Tavily Search Error] {str(e)}"
 
+@traced("tool", tool="research_via_tavily")
+async def _aresearch_via_tavily(query: str) -> str:
+    return await atavily_search(query, max_chars=300, timeout=10)
+
+research_via_tavily.coroutine = _aresearch_via_tavily
+
 # ========== GROQ LLM CALL ==========
 
 def run_groq(prompt: str, system_prompt: str) -> str:
     print(f"[GROQ CALL] run_groq(prompt='{prompt[:50]}...')")
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -70,8 +81,7 @@ def run_groq(prompt: str, system_prompt: str) -> str:
         return f"[Groq API Error] {str(e)}"
 
 # ========== GROQ LLM CALL FOR GOVERNANCE ==========
-def run_governance_llm(user_prompt: str, context: str = "") -> str:
-    system_prompt = (
+GOVERNANCE_SYSTEM_PROMPT = (
     "You are a travel assistant specialized in local governance, fair pricing, regulations, and helping travelers navigate local conditions.\n\n"
     "You help users with:\n"
     "- Local prices (fair shopping rates, food, transport, etc.)\n"
@@ -90,7 +100,11 @@ def run_governance_llm(user_prompt: str, context: str = "") -> str:
     "- If info isn't found, reply: 'Local information is not available.'\n"
 )
 
-    return run_groq(user_prompt, system_prompt)
+def run_governance_llm(user_prompt: str, context: str = "") -> str:
+    return run_groq(user_prompt, GOVERNANCE_SYSTEM_PROMPT)
+
+async def arun_governance_llm(user_prompt: str, context: str = "") -> str:
+    return await arun_groq(user_prompt, GOVERNANCE_SYSTEM_PROMPT, max_tokens=512)
 
 
 # ========== AGENT DEFINITION ==========
@@ -99,6 +113,7 @@ class GovernanceInfoAgent:
         self.memory = MemorySaver()
         self.tool_node = ToolNode(tools=[research_via_tavily])
 
+    @traced("graph.node", agent="governance", node="governance_agent")
     def model_node(self, state: MessagesState) -> MessagesState:
         messages = state["messages"]
         user_msg = messages[-1].content if messages else "What are the local rules?"
@@ -107,6 +122,15 @@ class GovernanceInfoAgent:
         result = run_governance_llm(user_msg, context)
         return {"messages": messages + [AIMessage(content=result)]}
 
+    @traced("graph.node", agent="governance", node="governance_agent")
+    async def amodel_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        user_msg = messages[-1].content if messages else "What are the local rules?"
+
+        context = "\n".join([msg.content for msg in messages if isinstance(msg, (SystemMessage, HumanMessage))])
+        result = await arun_governance_llm(user_msg, context)
+        return {"messages": messages + [AIMessage(content=result)]}
+
     def router(self, state: MessagesState) -> Literal["tools", END]:
         last = state["messages"][-1]
         if hasattr(last, "tool_calls") and last.tool_calls:
@@ -115,7 +139,7 @@ class GovernanceInfoAgent:
 
     def __call__(self):
         graph = StateGraph(MessagesState)
-        graph.add_node("governance_agent", self.model_node)
+        graph.add_node("governance_agent", RunnableLambda(self.model_node, afunc=self.amodel_node))
         graph.add_node("tools", self.tool_node)
 
         graph.set_entry_point("governance_agent")
@@ -133,7 +157,7 @@ gov_app = GovernanceInfoAgent()()
 
 gov_chat_sessions = {}
 
-def governance_reply(session_id: str,user_detail:str, user_message: str) -> str:
+def _start_turn(session_id: str, user_detail: str, user_message: str):
     system = SystemMessage(content="You assist travelers with local laws, rules, pricing, and basic language help.")
     user_info= HumanMessage(content=user_detail)
     user = HumanMessage(content=user_message)
@@ -143,10 +167,22 @@ def governance_reply(session_id: str,user_detail:str, user_message: str) -> str:
     else:
         gov_chat_sessions[session_id].append([user, user_info])
 
-    config = RunnableConfig(configurable={"thread_id": session_id})
-    result = gov_app.invoke({"messages": gov_chat_sessions[session_id]}, config=config)
+    return gov_chat_sessions[session_id], RunnableConfig(configurable={"thread_id": session_id})
 
+def _finish_turn(session_id: str, result) -> str:
     response_msg = result["messages"][-1]
     gov_chat_sessions[session_id].append(response_msg)
 
     return markdown.markdown(response_msg.content)  # For frontend HTML rendering
+
+@traced("agent.governance_reply", agent="governance")
+def governance_reply(session_id: str,user_detail:str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_detail, user_message)
+    result = gov_app.invoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
+@traced("agent.governance_reply", agent="governance")
+async def agovernance_reply(session_id: str, user_detail: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_detail, user_message)
+    result = await gov_app.ainvoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
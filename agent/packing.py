@@ -1,25 +1,20 @@
-import requests
 import os
 import json
 import markdown
 from dotenv import load_dotenv
 
+from agent.cassette import http
+from agent.async_client import arun_groq
+from tracing import traced
+import packing_rules
+
 # === Load your Groq API key ===
 load_dotenv()
 
 TAVILY_API_KEY= os.getenv('TAVILY_API_KEY')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
-def summarize_itinerary(itinerary_text: str) -> str:
-    """
-    Summarizes a full travel itinerary into day-wise highlights and purposes.
-    Each day should have a title, core activities, and type of experiences.
-
-    """
-    if not GROQ_API_KEY:
-        return "[Groq API Error] Missing API key."
-
-    system_prompt = (
+SUMMARY_SYSTEM_PROMPT = (
     "You are a travel assistant summarizing a day-wise itinerary for budget planning.\n\n"
     "Given a multi-day travel plan, summarize each day clearly.\n"
     "For each day, output these **seven** fields:\n"
@@ -42,8 +37,18 @@ def summarize_itinerary(itinerary_text: str) -> str:
 )
 
 
+@traced("agent.summarize_itinerary", agent="packing")
+def summarize_itinerary(itinerary_text: str) -> str:
+    """
+    Summarizes a full travel itinerary into day-wise highlights and purposes.
+    Each day should have a title, core activities, and type of experiences.
+
+    """
+    if not GROQ_API_KEY:
+        return "[Groq API Error] Missing API key."
+
     try:
-        resp = requests.post(
+        resp = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -52,7 +57,7 @@ def summarize_itinerary(itinerary_text: str) -> str:
             json={
                 "model": "llama-3.1-8b-instant",
                 "messages": [
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                     {"role": "user", "content": itinerary_text}
                 ],
                 "temperature": 0.5,
@@ -71,14 +76,22 @@ def summarize_itinerary(itinerary_text: str) -> str:
     except Exception as e:
         return f"[Daywise Summary Exception] {str(e)}"
 
-import os, requests
+
+@traced("agent.summarize_itinerary", agent="packing")
+async def asummarize_itinerary(itinerary_text: str) -> str:
+    if not GROQ_API_KEY:
+        return "[Groq API Error] Missing API key."
+    return await arun_groq(itinerary_text, SUMMARY_SYSTEM_PROMPT,
+                           temperature=0.5, top_p=0.95, max_tokens=1024, timeout=15)
+
+import os
 from typing import Literal
 from dotenv import load_dotenv
 
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.prebuilt import ToolNode
 
 # ======= Environment Setup ========
@@ -86,9 +99,9 @@ MessagesState = dict  # {"messages": [...]}
 
 
 # ======= Groq LLM Call Function ========
-def run_groq(prompt: str, system_prompt: str) -> str:
+def run_groq(prompt: str, system_prompt: str, max_tokens: int = 2048) -> str:
     try:
-        response = requests.post(
+        response = http.post(
             "https://api.groq.com/openai/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {GROQ_API_KEY}",
@@ -102,7 +115,7 @@ def run_groq(prompt: str, system_prompt: str) -> str:
                 ],
                 "temperature": 0.7,
                 "top_p": 0.9,
-                "max_tokens": 2048
+                "max_tokens": max_tokens
             },
             timeout=12
         )
@@ -115,29 +128,37 @@ class PackingListAgent:
     def __init__(self):
         self.memory = MemorySaver()
 
-    def model_node(self, state: MessagesState) -> MessagesState:
-        messages = state["messages"]
+    system_prompt = (
+        "You are a smart travel assistant that generates personalized packing lists based on a travel itinerary.\n\n"
+        "The user will provide a summarized day-wise itinerary, number of travelers, destination type, and duration.\n\n"
+        "Generate a categorized packing list including (but not limited to):\n"
+        "- Clothing (based on weather, culture, activities)\n"
+        "- Toiletries\n"
+        "- Travel Essentials (documents, ID, cash, tickets)\n"
+        "- Electronics (chargers, power banks, adapters)\n"
+        "- Activity-specific items (hiking gear, swimwear, etc.)\n"
+        "- Emergency/Health items\n\n"
+        "Only include reasonable items for the trip duration and preferences.\n"
+        "Group similar items under clear headers. Avoid repeating common sense items unless important.\n"
+        "Avoid emojis. Keep formatting clear and minimal."
+    )
+
+    def build_prompt(self, messages) -> str:
         user_msg = messages[-1].content if messages else "Create a packing list."
 
         context = "\n".join([msg.content for msg in messages if isinstance(msg, (SystemMessage, HumanMessage))])
+        return f"{context}\n\nUser Request: {user_msg}"
 
-        system_prompt = (
-            "You are a smart travel assistant that generates personalized packing lists based on a travel itinerary.\n\n"
-            "The user will provide a summarized day-wise itinerary, number of travelers, destination type, and duration.\n\n"
-            "Generate a categorized packing list including (but not limited to):\n"
-            "- Clothing (based on weather, culture, activities)\n"
-            "- Toiletries\n"
-            "- Travel Essentials (documents, ID, cash, tickets)\n"
-            "- Electronics (chargers, power banks, adapters)\n"
-            "- Activity-specific items (hiking gear, swimwear, etc.)\n"
-            "- Emergency/Health items\n\n"
-            "Only include reasonable items for the trip duration and preferences.\n"
-            "Group similar items under clear headers. Avoid repeating common sense items unless important.\n"
-            "Avoid emojis. Keep formatting clear and minimal."
-        )
+    @traced("graph.node", agent="packing", node="packing_agent")
+    def model_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        result = run_groq(self.build_prompt(messages), self.system_prompt)
+        return {"messages": messages + [AIMessage(content=result)]}
 
-        prompt = f"{context}\n\nUser Request: {user_msg}"
-        result = run_groq(prompt, system_prompt)
+    @traced("graph.node", agent="packing", node="packing_agent")
+    async def amodel_node(self, state: MessagesState) -> MessagesState:
+        messages = state["messages"]
+        result = await arun_groq(self.build_prompt(messages), self.system_prompt)
         return {"messages": messages + [AIMessage(content=result)]}
 
     def router(self, state: MessagesState) -> Literal[END]:
@@ -145,7 +166,7 @@ class PackingListAgent:
 
     def __call__(self):
         graph = StateGraph(MessagesState)
-        graph.add_node("packing_agent", self.model_node)
+        graph.add_node("packing_agent", RunnableLambda(self.model_node, afunc=self.amodel_node))
         graph.set_entry_point("packing_agent")
         graph.add_edge("packing_agent", END)
         return graph.compile(checkpointer=self.memory)
@@ -154,7 +175,7 @@ class PackingListAgent:
 packing_agent = PackingListAgent()()
 chat_sessions = {}
 
-def packing_reply(session_id: str, user_message: str) -> str:
+def _start_turn(session_id: str, user_message: str):
     system = SystemMessage(content="You generate travel packing lists from summarized itineraries.")
     user = HumanMessage(content=user_message)
 
@@ -163,15 +184,102 @@ def packing_reply(session_id: str, user_message: str) -> str:
     else:
         chat_sessions[session_id].append(user)
 
-    config = RunnableConfig(configurable={"thread_id": session_id})
-    result = packing_agent.invoke({"messages": chat_sessions[session_id]}, config=config)
+    return chat_sessions[session_id], RunnableConfig(configurable={"thread_id": session_id})
 
+def _finish_turn(session_id: str, result) -> str:
     response_msg = result["messages"][-1]
     chat_sessions[session_id].append(response_msg)
 
     print(f"\n🧠 Context: {[m.content for m in chat_sessions[session_id]]}")
     return response_msg.content
 
+@traced("agent.packing_reply", agent="packing")
+def packing_reply(session_id: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_message)
+    result = packing_agent.invoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
+@traced("agent.packing_reply", agent="packing")
+async def apacking_reply(session_id: str, user_message: str) -> str:
+    messages, config = _start_turn(session_id, user_message)
+    result = await packing_agent.ainvoke({"messages": messages}, config=config)
+    return _finish_turn(session_id, result)
+
+EXTRAS_SYSTEM_PROMPT = (
+    "You suggest packing items specific to a travel destination.\n"
+    "A generic packing list (clothes, toiletries, documents, chargers, medicines) already exists. "
+    "Reply with ONLY a JSON array of at most 8 short item names that a traveller to this destination "
+    "would otherwise forget: plug adapters, permits, local customs, altitude, regional weather. "
+    "No explanations, no items from the generic list."
+)
+
+# (destination, season) -> extras; the same answer serves every pod going there.
+_extras_cache = {}
+EXTRAS_CACHE_SIZE = 512
+
+
+def _extras_prompt(facts: packing_rules.TripFacts) -> str:
+    activities = ", ".join(sorted(facts.activities)) or "sightseeing"
+    return f"Destination: {facts.destination}\nSeason: {facts.season or 'unknown'}\nActivities: {activities}"
+
+
+def _cache_extras(key, extras):
+    if len(_extras_cache) >= EXTRAS_CACHE_SIZE:
+        _extras_cache.pop(next(iter(_extras_cache)))
+    _extras_cache[key] = extras
+    return extras
+
+
+@traced("agent.destination_extras", agent="packing")
+def destination_extras(facts: packing_rules.TripFacts) -> list:
+    """Destination-specific items from one small LLM call, cached per destination and season."""
+    if not facts.destination or not GROQ_API_KEY:
+        return []
+    key = (facts.destination.lower(), facts.season)
+    if key not in _extras_cache:
+        reply = run_groq(_extras_prompt(facts), EXTRAS_SYSTEM_PROMPT, max_tokens=200)
+        extras = packing_rules.parse_extras(reply)
+        if not extras and reply.startswith("[Groq"):
+            return []  # API error: try again next time rather than caching it
+        _cache_extras(key, extras)
+    return _extras_cache[key]
+
+
+@traced("agent.destination_extras", agent="packing")
+async def adestination_extras(facts: packing_rules.TripFacts) -> list:
+    if not facts.destination or not GROQ_API_KEY:
+        return []
+    key = (facts.destination.lower(), facts.season)
+    if key not in _extras_cache:
+        reply = await arun_groq(_extras_prompt(facts), EXTRAS_SYSTEM_PROMPT, max_tokens=200)
+        extras = packing_rules.parse_extras(reply)
+        if not extras and reply.startswith("[Groq"):
+            return []
+        _cache_extras(key, extras)
+    return _extras_cache[key]
+
+
+@traced("agent.plan_packing_list", agent="packing")
+def plan_packing_list(facts: packing_rules.TripFacts, extras: list = None) -> str:
+    """
+    Rules-built packing list plus destination extras; no itinerary summary, no
+    full LLM list.  Pass `extras` when they were fetched ahead of time.
+    """
+    if extras is None:
+        extras = destination_extras(facts)
+    packing = packing_rules.with_extras(packing_rules.build(facts), extras)
+    return packing_rules.render_html(packing, facts)
+
+
+@traced("agent.plan_packing_list", agent="packing")
+async def aplan_packing_list(facts: packing_rules.TripFacts, extras: list = None) -> str:
+    if extras is None:
+        extras = await adestination_extras(facts)
+    packing = packing_rules.with_extras(packing_rules.build(facts), extras)
+    return packing_rules.render_html(packing, facts)
+
+
+@traced("agent.generate_packing_list", agent="packing")
 def generate_packing_list(session_id,existing_itinerary):
     itinerary=summarize_itinerary(existing_itinerary)
     user_msg = f'''create a packing list with following itinerary.\n \n{itinerary}\n
@@ -180,3 +288,30 @@ def generate_packing_list(session_id,existing_itinerary):
     if not reply:
         return "Sorry, I couldn't generate a packing list based on your itinerary. Please try again with a different prompt."
     return markdown.markdown(reply)
+
+@traced("agent.generate_packing_list", agent="packing")
+async def agenerate_packing_list(session_id, existing_itinerary):
+    itinerary = await asummarize_itinerary(existing_itinerary)
+    user_msg = f'''create a packing list with following itinerary.\n \n{itinerary}\n
+    '''
+    reply = await apacking_reply(session_id, user_msg)
+    if not reply:
+        return "Sorry, I couldn't generate a packing list based on your itinerary. Please try again with a different prompt."
+    return markdown.markdown(reply)
+
+
+def _revise_message(existing_list: str, edit_prompt: str) -> str:
+    return f"Current packing list:\n{existing_list}\n\nApply this change and return the complete updated list: {edit_prompt}"
+
+
+@traced("agent.revise_packing_list", agent="packing")
+def revise_packing_list(session_id, existing_list, edit_prompt):
+    """One LLM turn editing an existing list (no itinerary summary)."""
+    reply = packing_reply(session_id, _revise_message(existing_list, edit_prompt))
+    return markdown.markdown(reply) if reply else existing_list
+
+
+@traced("agent.revise_packing_list", agent="packing")
+async def arevise_packing_list(session_id, existing_list, edit_prompt):
+    reply = await apacking_reply(session_id, _revise_message(existing_list, edit_prompt))
+    return markdown.markdown(reply) if reply else existing_list
@@ -1,19 +1,47 @@
 from flask import Flask, render_template , jsonify
-from flask import request, session, redirect, render_template, flash
+from flask import request, session, redirect, render_template, flash, abort, Response, g
 from auth.auth_client import create_supabase_client
-from sqlalchemy import create_engine
+from auth.session_store import SessionStore, ServerSessionInterface
+from auth.identity import SupabaseIdentity
+from sqlalchemy import create_engine, and_, or_, func
+from sqlalchemy.orm import joinedload, aliased
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.exc import IntegrityError
 from flask_sqlalchemy import SQLAlchemy
 from config import Config
-from model import db,User, UserProfile, EmergencyContact, LanguagePreference, Pod, PodMember,PodItinerary, PodPacking,PodBudget, PodNote
+from model import db,User, UserProfile, EmergencyContact, LanguagePreference, Pod, PodMember,PodItinerary, PodPacking,PodBudget, PodNote, BudgetLineItem
+import math
 import random
 import string
-from agent.itnerary import generate_itinerary_from_prompt
-from agent.i_update import refine_itinerary
-from agent.packing import generate_packing_list
-from agent.budget import generate_budget_plan
-from agent.destination_plan import research_reply
-from agent.local_assistant import governance_reply
-
+import pod_events
+from fragment_cache import panel_cache
+from pod_access import pod_access, memberships
+import revisions
+from idempotency import Idempotency, IdempotencyStore
+from profiling import RequestProfiler
+from query_budget import QueryBudget, query_budget
+from speculative import Speculator, SpeculativeStore
+from usage import Usage, QuotaExceeded
+import search_index
+from note_buffer import NoteBuffer, NoteLog
+import tracing
+from markupsafe import Markup
+from agent.itnerary import generate_itinerary_from_prompt, agenerate_itinerary_from_prompt
+from agent.i_update import refine_itinerary, arefine_itinerary
+from agent.packing import generate_packing_list, agenerate_packing_list, aplan_packing_list, arevise_packing_list, destination_extras
+from agent.budget import generate_budget_plan, agenerate_budget_plan, arefine_budget_plan, apropose_budget_items, arevise_budget_items
+from agent.budget import summarize_itinerary as summarize_for_budget, propose_budget_items
+import budget_engine
+import packing_rules
+import pod_taxonomy
+from agent.destination_plan import research_reply, aresearch_reply
+from agent.local_assistant import governance_reply, agovernance_reply
+
+import asyncio
+from asgiref.sync import async_to_sync as asgiref_async_to_sync
+from agent.async_client import close_client
+import uuid
+from datetime import datetime
 from functools import wraps
 from flask import make_response
 from dotenv import load_dotenv
@@ -25,6 +53,57 @@ supabase = create_supabase_client()
 load_dotenv()
 
 app.secret_key = os.getenv("FLASK_SECRET_KEY")
+tracing.init_app(app)
+
+session_store = SessionStore(Config.SESSION_DB_PATH, ttl=Config.SESSION_TTL)
+app.session_interface = ServerSessionInterface(session_store)
+identity = SupabaseIdentity(supabase, session_store)
+idempotent = Idempotency(IdempotencyStore(Config.SESSION_DB_PATH))
+profiler = RequestProfiler(app, Config.PROFILE_DIR, Config.PROFILE_SAMPLE_RATE, Config.PROFILE_HEADER,
+                           Config.PROFILE_VIEWERS)
+QueryBudget(app, strict=Config.SQL_BUDGET_STRICT)
+speculator = Speculator(SpeculativeStore(Config.SESSION_DB_PATH), Config.SPECULATE)
+llm_usage = Usage(app, Config.LLM_USER_DAILY_SOFT, Config.LLM_USER_DAILY_HARD,
+                  Config.LLM_POD_DAILY_SOFT, Config.LLM_POD_DAILY_HARD)
+llm_quota = llm_usage.quota
+search = search_index.from_config(Config.SEARCH_BACKEND)
+search.init_app(app)
+
+
+def check_session_identity():
+    """
+    Routes only check `'user' in session`; make sure that entry is still
+    backed by a valid Supabase token (cached, refreshed in the background).
+    Can block on Supabase and the session store, so asgi.py runs it in a
+    thread before the request's other hooks.
+    """
+    g._identity_checked = True
+    if 'user' not in session:
+        return
+    user = identity.identify(session.sid)
+    if user is None or user["id"] != session['user']['id']:
+        session.clear()
+
+
+@app.before_request
+def verify_session_identity():
+    if request.endpoint == 'static' or g.get('_identity_checked'):
+        return
+    check_session_identity()
+
+
+def start_session(res):
+    """Logs the Supabase auth response's user into a fresh server-side session."""
+    session.clear()
+    session.rotate()
+    session['user'] = {
+        "id": res.user.id,
+        "email": res.user.email
+    }
+    if res.session:
+        session_store.save_tokens(session.sid, res.session.access_token,
+                                  res.session.refresh_token, res.session.expires_at)
+        identity.remember(res.session.access_token, session['user'])
 
 
 def nocache(view):
@@ -44,6 +123,316 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 db.init_app(app)
 
+
+# ========== DB HELPERS ==========
+# The AI routes below are `async def` so the ASGI entry point (asgi.py) can
+# await the LLM calls on the event loop; blocking SQLAlchemy work is pushed to
+# a thread with `run_db` (the request/app context travels with it).
+
+async def run_db(fn, *args, **kwargs):
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+def async_to_sync(func):
+    """
+    How Flask runs async views outside asgi.py: asgiref gives every call its
+    own event loop, so the loop's httpx client is closed before it ends
+    instead of leaking its sockets.
+    """
+    async def run(*args, **kwargs):
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            await close_client()
+    return asgiref_async_to_sync(run)
+
+
+app.async_to_sync = async_to_sync
+
+
+# Panels of pod.html that can be re-rendered on their own (templates/panels/),
+# and the Pod column holding each one's version. The details panel only shows
+# member-dependent data (the creator's name) besides fixed pod fields.
+POD_PANELS = ("details", "members", "itinerary", "packing", "budget", "notes")
+PANEL_VERSIONS = {
+    "details": "members_version",
+    "members": "members_version",
+    "itinerary": "itinerary_version",
+    "packing": "packing_version",
+    "budget": "budget_version",
+    "notes": "notes_version",
+}
+
+
+def _version_bumps(panels):
+    values = {Pod.version: Pod.version + 1, Pod.updated_at: datetime.utcnow()}
+    for panel in panels:
+        column = getattr(Pod, PANEL_VERSIONS[panel])
+        values[column] = column + 1
+    return values
+
+
+def touch_pod(pod_id, *panels):
+    """
+    Bumps the pod's version (and those of the given panels) in the current
+    transaction -- call before commit.
+    """
+    Pod.query.filter_by(id=pod_id).update(_version_bumps(panels), synchronize_session=False)
+    panel_cache.invalidate(pod_id, panels)
+
+
+def touch_user_pods(user_id):
+    """Bumps every pod the user is in, e.g. after their name changes."""
+    pod_ids = [pod_id for (pod_id,) in db.session.query(PodMember.pod_id).filter(PodMember.user_id == user_id)]
+    if not pod_ids:
+        return
+    Pod.query.filter(Pod.id.in_(pod_ids)).update(
+        _version_bumps(("members", "notes")), synchronize_session=False
+    )
+    for pod_id in pod_ids:
+        panel_cache.invalidate(pod_id, ("details", "members", "notes"))
+
+
+def load_profile(user_id):
+    """
+    User with profile, emergency contacts and language loaded in one query.
+
+    Cached on `g` for the rest of the request, so agents needing dietary or
+    health preferences reuse the same rows instead of querying again.
+    """
+    cache = g.setdefault("profiles", {})
+    if user_id not in cache:
+        cache[user_id] = (
+            User.query.options(
+                joinedload(User.profile),
+                joinedload(User.emergency_contacts),
+                joinedload(User.language_preference),
+            )
+            .filter(User.id == user_id)
+            .first()
+        )
+    return cache[user_id]
+
+
+def profile_context(user):
+    return dict(
+        user=user,
+        profile=user.profile if user else None,
+        emergency=user.emergency_contacts[0] if user and user.emergency_contacts else None,
+        language=user.language_preference if user else None,
+    )
+
+
+def get_itinerary(pod_id):
+    return PodItinerary.query.filter_by(pod_id=pod_id).first()
+
+
+def get_packing(pod_id):
+    return PodPacking.query.filter_by(pod_id=pod_id).first()
+
+
+def packing_facts(pod, itinerary_text):
+    """Trip facts for the packing rules, with every member's health and allergy notes."""
+    profiles = (
+        UserProfile.query.join(PodMember, PodMember.user_id == UserProfile.user_id)
+        .filter(PodMember.pod_id == pod.id)
+        .all()
+    )
+    text = " ".join(filter(None, (itinerary_text, pod.description, pod.tags)))
+    return packing_rules.trip_facts(pod.destination, pod.start_date, pod.end_date, text, profiles)
+
+
+def get_budget(pod_id):
+    return PodBudget.query.filter_by(pod_id=pod_id).first()
+
+
+ARTIFACT_MODELS = {
+    "itinerary": PodItinerary,
+    "packing": PodPacking,
+    "budget": PodBudget,
+}
+
+
+class EditConflict(Exception):
+    """Someone else saved the artefact since the editor loaded it."""
+
+    def __init__(self, kind, current):
+        super().__init__(kind)
+        self.kind = kind
+        self.version = current.row_version if current else 0
+        self.description = current.description if current else None
+
+
+def save_artifact(kind, pod_id, description, user_id, expected_version=None, commit=True):
+    """
+    Creates or updates the pod's itinerary/packing/budget row.
+
+    With `expected_version` (the row_version the editor saw, 0 for "none yet")
+    the write only succeeds if nobody saved in between; the UPDATE itself is
+    conditional on the version read here, so racing writers can't both win.
+    Raises EditConflict otherwise.
+
+    With `commit=False` the write is only flushed, for callers batching many
+    saves into one transaction; they commit and publish the pod events.
+    """
+    model = ARTIFACT_MODELS[kind]
+    existing = model.query.filter_by(pod_id=pod_id).first()
+    if expected_version is not None and (existing.row_version if existing else 0) != expected_version:
+        db.session.rollback()  # drop anything the caller staged alongside
+        raise EditConflict(kind, existing)
+
+    try:
+        revisions.record_revision(pod_id, kind, existing.description if existing else None, description, user_id)
+        if existing:
+            existing.description = description
+        else:
+            existing = model(pod_id=pod_id, description=description, created_by=user_id)
+            db.session.add(existing)
+        touch_pod(pod_id, kind)
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+    except (StaleDataError, IntegrityError):
+        # Lost the race: another save bumped the row (or its revision number) first.
+        db.session.rollback()
+        raise EditConflict(kind, model.query.filter_by(pod_id=pod_id).first())
+
+    if commit:
+        pod_events.publish(pod_id, f"{kind}_updated", panel=kind)
+    return existing
+
+
+def save_itinerary(pod_id, description, user_id, expected_version=None):
+    itinerary = save_artifact("itinerary", pod_id, description, user_id, expected_version)
+    speculate_itinerary(pod_id, description)
+    return itinerary
+
+
+def itinerary_prompt(pod):
+    destination = pod.destination or ''
+    from_date = pod.start_date.strftime("%d %b %Y") if pod.start_date else ''
+    to_date = pod.end_date.strftime("%d %b %Y") if pod.end_date else ''
+    return f"Create a detailed day-by-day travel itinerary for a trip to {destination} from {from_date} to {to_date}. Trip summary: {pod.description or ''}"
+
+
+def budget_preference(pod):
+    destination = pod.destination or ''
+    from_date = pod.start_date.strftime("%d %b %Y") if pod.start_date else ''
+    to_date = pod.end_date.strftime("%d %b %Y") if pod.end_date else ''
+    pod_budget = pod.estimated_budget or 0
+    return f"Create a comprehensive travel budget plan for a trip to {destination} from {from_date} to {to_date} and budget of {pod_budget}. "
+
+
+def speculate_itinerary(pod_id, text):
+    """
+    Queues, in the background, the work the next budget/packing click on this
+    itinerary would start with (see speculative.py; off unless SPECULATE is set).
+    """
+    if not speculator.enabled or not text:
+        return
+    pod = db.session.get(Pod, pod_id)
+    preference = budget_preference(pod)
+
+    def summary():
+        result = summarize_for_budget(text)
+        return None if not result or result.startswith("[") else result
+
+    def budget_draft():
+        items = propose_budget_items(preference, text, summary=speculator.result("summary", text))
+        return {"preference": preference, "items": [item.to_dict() for item in items]} if items else None
+
+    jobs = [("summary", summary), ("budget", budget_draft)]
+    if speculator.wants("packing"):
+        facts = packing_facts(pod, text)
+
+        def packing_extras():
+            extras = destination_extras(facts)
+            return {"destination": facts.destination, "season": facts.season, "extras": extras} if extras else None
+
+        jobs.append(("packing", packing_extras))
+    speculator.schedule(text, jobs)
+
+
+def save_packing(pod_id, description, user_id, expected_version=None, commit=True):
+    return save_artifact("packing", pod_id, description, user_id, expected_version, commit)
+
+
+def save_budget(pod_id, description, user_id, expected_version=None, commit=True):
+    return save_artifact("budget", pod_id, description, user_id, expected_version, commit)
+
+
+def budget_items(pod_id):
+    return [
+        budget_engine.LineItem(category=r.category, description=r.description or "", quantity=r.quantity,
+                               unit_cost=r.unit_cost, currency=r.currency, day=r.day, per_person=r.per_person)
+        for r in BudgetLineItem.query.filter_by(pod_id=pod_id).order_by(BudgetLineItem.id)
+    ]
+
+
+def pod_travelers(pod):
+    return pod.travelers or PodMember.query.filter_by(pod_id=pod.id).count() or 1
+
+
+def clear_budget_items(pod_id):
+    # A free-text budget write leaves the line items stale; drop them.
+    BudgetLineItem.query.filter_by(pod_id=pod_id).delete(synchronize_session=False)
+
+
+def save_budget_items(pod_id, items, user_id, expected_version=None, travelers=None, commit=True):
+    """
+    Replaces the pod's budget line items and saves the recomputed budget as
+    its description (so history, conflicts and the panel work as before).
+    """
+    pod = Pod.query.get_or_404(pod_id)
+    if travelers:
+        pod.travelers = travelers
+    clear_budget_items(pod_id)
+    db.session.add_all([BudgetLineItem(pod_id=pod_id, created_by=user_id, **item.to_dict()) for item in items])
+    summary = budget_engine.compute(items, pod_travelers(pod), budget_limit=pod.estimated_budget)
+    save_budget(pod_id, budget_engine.render_html(items, summary), user_id, expected_version, commit)
+    return summary
+
+
+def form_version():
+    return request.form.get('version', type=int)
+
+
+def conditional_page(etag, last_modified, render):
+    """
+    Answers a GET with 304 when the browser's copy (If-None-Match /
+    If-Modified-Since) is still current, otherwise calls `render()`.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        fresh = bool(last_modified and request.if_modified_since
+                     and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+
+    response = Response(status=304) if fresh else make_response(render())
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def back_to_pod(pod_id):
+    # pod.html posts its panel forms with fetch(); those only need an ack,
+    # the panel itself is refreshed from the pod event stream.
+    if request.headers.get("X-Requested-With") == "fetch":
+        return jsonify({"ok": True})
+    return redirect(f'/pod/{pod_id}')
+
+
+def trip_detail(pod):
+    description = pod.description or ''
+    destination = pod.destination or ''
+    from_date = pod.start_date.strftime("%d %b %Y") if pod.start_date else ''
+    to_date = pod.end_date.strftime("%d %b %Y") if pod.end_date else ''
+    pod_budget = pod.estimated_budget or 0
+    return f"User is in {destination} from {from_date} to {to_date} with a budget of {pod_budget}. Trip summary: {description}"
+
 @app.route('/')
 def home():
     if 'user' in session:
@@ -62,11 +451,7 @@ def login():
         res = supabase.auth.sign_in_with_password({"email": email, "password": password})
 
         if res.user:
-            session['user'] = {
-                "id": res.user.id,
-                "email": res.user.email
-            }
-            session['access_token'] = res.session.access_token
+            start_session(res)
             return redirect('/dashboard')
         else:
             flash("Invalid credentials")
@@ -84,12 +469,7 @@ def signup():
         })
 
         if res.user:
-            # Store Supabase user info temporarily in session
-            session['user'] = {
-                "id": res.user.id,
-                "email": res.user.email
-            }
-            session['access_token'] = res.session.access_token
+            start_session(res)
             existing_user = User.query.get(res.user.id)
             if not existing_user:
                 new_user = User(id=res.user.id, email=res.user.email)
@@ -103,16 +483,64 @@ def signup():
             flash("Signup failed.")
     return render_template("sign_up.html")
 
+DASHBOARD_PAGE_SIZE = 24
+
+
+def dashboard_cards(user_id, before=None, limit=DASHBOARD_PAGE_SIZE):
+    """
+    One page of the user's pod cards, newest pod first, as a single statement:
+    member count and has-itinerary/packing/budget flags are correlated
+    subqueries evaluated only for the rows on the page.
+    Returns (cards, next_cursor).
+    """
+    mine = aliased(PodMember)
+    member_count = (
+        db.session.query(func.count(PodMember.id))
+        .filter(PodMember.pod_id == Pod.id).correlate(Pod).scalar_subquery()
+    )
+
+    def has(model):
+        return db.session.query(model.id).filter(model.pod_id == Pod.id).correlate(Pod).exists()
+
+    query = (
+        db.session.query(
+            Pod.id, Pod.name, Pod.destination, Pod.start_date, Pod.end_date, Pod.status,
+            member_count.label("member_count"),
+            has(PodItinerary).label("has_itinerary"),
+            has(PodPacking).label("has_packing"),
+            has(PodBudget).label("has_budget"),
+        )
+        .join(mine, and_(mine.pod_id == Pod.id, mine.user_id == user_id))
+    )
+    if before is not None:
+        query = query.filter(Pod.id < before)
+    cards = query.order_by(Pod.id.desc()).limit(limit + 1).all()
+    next_cursor = cards[limit - 1].id if len(cards) > limit else None
+    return cards[:limit], next_cursor
+
+
 @app.route('/dashboard')
+@query_budget(3)
 def dashboard():
     if 'user' not in session:
         return redirect('/login')
 
     user_id = session['user']['id']
-    pods = db.session.query(Pod).join(PodMember).filter(PodMember.user_id == user_id).all()
-    return render_template('dashboard.html', pods=pods)
+    before = request.args.get('before', type=int)
+    # One aggregate over the user's pods decides whether the page changed.
+    count, versions, last_modified = (
+        db.session.query(func.count(Pod.id), func.sum(Pod.version), func.max(Pod.updated_at))
+        .join(PodMember).filter(PodMember.user_id == user_id).one()
+    )
+
+    def render():
+        pods, next_cursor = dashboard_cards(user_id, before)
+        return render_template('dashboard.html', pods=pods, next_cursor=next_cursor, paged=before is not None)
+
+    return conditional_page(f"dash-{user_id}-{count}-{versions or 0}-{before or ''}", last_modified, render)
 
 @app.route('/profile', methods=['GET', 'POST'])
+@query_budget(10)
 def profile():
     if 'user' not in session:
         return redirect('/login')
@@ -132,55 +560,33 @@ def profile():
         e_email = request.form['emergency_email']
         lang = request.form['language']
 
-        # --- Update User Name ---
-        user = User.query.get(user_id)
+        # Update the loaded aggregate in place; the commit flushes every
+        # change in one batch instead of a read-modify-write per table.
+        user = load_profile(user_id)
         if user:
             user.name = name
 
-        # --- Update or Create UserProfile ---
-        profile = UserProfile.query.filter_by(user_id=user_id).first()
-        if profile:
-            profile.blood_group = blood
-            profile.health_conditions = health
-            profile.allergies = allergies
-            profile.food_preferences = food
-            profile.travel_preferences = travel
-        else:
-            profile = UserProfile(
-                user_id=user_id,
-                blood_group=blood,
-                health_conditions=health,
-                allergies=allergies,
-                food_preferences=food,
-                travel_preferences=travel
-            )
-            db.session.add(profile)
-
-        # --- Update or Create EmergencyContact ---
-        emergency = EmergencyContact.query.filter_by(user_id=user_id).first()
-        if emergency:
+            if user.profile is None:
+                user.profile = UserProfile(user_id=user_id)
+            user.profile.blood_group = blood
+            user.profile.health_conditions = health
+            user.profile.allergies = allergies
+            user.profile.food_preferences = food
+            user.profile.travel_preferences = travel
+
+            if not user.emergency_contacts:
+                user.emergency_contacts.append(EmergencyContact(user_id=user_id))
+            emergency = user.emergency_contacts[0]
             emergency.name = e_name
             emergency.relation = e_relation
             emergency.phone = e_phone
             emergency.email = e_email
-        else:
-            emergency = EmergencyContact(
-                user_id=user_id,
-                name=e_name,
-                relation=e_relation,
-                phone=e_phone,
-                email=e_email
-            )
-            db.session.add(emergency)
 
-        # --- Update or Create LanguagePreference ---
-        language = LanguagePreference.query.filter_by(user_id=user_id).first()
-        if language:
-            language.preferred_language = lang
-        else:
-            language = LanguagePreference(user_id=user_id, preferred_language=lang)
-            db.session.add(language)
+            if user.language_preference is None:
+                user.language_preference = LanguagePreference(user_id=user_id)
+            user.language_preference.preferred_language = lang
 
+        touch_user_pods(user_id)
         db.session.commit()
 
         return redirect('/dashboard')
@@ -189,25 +595,21 @@ def profile():
 
 
 @app.route('/display', methods=['GET', 'POST'])
+@query_budget(2)
 def display():
     if 'user' not in session:
         return redirect('/login')
 
     user_id = session['user']['id']
 
-    # GET method: fetch existing data to show
-    user = User.query.get(user_id)
-    profile = UserProfile.query.filter_by(user_id=user_id).first()
-    emergency = EmergencyContact.query.filter_by(user_id=user_id).first()
-    language = LanguagePreference.query.filter_by(user_id=user_id).first()
-
-    return render_template('profile.html', user=user, profile=profile, emergency=emergency, language=language)
+    return render_template('profile.html', **profile_context(load_profile(user_id)))
 
 def generate_invite_code():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
 
 
 @app.route('/create_pod', methods=['GET', 'POST'])
+@idempotent
 def create_pod():
     if 'user' not in session:
         return redirect('/login')
@@ -237,72 +639,203 @@ def create_pod():
             created_by=created_by
         )
         db.session.add(pod)
+        pod_taxonomy.sync(pod)
         db.session.commit()
 
         # Add creator as admin
         member = PodMember(user_id=created_by, pod_id=pod.id, role='admin')
         db.session.add(member)
+        touch_pod(pod.id)
         db.session.commit()
 
         return redirect('/dashboard')
 
-    return render_template('create_pod.html')
+    return render_template('create_pod.html', idempotency_key=uuid.uuid4().hex)
+
+
+# ========== NOTES FEED ==========
+# Notes are paged with a keyset cursor on (created_at, id) so a pod page costs
+# the same whether the pod has 20 notes or 20,000.
+NOTES_PAGE_SIZE = 20
+
+
+def note_cursor(note):
+    return f"{note.created_at.isoformat()}~{note.id}"
+
+
+def parse_note_cursor(cursor):
+    try:
+        created_at, note_id = cursor.rsplit("~", 1)
+        return datetime.fromisoformat(created_at), int(note_id)
+    except ValueError:
+        abort(400)
+
+
+def notes_before(pod_id, cursor=None, limit=NOTES_PAGE_SIZE):
+    """Newest-first page of notes older than `cursor`; returns (notes, has_more)."""
+    query = PodNote.query.filter_by(pod_id=pod_id)
+    if cursor:
+        created_at, note_id = parse_note_cursor(cursor)
+        query = query.filter(or_(
+            PodNote.created_at < created_at,
+            and_(PodNote.created_at == created_at, PodNote.id < note_id),
+        ))
+    notes = query.order_by(PodNote.created_at.desc(), PodNote.id.desc()).limit(limit + 1).all()
+    return notes[:limit], len(notes) > limit
+
+
+def notes_after(pod_id, cursor, limit=NOTES_PAGE_SIZE):
+    """Notes newer than `cursor`, newest first (same order as the feed)."""
+    created_at, note_id = parse_note_cursor(cursor)
+    notes = (
+        PodNote.query.filter_by(pod_id=pod_id)
+        .filter(or_(
+            PodNote.created_at > created_at,
+            and_(PodNote.created_at == created_at, PodNote.id > note_id),
+        ))
+        .order_by(PodNote.created_at.asc(), PodNote.id.asc())
+        .limit(limit)
+        .all()
+    )
+    return list(reversed(notes))
+
+
+def note_authors(notes):
+    user_ids = {n.user_id for n in notes}
+    return User.query.filter(User.id.in_(user_ids)).all() if user_ids else []
+
+
+def pod_version(pod_id):
+    """Version columns of a pod -- the cheap lookup behind conditional GETs and the panel cache."""
+    columns = [Pod.version, Pod.updated_at] + [getattr(Pod, name) for name in set(PANEL_VERSIONS.values())]
+    row = db.session.query(*columns).filter(Pod.id == pod_id).first()
+    if row is None:
+        abort(404)
+    return row
+
+
+def get_pod_members(pod_id):
+    return (
+        User.query.join(PodMember, PodMember.user_id == User.id)
+        .filter(PodMember.pod_id == pod_id)
+        .order_by(PodMember.id)
+        .all()
+    )
+
+
+def pod_panel_context(pod, panels=POD_PANELS):
+    """Loads only what the requested panels render."""
+    context = {"pod": pod, "user_id": session['user']['id']}
+
+    if {"details", "members", "notes"} & set(panels):
+        members = get_pod_members(pod.id)
+        context["members"] = members
+        # Dummy logic for avatars
+        context["extra_count"] = max(0, len(members) - 3)
+    if "itinerary" in panels:
+        context["itinerary"] = get_itinerary(pod.id)
+    if "packing" in panels:
+        context["packing"] = get_packing(pod.id)
+    if "budget" in panels:
+        context["budget"] = get_budget(pod.id)
+        context["budget_categories"] = budget_engine.CATEGORIES
+        context["budget_currencies"] = list(budget_engine.FX_TO_INR)
+    if "notes" in panels:
+        notes, has_more = notes_before(pod.id)
+        context["notes"] = notes
+        context["newest_cursor"] = note_cursor(notes[0]) if notes else ""
+        context["older_cursor"] = note_cursor(notes[-1]) if has_more else None
+    return context
+
+
+def render_panels(pod_id, versions, panels=POD_PANELS, pod=None):
+    """
+    Rendered HTML of each panel: served from the fragment cache when its
+    version is unchanged, otherwise loaded and rendered (only those panels).
+    """
+    html = {}
+    missing = []
+    with tracing.span("render_panels", **{"pod.id": pod_id}) as span:
+        for panel in panels:
+            cached = panel_cache.get(pod_id, panel, getattr(versions, PANEL_VERSIONS[panel]))
+            if cached is None:
+                missing.append(panel)
+            else:
+                html[panel] = cached
+        span.set("cache.hits", len(html))
+        span.set("cache.misses", ",".join(missing))
+
+        if missing:
+            pod = pod or Pod.query.get_or_404(pod_id)
+            context = pod_panel_context(pod, missing)
+            for panel in missing:
+                rendered = Markup(render_template(f'panels/{panel}.html', **context))
+                panel_cache.set(pod_id, panel, getattr(versions, PANEL_VERSIONS[panel]), rendered)
+                html[panel] = rendered
+    return html
 
 
 @app.route('/pod/<int:pod_id>')
+@pod_access
+@query_budget(11)
 def view_pod(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
-    pod = Pod.query.get_or_404(pod_id)
+    user_id = session['user']['id']
+    versions = pod_version(pod_id)
+
+    def render():
+        pod = Pod.query.get_or_404(pod_id)
+        # Expenses
+        '''expenses = Expense.query.filter_by(pod_id=pod_id).all()
+        
+        total_expense = sum(e.amount for e in expenses)
+        user_expense = sum(e.amount for e in expenses if e.user_id == user_id)
+        budget_progress = int((total_expense / pod.estimated_budget) * 100) if pod.estimated_budget else 0'''
+        panels = render_panels(pod_id, versions, pod=pod)
+        return render_template('pod.html', pod=pod, user_id=user_id, panels=panels)
+
+    return conditional_page(f"pod-{pod_id}-v{versions.version}-{user_id}", versions.updated_at, render)
+
+
+@app.route('/pod/<int:pod_id>/panel/<panel>')
+@pod_access
+@query_budget(7)
+def pod_panel(pod_id, panel):
+    if 'user' not in session:
+        return redirect('/login')
+    if panel not in POD_PANELS:
+        abort(404)
 
-    pod_members = PodMember.query.filter_by(pod_id=pod_id).all()
-    members = []
+    versions = pod_version(pod_id)
+    panel_version = getattr(versions, PANEL_VERSIONS[panel])
 
-    for m in pod_members:
-        user = User.query.get(m.user_id)
-        if user:
-            members.append(user)
+    def render():
+        return render_panels(pod_id, versions, (panel,))[panel]
 
-    # Dummy logic for avatars
-    extra_count = max(0, len(members) - 3)
-    user_id = session['user']['id']
-    # Itinerary
-    #itinerary = Itinerary.query.filter_by(pod_id=pod_id).order_by(Itinerary.day_number).all()
+    return conditional_page(f"pod-{pod_id}-{panel}-v{panel_version}", versions.updated_at, render)
 
-    # Expenses
-    '''expenses = Expense.query.filter_by(pod_id=pod_id).all()
-    
-    total_expense = sum(e.amount for e in expenses)
-    user_expense = sum(e.amount for e in expenses if e.user_id == user_id)
-    budget_progress = int((total_expense / pod.estimated_budget) * 100) if pod.estimated_budget else 0'''
-    itinerary = PodItinerary.query.filter_by(pod_id=pod_id).first()
-    packing= PodPacking.query.filter_by(pod_id=pod_id).first()
-    budget= PodBudget.query.filter_by(pod_id=pod_id).first()
-    notes = PodNote.query.filter_by(pod_id=pod_id).order_by(PodNote.created_at.desc()).all()
-    return render_template(
-        'pod.html',
-        pod=pod,
-        user_id=user_id,
-        members=members,
-        extra_count=extra_count,
-        itinerary=itinerary, # type: ignore
-        packing=packing,# type: ignore
-        budget=budget, # type: ignore
-        notes=notes, # type: ignore
-        #total_expense=total_expense,
-        #user_expense=user_expense,
-        #budget_progress=budget_progress
+
+@app.route('/pod/<int:pod_id>/events')
+@pod_access
+def pod_event_stream(pod_id):
+    if 'user' not in session:
+        return redirect('/login')
+
+    return Response(
+        pod_events.EventStream(pod_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 @app.route('/user/<string:user_id>')
+@query_budget(2)
 def view_profile(user_id):
-    user = User.query.get_or_404(user_id)
-    profile = UserProfile.query.filter_by(user_id=user_id).first()
-    emergency = EmergencyContact.query.filter_by(user_id=user_id).first()
-    language = LanguagePreference.query.filter_by(user_id=user_id).first()
-
-    return render_template('profile.html', user=user, profile=profile, emergency=emergency, language=language)
+    user = load_profile(user_id)
+    if user is None:
+        abort(404)
+    return render_template('profile.html', **profile_context(user))
 
 
 @app.route('/join_pod', methods=['GET', 'POST'])
@@ -332,7 +865,9 @@ def join_pod():
                     role='member'
                 )
                 db.session.add(new_member)
+                touch_pod(pod.id, "members")
                 db.session.commit()
+                pod_events.publish(pod.id, "member_joined", panel="members")
                 return redirect(f'/pod/{pod.id}')
 
     return render_template('join_pod.html', error=error)
@@ -344,280 +879,430 @@ def user_info():
 
 
 @app.route('/pod/<int:pod_id>/itinerary/create', methods=['POST'])
-def generate_itinerary_create(pod_id):
+@pod_access
+@idempotent
+@llm_quota
+async def generate_itinerary_create(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
-    pod = Pod.query.get_or_404(pod_id)
-    description = pod.description or ''
-    destination = pod.destination or ''
-    from_date = pod.start_date.strftime("%d %b %Y") if pod.start_date else ''
-    to_date = pod.end_date.strftime("%d %b %Y") if pod.end_date else ''
+    pod = await run_db(Pod.query.get_or_404, pod_id)
 
     # AI prompt
-    prompt = f"Create a detailed day-by-day travel itinerary for a trip to {destination} from {from_date} to {to_date}. Trip summary: {description}"
+    prompt = itinerary_prompt(pod)
     user_id = session['user']['id']
     # Call AI (you define this in itinerary.py)
-    generated_itinerary = generate_itinerary_from_prompt(user_id,prompt)
+    generated_itinerary = await agenerate_itinerary_from_prompt(user_id,prompt)
 
     # Save or update
-    existing = PodItinerary.query.filter_by(pod_id=pod_id).first()
-    if existing:
-        existing.description = generated_itinerary
-    else:
-        new = PodItinerary(pod_id=pod_id, description=generated_itinerary, created_by=session['user']['id'])
-        db.session.add(new)
-
-    db.session.commit()
-    return redirect(f'/pod/{pod_id}')
+    await run_db(save_itinerary, pod_id, generated_itinerary, user_id, form_version())
+    return back_to_pod(pod_id)
 
 
 @app.route('/pod/<int:pod_id>/itinerary/edit', methods=['GET', 'POST'])
+@pod_access
 def edit_itinerary(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
     #pod = Pod.query.get_or_404(pod_id)
 
-    # Fetch itinerary if it exists
-    itinerary = PodItinerary.query.filter_by(pod_id=pod_id).first()
-
     if request.method == 'POST':
         updated_text = request.form.get('content')
-
-        if itinerary:
-            itinerary.description = updated_text
-        else:
-            itinerary = PodItinerary(
-                pod_id=pod_id,
-                description=updated_text,
-                created_by=session['user']['id']
-            )
-            db.session.add(itinerary)
-
-        db.session.commit()
-        return redirect(f'/pod/{pod_id}')
+        save_itinerary(pod_id, updated_text, session['user']['id'], form_version())
+        return back_to_pod(pod_id)
 
 
 @app.route('/pod/<int:pod_id>/itinerary/ai-edit', methods=['POST'])
-def refine_itinerary_with_ai(pod_id):
+@pod_access
+@llm_quota
+async def refine_itinerary_with_ai(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
     prompt = request.form.get('edit_prompt')
     if not prompt:
-        return redirect(f'/pod/{pod_id}')
+        return back_to_pod(pod_id)
 
-    pod = Pod.query.get_or_404(pod_id)
-    itinerary = PodItinerary.query.filter_by(pod_id=pod_id).first()
+    itinerary = await run_db(get_itinerary, pod_id)
 
     if not itinerary:
         flash("No itinerary exists to refine. Please create one first.", "warning")
-        return redirect(f'/pod/{pod_id}')
+        return back_to_pod(pod_id)
 
-    updated_text = refine_itinerary(current_plan=itinerary.description, update_prompt=prompt)
+    updated_text = await arefine_itinerary(current_plan=itinerary.description, update_prompt=prompt)
 
-    itinerary.description = updated_text
-    db.session.commit()
+    expected = form_version()
+    await run_db(save_itinerary, pod_id, updated_text, session['user']['id'],
+                 itinerary.row_version if expected is None else expected)
 
     flash("Itinerary refined using AI!", "success")
-    return redirect(f'/pod/{pod_id}')
+    return back_to_pod(pod_id)
 
 
 @app.route('/pod/<int:pod_id>/packing/create', methods=['POST'])
-def generate_packing_create(pod_id):
+@pod_access
+@llm_quota
+async def generate_packing_create(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
-    itinerary = PodItinerary.query.filter_by(pod_id=pod_id).first()
+    pod = await run_db(Pod.query.get_or_404, pod_id)
+    itinerary = await run_db(get_itinerary, pod_id)
     if not itinerary:
         return "No itinerary found. Please create an itinerary first.", 400
 
+    # Base list from the rules tables; the LLM is only asked for destination extras.
+    facts = await run_db(packing_facts, pod, itinerary.description)
+    draft = speculator.result("packing", itinerary.description)
+    fresh = draft and (draft["destination"], draft["season"]) == (facts.destination, facts.season)
+    packing_text = await aplan_packing_list(facts, draft["extras"] if fresh else None)
 
-    packing_text = generate_packing_list(session['user']['id'], itinerary.description)
-
-    existing = PodPacking.query.filter_by(pod_id=pod_id).first()
-    if existing:
-        existing.description = packing_text
-    else:
-        new = PodPacking(pod_id=pod_id, description=packing_text, created_by=session['user']['id'])
-        db.session.add(new)
-
-    db.session.commit()
-    return redirect(f'/pod/{pod_id}')
+    await run_db(save_packing, pod_id, packing_text, session['user']['id'], form_version())
+    return back_to_pod(pod_id)
 
 
 @app.route('/pod/<int:pod_id>/packing/manual', methods=['POST'])
+@pod_access
 def update_packing_manual(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
     description = request.form['description']
-    packing = PodPacking.query.filter_by(pod_id=pod_id).first()
-    if packing:
-        packing.description = description
-    else:
-        new = PodPacking(pod_id=pod_id, description=description, created_by=session['user']['id'])
-        db.session.add(new)
-
-    db.session.commit()
-    return redirect(f'/pod/{pod_id}')
+    save_packing(pod_id, description, session['user']['id'], form_version())
+    return back_to_pod(pod_id)
 
 
 @app.route('/pod/<int:pod_id>/packing/ai-edit', methods=['POST'])
-def update_packing_ai(pod_id):
+@pod_access
+@llm_quota
+async def update_packing_ai(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
     prompt = request.form['edit_prompt']
-    existing = PodPacking.query.filter_by(pod_id=pod_id).first()
+    existing = await run_db(get_packing, pod_id)
     if not existing:
         return "No packing list found to refine.", 400
 
-    updated_packing = generate_packing_list(session['user']['id'], f"{existing.description}\nUser edit: {prompt}")
-    existing.description = updated_packing
-
-    db.session.commit()
-    return redirect(f'/pod/{pod_id}')
+    updated_packing = await arevise_packing_list(session['user']['id'], existing.description, prompt)
+    expected = form_version()
+    await run_db(save_packing, pod_id, updated_packing, session['user']['id'],
+                 existing.row_version if expected is None else expected)
+    return back_to_pod(pod_id)
 
 
 @app.route('/pod/<int:pod_id>/budget/create', methods=['POST'])
-def generate_budget_create(pod_id):
+@pod_access
+@idempotent
+@llm_quota
+async def generate_budget_create(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
-    pod = Pod.query.get_or_404(pod_id)
-    description = pod.description or ''
-    destination = pod.destination or ''
-    from_date = pod.start_date.strftime("%d %b %Y") if pod.start_date else ''
-    to_date = pod.end_date.strftime("%d %b %Y") if pod.end_date else ''
-    pod_budget = pod.estimated_budget or 0
-    pod
+    pod = await run_db(Pod.query.get_or_404, pod_id)
+    itinerary = await run_db(get_itinerary, pod_id)
 
     # Prompt for LLM
-    user_preference = f"Create a comprehensive travel budget plan for a trip to {destination} from {from_date} to {to_date} and budget of {pod_budget}. " 
-    detail=description
+    user_preference = budget_preference(pod)
+    # Plan from the itinerary when there is one (its summary may already be
+    # precomputed), the pod's description otherwise.
+    detail = itinerary.description if itinerary else (pod.description or '')
     user_id = session['user']['id']
+    summary = speculator.result("summary", detail)
+    draft = speculator.result("budget", detail)
 
-    # Call your LLM (function to define in `budget.py`)
-    ai_budget = generate_budget_plan(user_id, user_preference, detail)
-
-    existing = PodBudget.query.filter_by(pod_id=pod_id).first()
-    if existing:
-        existing.description = ai_budget
+    # The LLM only proposes line items; the totals are computed locally.
+    if draft and draft["preference"] == user_preference:
+        items = [budget_engine.LineItem.from_dict(item) for item in draft["items"]]
     else:
-        new = PodBudget(pod_id=pod_id, description=ai_budget, created_by=user_id)
-        db.session.add(new)
-
-    db.session.commit()
-    return redirect(f'/pod/{pod_id}')
+        items = await apropose_budget_items(user_preference, detail, summary=summary)
+    if items:
+        await run_db(save_budget_items, pod_id, items, user_id, form_version())
+    else:
+        # Model didn't return usable items: fall back to the free-text plan.
+        ai_budget = await agenerate_budget_plan(user_id, user_preference, detail, summary=summary)
+        await run_db(save_budget, pod_id, ai_budget, user_id, form_version())
+    return back_to_pod(pod_id)
 
 @app.route('/pod/<int:pod_id>/budget/edit', methods=['POST'])
+@pod_access
 def edit_budget_manual(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
     new_text = request.form['description']
-    existing = PodBudget.query.filter_by(pod_id=pod_id).first()
-
-    if existing:
-        existing.description = new_text
-    else:
-        new = PodBudget(pod_id=pod_id, description=new_text, created_by=session['user']['id'])
-        db.session.add(new)
-
-    db.session.commit()
-    return redirect(f'/pod/{pod_id}')
+    clear_budget_items(pod_id)
+    save_budget(pod_id, new_text, session['user']['id'], form_version())
+    return back_to_pod(pod_id)
 
 @app.route('/pod/<int:pod_id>/budget/ai-edit', methods=['POST'])
-def edit_budget_with_ai(pod_id):
+@pod_access
+@llm_quota
+async def edit_budget_with_ai(pod_id):
     if 'user' not in session:
         return redirect('/login')
 
     edit_prompt = request.form['edit_prompt']
-    existing = PodBudget.query.filter_by(pod_id=pod_id).first()
-    original = existing.description if existing else ''
+    existing = await run_db(get_budget, pod_id)
+    expected = form_version()
+    if expected is None:
+        expected = existing.row_version if existing else 0
+
+    # Structured budgets are revised as line items in one call, no re-summarizing.
+    items = await run_db(budget_items, pod_id)
+    if items:
+        revised = await arevise_budget_items(items, edit_prompt)
+        if revised:
+            await run_db(save_budget_items, pod_id, revised, session['user']['id'], expected)
+            return back_to_pod(pod_id)
 
+    original = existing.description if existing else ''
     full_prompt = f"{original}\n\nUser wants to refine it: {edit_prompt}"
-    from budget import refine_budget_plan
-    new_budget = refine_budget_plan(session['user']['id'], full_prompt)
+    new_budget = await arefine_budget_plan(session['user']['id'], full_prompt)
 
-    if existing:
-        existing.description = new_budget
-    else:
-        new = PodBudget(pod_id=pod_id, description=new_budget, created_by=session['user']['id'])
-        db.session.add(new)
+    await run_db(save_budget, pod_id, new_budget, session['user']['id'], expected)
+    return back_to_pod(pod_id)
 
-    db.session.commit()
-    return redirect(f'/pod/{pod_id}')
 
+@app.route('/pod/<int:pod_id>/budget/items', methods=['GET'])
+@pod_access
+def budget_line_items(pod_id):
+    """
+    Line items plus computed totals. Query parameters give an instant what-if
+    without saving: ?travelers=4&scale=Hotel:0.8,Food:1.1&currency=USD
+    """
+    if 'user' not in session:
+        return redirect('/login')
+
+    pod = Pod.query.get_or_404(pod_id)
+    items = budget_items(pod_id)
+    multipliers = {}
+    try:
+        for part in filter(None, request.args.get('scale', '').split(',')):
+            category, _, factor = part.partition(':')
+            category, factor = category.strip().title(), float(factor)
+            if category not in budget_engine.CATEGORIES or not math.isfinite(factor) or factor < 0:
+                abort(400)
+            multipliers[category] = factor
+        currency = budget_engine.check_currency(request.args.get('currency', budget_engine.BASE_CURRENCY))
+    except ValueError:
+        abort(400)
+    summary = budget_engine.compute(
+        items,
+        request.args.get('travelers', type=int) or pod_travelers(pod),
+        multipliers,
+        currency=currency,
+        budget_limit=pod.estimated_budget,
+    )
+    return jsonify({"items": [item.to_dict() for item in items], "summary": summary})
+
+
+def _whole_number(value, minimum):
+    """A JSON integer >= minimum, or None when absent; ValueError for anything else."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value) or value < minimum:
+        raise ValueError(f"Expected a whole number >= {minimum}: {value!r}")
+    return int(value)
+
+
+@app.route('/pod/<int:pod_id>/budget/items', methods=['POST'])
+@pod_access
+def update_budget_line_items(pod_id):
+    """Saves edited line items (JSON: items, optional travelers/version) and recomputes."""
+    if 'user' not in session:
+        return redirect('/login')
+
+    data = request.get_json(silent=True) or {}
+    try:
+        items = [budget_engine.LineItem.from_dict(entry) for entry in data.get('items', [])]
+        travelers = _whole_number(data.get('travelers'), minimum=1)
+        version = _whole_number(data.get('version'), minimum=0)
+    except (TypeError, ValueError, AttributeError):
+        abort(400)
+    summary = save_budget_items(pod_id, items, session['user']['id'], version, travelers)
+    return jsonify({"summary": summary})
+
+
+
+@app.errorhandler(EditConflict)
+def edit_conflict(e):
+    message = f"Someone else updated the {e.kind} while you were editing; your change was not saved."
+    if request.headers.get("X-Requested-With") == "fetch":
+        return jsonify({"error": message, "kind": e.kind, "version": e.version, "description": e.description}), 409
+    flash(message, "warning")
+    return redirect(f"/pod/{request.view_args['pod_id']}")
+
+
+@app.errorhandler(QuotaExceeded)
+def quota_exceeded(e):
+    if request.is_json or request.headers.get("X-Requested-With") == "fetch":
+        return jsonify({"error": str(e), "response": str(e), "scope": e.scope}), 429
+    flash(str(e), "warning")
+    return redirect(f"/pod/{request.view_args['pod_id']}")
+
+
+@app.route('/pod/<int:pod_id>/<kind>/history')
+@pod_access
+def artifact_history(pod_id, kind):
+    if 'user' not in session:
+        return redirect('/login')
+    if kind not in revisions.KINDS:
+        abort(404)
+
+    return jsonify({"revisions": [
+        {"revision": r.revision, "created_by": r.created_by,
+         "created_at": r.created_at.isoformat() if r.created_at else None}
+        for r in revisions.list_revisions(pod_id, kind)
+    ]})
+
+
+@app.route('/pod/<int:pod_id>/<kind>/history/<int:revision>')
+@pod_access
+def artifact_revision(pod_id, kind, revision):
+    if 'user' not in session:
+        return redirect('/login')
+    if kind not in revisions.KINDS:
+        abort(404)
+
+    text = revisions.load_revision(pod_id, kind, revision)
+    if text is None:
+        abort(404)
+    return jsonify({"revision": revision, "text": text})
+
+
+@app.route('/pod/<int:pod_id>/<kind>/revert/<int:revision>', methods=['POST'])
+@pod_access
+def revert_artifact(pod_id, kind, revision):
+    if 'user' not in session:
+        return redirect('/login')
+    if kind not in revisions.KINDS:
+        abort(404)
+
+    text = revisions.load_revision(pod_id, kind, revision)
+    if text is None:
+        abort(404)
+    # Reverting appends a new revision, so the revert itself can be undone.
+    if kind == "budget":
+        clear_budget_items(pod_id)
+    save_artifact(kind, pod_id, text, session['user']['id'])
+    if kind == "itinerary":
+        speculate_itinerary(pod_id, text)
+    return back_to_pod(pod_id)
 
 
 @app.route('/pod/<int:pod_id>/ask', methods=['POST'])
-def ask(pod_id):
+@pod_access
+@llm_quota
+async def ask(pod_id):
     user_input = request.json.get("message")
     session_id = session.get("session_id")
     
-    pod = Pod.query.get_or_404(pod_id)
-    description = pod.description or ''
-    destination = pod.destination or ''
-    from_date = pod.start_date.strftime("%d %b %Y") if pod.start_date else ''
-    to_date = pod.end_date.strftime("%d %b %Y") if pod.end_date else ''
-    pod_budget = pod.estimated_budget or 0
-    pod
+    pod = await run_db(Pod.query.get_or_404, pod_id)
 
     # Prompt for LLM
     
-    detail=f"User is in {destination} from {from_date} to {to_date} with a budget of {pod_budget}. Trip summary: {description}"
+    detail = trip_detail(pod)
     user_id = session['user']['id']
 
     if not user_input:
         return jsonify({"response": "Please ask something."})
 
-    response_html = research_reply(user_id,user_input,detail)
+    response_html = await aresearch_reply(user_id,user_input,detail)
     return jsonify({"response": response_html})
 
 @app.route('/pod/<int:pod_id>/help', methods=['POST'])
-def help(pod_id):
+@pod_access
+@llm_quota
+async def help(pod_id):
     user_input = request.json.get("message")
     session_id = session.get("session_id")
     
-    pod = Pod.query.get_or_404(pod_id)
-    description = pod.description or ''
-    destination = pod.destination or ''
-    from_date = pod.start_date.strftime("%d %b %Y") if pod.start_date else ''
-    to_date = pod.end_date.strftime("%d %b %Y") if pod.end_date else ''
-    pod_budget = pod.estimated_budget or 0
+    pod = await run_db(Pod.query.get_or_404, pod_id)
 
     # Prompt for LLM
     
-    detail=f"User is in {destination} from {from_date} to {to_date} with a budget of {pod_budget}. Trip summary: {description}"
+    detail = trip_detail(pod)
     user_id = session['user']['id']
 
     if not user_input:
         return jsonify({"response": "Please ask something."})
 
-    response_html = governance_reply(user_id,detail,user_input)
+    response_html = await agovernance_reply(user_id,detail,user_input)
     return jsonify({"response": response_html})
 
 
+note_buffer = None
+if Config.NOTE_WRITE_BEHIND:
+    note_buffer = NoteBuffer(NoteLog(Config.SESSION_DB_PATH), touch_pod, Config.NOTE_BATCH_ROWS, Config.NOTE_FLUSH_MS)
+    note_buffer.init_app(app)
+
+
 @app.route('/pods/<int:pod_id>/notes', methods=['POST'])
+@pod_access
+@idempotent
 def add_note(pod_id):
     data = request.get_json()
+    user_id = session['user']['id']  # the author is whoever is logged in, never the request body
+    if note_buffer:
+        ingest_key, created_at = note_buffer.add(pod_id, user_id, data['note'])
+        # Durably queued; the id and cursor exist once the batch reaches MySQL.
+        return jsonify({
+            "message": "Note queued",
+            "id": None,
+            "ingest_key": ingest_key,
+            "cursor": None,
+            "created_at": created_at.strftime("%Y-%m-%d %H:%M")
+        }), 202
+
     note = PodNote(
         pod_id=pod_id,
-        user_id=data['user_id'],
+        user_id=user_id,
         note=data['note']
     )
     db.session.add(note)
+    touch_pod(pod_id, "notes")
     db.session.commit()
+    pod_events.publish(pod_id, "note_added", panel="notes")
 
     return jsonify({
         "message": "Note added",
+        "id": note.id,
+        "cursor": note_cursor(note),
         "created_at": note.created_at.strftime("%Y-%m-%d %H:%M")
     }), 201
 
 
+@app.route('/pods/<int:pod_id>/notes', methods=['GET'])
+@pod_access
+@query_budget(4)
+def list_notes(pod_id):
+    """
+    One slice of the notes feed as rendered entries.
+
+    ?before=<cursor>  older notes, for lazy loading down the list
+    ?after=<cursor>   notes newer than the newest one on screen
+    """
+    if 'user' not in session:
+        return jsonify({"error": "login required"}), 401
+
+    after = request.args.get('after')
+    if after:
+        notes = notes_after(pod_id, after)
+        cursor = note_cursor(notes[0]) if notes else after
+    else:
+        notes, has_more = notes_before(pod_id, request.args.get('before'))
+        if 'after' in request.args:
+            # Client had no notes yet: hand back the newest page.
+            cursor = note_cursor(notes[0]) if notes else ""
+        else:
+            cursor = note_cursor(notes[-1]) if has_more else None
+
+    html = render_template('panels/note_entries.html', notes=notes, members=note_authors(notes), pod_id=pod_id)
+    return jsonify({"html": html, "cursor": cursor, "count": len(notes)})
+
+
 
 @app.route('/logout')
 def logout():
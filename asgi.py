@@ -0,0 +1,126 @@
+"""
+ASGI entry point for the async serving mode.
+
+    uvicorn asgi:application --workers 1
+
+`async def` views (the chat and AI generation routes) are awaited directly on
+the event loop, so a single worker can keep hundreds of LLM calls in flight.
+Every other view runs as usual in a worker thread.  `python app.py` and
+gunicorn keep working unchanged: Flask runs the async views through asgiref.
+
+Run one worker: the pod event broker (pod_events.py) lives in process
+memory, so with more workers a pod page connected to one of them misses the
+events published by the others.
+"""
+import asyncio
+import inspect
+import io
+
+from asgiref.wsgi import WsgiToAsgiInstance
+from flask import request
+from werkzeug.exceptions import HTTPException
+
+from app import app, check_session_identity
+
+
+class AsyncFlaskApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            body.write(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body.seek(0)
+
+        environ = WsgiToAsgiInstance(self.flask_app).build_environ(scope, body)
+        view = self.match_async_view(scope)
+        if view is not None:
+            response = await self.dispatch_async(environ, view)
+        else:
+            response = await asyncio.to_thread(self.dispatch_sync, environ)
+        await self.send_response(response, receive, send)
+
+    def match_async_view(self, scope):
+        adapter = self.flask_app.url_map.bind("localhost")
+        try:
+            endpoint, _ = adapter.match(scope["path"], method=scope["method"])
+        except HTTPException:
+            return None
+        view = self.flask_app.view_functions.get(endpoint)
+        return view if inspect.iscoroutinefunction(view) else None
+
+    async def dispatch_async(self, environ, view):
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                try:
+                    # The identity check can wait on Supabase; keep it off the loop.
+                    await asyncio.to_thread(check_session_identity)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**request.view_args)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                return app.finalize_request(rv)
+            except Exception as e:
+                return app.make_response(app.handle_exception(e))
+
+    def dispatch_sync(self, environ):
+        app = self.flask_app
+        with app.request_context(environ):
+            try:
+                return app.full_dispatch_request()
+            except Exception as e:
+                return app.make_response(app.handle_exception(e))
+
+    async def send_response(self, response, receive, send):
+        headers = [
+            (key.lower().encode("latin1"), value.encode("latin1"))
+            for key, value in response.headers.items()
+        ]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+
+        body = response.response
+        if not (response.is_streamed and hasattr(body, "__aiter__")):
+            await send({"type": "http.response.body", "body": response.get_data()})
+            return
+
+        # Long-lived streams (pod event streams) are pumped on the loop until
+        # the client goes away.
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            async for chunk in body:
+                if disconnected.done():
+                    break
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            disconnected.cancel()
+            response.close()
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+application = AsyncFlaskApp(app)
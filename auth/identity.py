@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from supabase import AuthApiError
+
+from auth.session_store import SessionTokens
+
+IDENTITY_TTL = 300       # seconds a verified token is trusted without asking Supabase again
+NEGATIVE_TTL = 30        # seconds a rejected token stays rejected
+STALE_GRACE = 600        # while Supabase is unreachable, trust an expired identity this much longer
+REFRESH_MARGIN = 300     # refresh tokens this many seconds before they expire
+MAX_CACHED = 10000
+REFRESH_LOCK_TTL = 30    # seconds a worker may hold a session's refresh lock
+REFRESH_WAIT = 5         # how long another worker waits for that refresh
+POLL_SECONDS = 0.1
+
+
+class SupabaseIdentity:
+    """
+    Verifies the Supabase access token behind a server-side session.
+
+    Verified identities are cached per token for IDENTITY_TTL, so the auth
+    check on each request is a dict lookup. Tokens close to expiry are
+    refreshed in the background and written back to the session store.
+    """
+
+    def __init__(self, supabase, store):
+        self.supabase = supabase
+        self.store = store
+        self._lock = threading.Lock()
+        self._cache = {}  # sha256(token) -> (valid_until, user dict or None)
+        self._refreshing = set()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="token-refresh")
+
+    def _key(self, token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def remember(self, access_token, user):
+        with self._lock:
+            if len(self._cache) >= MAX_CACHED:
+                now = time.monotonic()
+                self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+            self._cache[self._key(access_token)] = (time.monotonic() + IDENTITY_TTL, user)
+
+    def verify(self, access_token):
+        """{"id", "email"} of the token's user, or None if Supabase rejects it."""
+        key = self._key(access_token)
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        try:
+            res = self.supabase.auth.get_user(access_token)
+        except AuthApiError as e:
+            if not 400 <= (e.status or 0) < 500:
+                return self._stale(entry, e)
+            res = None  # revoked, signed out or malformed: a rejection, not an outage
+        except Exception as e:
+            return self._stale(entry, e)
+
+        user = {"id": res.user.id, "email": res.user.email} if res and res.user else None
+        if user:
+            self.remember(access_token, user)
+        else:
+            with self._lock:
+                self._cache[key] = (time.monotonic() + NEGATIVE_TTL, None)
+        return user
+
+    def _stale(self, entry, error):
+        """Supabase unreachable: the last identity verified for the token, for up to STALE_GRACE."""
+        print(f"[AUTH] token verification failed: {error}")
+        if entry and entry[0] + STALE_GRACE > time.monotonic():
+            return entry[1]
+        return None
+
+    def identify(self, sid):
+        """Identity behind a session id, refreshing its tokens as needed."""
+        tokens = self.store.load_tokens(sid)
+        if tokens is None:
+            return None
+        if tokens.expires_at and tokens.expires_at <= time.time():
+            tokens = self._refresh(sid, tokens.refresh_token)
+            if tokens is None:
+                return None
+        elif tokens.expires_at and tokens.expires_at - time.time() < REFRESH_MARGIN:
+            self.refresh_in_background(sid, tokens.refresh_token)
+        return self.verify(tokens.access_token)
+
+    def refresh_in_background(self, sid, refresh_token):
+        with self._lock:
+            if sid in self._refreshing:
+                return
+            self._refreshing.add(sid)
+        self._pool.submit(self._refresh, sid, refresh_token)
+
+    def _refresh(self, sid, refresh_token):
+        try:
+            if not self.store.lock_refresh(sid, REFRESH_LOCK_TTL):
+                return self._await_refresh(sid, refresh_token)
+            try:
+                current = self.store.load_tokens(sid)
+                if current is None or current.refresh_token != refresh_token:
+                    return current  # another worker refreshed (or logged out) meanwhile
+                res = self.supabase.auth.refresh_session(refresh_token)
+                if not (res and res.session):
+                    return None
+                s = res.session
+                self.store.save_tokens(sid, s.access_token, s.refresh_token, s.expires_at)
+            finally:
+                self.store.unlock_refresh(sid)
+            if res.user:
+                self.remember(s.access_token, {"id": res.user.id, "email": res.user.email})
+            return SessionTokens(s.access_token, s.refresh_token, s.expires_at)
+        except Exception as e:
+            print(f"[AUTH] token refresh failed: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._refreshing.discard(sid)
+
+    def _await_refresh(self, sid, refresh_token):
+        """The tokens another worker's refresh saves, or None if it doesn't within REFRESH_WAIT."""
+        deadline = time.monotonic() + REFRESH_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS)
+            tokens = self.store.load_tokens(sid)
+            if tokens is None or tokens.refresh_token != refresh_token:
+                return tokens
+        return None
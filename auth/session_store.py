@@ -0,0 +1,170 @@
+import random
+import secrets
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SessionTokens = namedtuple("SessionTokens", "access_token refresh_token expires_at")
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+class SessionStore:
+    """
+    Local SQLite store for Flask sessions and the Supabase tokens behind them.
+
+    The browser cookie only carries the session id; the user entry, flashes
+    and tokens stay on the server (one file shared by all workers on a host).
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS session_tokens ("
+            " sid TEXT PRIMARY KEY, access_token TEXT NOT NULL,"
+            " refresh_token TEXT, expires_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS token_refresh_locks ("
+            " sid TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        # One connection per thread; autocommit, WAL so readers never block on a writer.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, sid):
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, data):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, data, time.time() + self.ttl),
+        )
+        if random.random() < 0.01:
+            self.purge_expired()
+
+    def delete(self, sid):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        conn.execute("DELETE FROM session_tokens WHERE sid = ?", (sid,))
+
+    def purge_expired(self):
+        conn = self._conn()
+        conn.execute("DELETE FROM session_tokens WHERE sid IN (SELECT sid FROM sessions WHERE expires_at <= ?)", (time.time(),))
+        conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+
+    def save_tokens(self, sid, access_token, refresh_token, expires_at):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO session_tokens (sid, access_token, refresh_token, expires_at) VALUES (?, ?, ?, ?)",
+            (sid, access_token, refresh_token, expires_at),
+        )
+
+    def lock_refresh(self, sid, ttl):
+        """
+        True if this worker may refresh the session's tokens.  Refresh tokens
+        are single-use, so only one worker on the host spends it; the lock
+        expires after `ttl` seconds in case its holder dies.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM token_refresh_locks WHERE sid = ? AND expires_at <= ?", (sid, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO token_refresh_locks (sid, expires_at) VALUES (?, ?)", (sid, now + ttl)
+        )
+        return cur.rowcount == 1
+
+    def unlock_refresh(self, sid):
+        self._conn().execute("DELETE FROM token_refresh_locks WHERE sid = ?", (sid,))
+
+    def load_tokens(self, sid):
+        row = self._conn().execute(
+            "SELECT access_token, refresh_token, expires_at FROM session_tokens WHERE sid = ?", (sid,)
+        ).fetchone()
+        return SessionTokens(*row) if row else None
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid or new_session_id()
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def rotate(self):
+        """Issues a fresh session id (call on login to avoid session fixation)."""
+        self.previous_sid = self.sid
+        self.sid = new_session_id()
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.load(sid)
+            if data is not None:
+                return ServerSession(self.serializer.loads(data), sid=sid)
+        return ServerSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        response.vary.add("Cookie")
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        self.store.save(session.sid, self.serializer.dumps(dict(session)))
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
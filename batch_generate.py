@@ -0,0 +1,275 @@
+"""
+Bulk generation of itineraries, budgets and packing lists for many pods.
+
+    python batch_generate.py 12 13 14
+    python batch_generate.py --ids-file pods.txt --concurrency 8
+    python batch_generate.py --csv offsite.csv --user <supabase-uuid> --steps itinerary,packing
+
+A CSV has one pod per row with the create-pod fields as headers (name,
+destination, start_date, end_date, description, estimated_budget,
+preferred_transport, tags); the pods are created first, owned by --user.
+
+At most --concurrency pods are in the LLM pipeline at once.  Pods asking for
+the same itinerary (same destination, dates and description, as is usual for
+offsites and school trips) share one generation, summary and budget proposal,
+and packing extras are cached per destination.  Results are written
+--batch-size pods per transaction.
+
+Re-running the same command resumes: a step is skipped for any pod that
+already has that artifact (--force regenerates), and the pods created from a
+CSV are remembered in a progress file next to it, so they aren't created twice.
+"""
+import argparse
+import asyncio
+import contextvars
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from types import SimpleNamespace
+
+import app as web
+import pod_events
+import pod_taxonomy
+import usage
+from model import db, Pod, PodMember, PodItinerary, PodPacking, PodBudget
+from speculative import digest
+import agent.itnerary
+from agent.itnerary import agenerate_itinerary_from_prompt
+from agent.budget import asummarize_itinerary, apropose_budget_items, agenerate_budget_plan
+from agent.packing import aplan_packing_list
+
+STEPS = ("itinerary", "budget", "packing")
+POD_FIELDS = ("id", "name", "description", "destination", "start_date", "end_date",
+              "estimated_budget", "tags", "created_by")
+
+
+class Batch:
+    def __init__(self, steps, concurrency, batch_size, force):
+        self.steps = steps
+        self.batch_size = batch_size
+        self.force = force
+        self._slots = asyncio.Semaphore(concurrency)
+        # One thread owns the SQLAlchemy session for the whole run.
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-db")
+        self._shared = {}
+        self._pending = []
+        self._write_lock = asyncio.Lock()
+        self.done = self.failed = 0
+
+    async def db(self, fn, *args):
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._db, ctx.run, fn, *args)
+
+    async def shared(self, key, make):
+        """Runs `make()` once per key for the whole batch; concurrent callers await the same result."""
+        if key not in self._shared:
+            self._shared[key] = asyncio.ensure_future(make())
+        return await self._shared[key]
+
+    # ========== LOADING ==========
+
+    def load(self, pod_ids):
+        pods = {p.id: SimpleNamespace(**{f: getattr(p, f) for f in POD_FIELDS})
+                for p in Pod.query.filter(Pod.id.in_(pod_ids))}
+        have = {}
+        for kind, model in (("itinerary", PodItinerary), ("packing", PodPacking), ("budget", PodBudget)):
+            rows = db.session.query(model.pod_id, model.description).filter(model.pod_id.in_(pod_ids))
+            have[kind] = {pod_id: text for pod_id, text in rows}
+        db.session.rollback()  # end the read transaction; the snapshots above are detached
+        return pods, have
+
+    # ========== PIPELINE ==========
+
+    async def run(self, pod_ids):
+        pods, have = await self.db(self.load, pod_ids)
+        missing = [pod_id for pod_id in pod_ids if pod_id not in pods]
+        for pod_id in missing:
+            print(f"[BATCH] pod {pod_id}: not found")
+        self.failed += len(missing)
+
+        await asyncio.gather(*(self.pod(pods[pod_id], have) for pod_id in pod_ids if pod_id in pods))
+        await self.flush()
+        self._db.shutdown()
+
+    async def pod(self, pod, have):
+        todo = [s for s in self.steps if self.force or pod.id not in have[s]]
+        if not todo:
+            print(f"[BATCH] pod {pod.id}: up to date")
+            return
+        async with self._slots:
+            try:
+                with usage.attributed(pod.created_by, pod.id):
+                    result = await self.generate(pod, todo, have["itinerary"].get(pod.id))
+            except Exception as e:
+                print(f"[BATCH] pod {pod.id}: failed: {e}")
+                self.failed += 1
+                return
+        self._pending.append(result)
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def generate(self, pod, todo, itinerary):
+        result = {"pod": pod}
+        if "itinerary" in todo or not itinerary:
+            prompt = web.itinerary_prompt(pod)
+            session_id = f"batch-{digest(prompt)[:16]}"
+            itinerary = await self.shared(("itinerary", prompt),
+                                          lambda: agenerate_itinerary_from_prompt(session_id, prompt))
+            # Don't let the batch's chat turns pile up in the agent's memory.
+            agent.itnerary.chat_sessions.pop(session_id, None)
+            if itinerary.startswith("Sorry") or itinerary.startswith("<p>[Groq"):
+                raise RuntimeError(itinerary)
+            result["itinerary"] = itinerary
+
+        if "budget" in todo:
+            preference = web.budget_preference(pod)
+            key = digest(itinerary)
+            summary = await self.shared(("summary", key), lambda: asummarize_itinerary(itinerary))
+            if summary.startswith("["):  # API error text; let the budget agents retry it
+                summary = None
+            items = await self.shared(("budget", preference, key),
+                                      lambda: apropose_budget_items(preference, itinerary, summary=summary))
+            if items:
+                result["budget_items"] = items
+            else:
+                result["budget"] = await agenerate_budget_plan(f"batch-{pod.id}", preference, itinerary,
+                                                               summary=summary)
+
+        if "packing" in todo:
+            facts = await self.db(web.packing_facts, pod, itinerary)
+            result["packing"] = await aplan_packing_list(facts)
+        return result
+
+    # ========== WRITING ==========
+
+    async def flush(self):
+        async with self._write_lock:
+            batch, self._pending = self._pending, []
+            if batch:
+                await self.db(self.write, batch)
+
+    def write(self, batch):
+        """Saves a batch of pods' results in one transaction."""
+        try:
+            for result in batch:
+                pod = result["pod"]
+                if "itinerary" in result:
+                    web.save_artifact("itinerary", pod.id, result["itinerary"], pod.created_by, commit=False)
+                if "budget_items" in result:
+                    web.save_budget_items(pod.id, result["budget_items"], pod.created_by, commit=False)
+                elif "budget" in result:
+                    web.clear_budget_items(pod.id)
+                    web.save_budget(pod.id, result["budget"], pod.created_by, commit=False)
+                if "packing" in result:
+                    web.save_packing(pod.id, result["packing"], pod.created_by, commit=False)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[BATCH] write of {len(batch)} pods failed (re-run to retry them): {e}")
+            self.failed += len(batch)
+            return
+
+        for result in batch:
+            for kind in STEPS:
+                if kind in result or (kind == "budget" and "budget_items" in result):
+                    pod_events.publish(result["pod"].id, f"{kind}_updated", panel=kind)
+        self.done += len(batch)
+        print(f"[BATCH] saved {len(batch)} pods ({', '.join(str(r['pod'].id) for r in batch)})")
+
+
+# ========== CSV ==========
+
+def _date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+
+def create_pods(csv_path, user_id):
+    """Pod ids for the CSV's rows, creating the ones not created by an earlier run."""
+    progress_path = csv_path + ".progress.jsonl"
+    created = {}
+    if os.path.exists(progress_path):
+        with open(progress_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    created[entry["row"]] = entry["pod_id"]
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    new = []
+    for row_number, row in enumerate(rows, start=1):
+        if row_number in created:
+            continue
+        pod = Pod(
+            name=row["name"],
+            description=row.get("description", ""),
+            destination=row.get("destination", ""),
+            start_date=_date(row.get("start_date")),
+            end_date=_date(row.get("end_date")),
+            estimated_budget=int(row.get("estimated_budget") or 0),
+            preferred_transport=row.get("preferred_transport", ""),
+            tags=row.get("tags", ""),
+            invite_code=web.generate_invite_code(),
+            created_by=user_id,
+        )
+        db.session.add(pod)
+        new.append((row_number, pod))
+    if new:
+        db.session.flush()
+        for _, pod in new:
+            pod_taxonomy.sync(pod)
+        db.session.add_all([PodMember(user_id=user_id, pod_id=pod.id, role='admin') for _, pod in new])
+        db.session.commit()
+        with open(progress_path, "a", encoding="utf-8") as f:
+            for row_number, pod in new:
+                f.write(json.dumps({"row": row_number, "pod_id": pod.id}) + "\n")
+                created[row_number] = pod.id
+        print(f"[BATCH] created {len(new)} pods from {csv_path}")
+    return [created[n] for n in range(1, len(rows) + 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate itineraries, budgets and packing lists for many pods.")
+    parser.add_argument("pod_ids", nargs="*", type=int)
+    parser.add_argument("--ids-file", help="file with one pod id per line")
+    parser.add_argument("--csv", help="CSV of pod definitions to create and generate")
+    parser.add_argument("--user", help="Supabase user id owning pods created from --csv")
+    parser.add_argument("--steps", default=",".join(STEPS), help="comma-separated subset of " + ",".join(STEPS))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=20, help="pods saved per transaction")
+    parser.add_argument("--force", action="store_true", help="regenerate artifacts that already exist")
+    args = parser.parse_args(argv)
+
+    steps = tuple(s.strip() for s in args.steps.split(",") if s.strip())
+    if set(steps) - set(STEPS):
+        parser.error(f"--steps must be a subset of {','.join(STEPS)}")
+    if args.csv and not args.user:
+        parser.error("--csv needs --user")
+
+    with web.app.app_context():
+        pod_ids = list(args.pod_ids)
+        if args.ids_file:
+            with open(args.ids_file, encoding="utf-8") as f:
+                pod_ids += [int(line) for line in f if line.strip()]
+        if args.csv:
+            pod_ids += create_pods(args.csv, args.user)
+        pod_ids = list(dict.fromkeys(pod_ids))
+        if not pod_ids:
+            parser.error("no pods given")
+
+        started = time.perf_counter()
+        batch = Batch(steps, max(args.concurrency, 1), max(args.batch_size, 1), args.force)
+        asyncio.run(batch.run(pod_ids))
+        print(f"[BATCH] {batch.done} pods saved, {batch.failed} failed, "
+              f"{len(pod_ids) - batch.done - batch.failed} already up to date "
+              f"in {time.perf_counter() - started:.1f}s")
+    return 1 if batch.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Local budget arithmetic over structured line items.
+
+The LLM only proposes line items (category, day, quantity, unit cost,
+currency); totals, per-person splits, per-day and per-category rollups and
+what-if scenarios are computed here with NumPy, so tweaking a budget ("hotels
+20% cheaper", "one more traveller") never needs another model round trip: the
+budget panel's "What if" form previews a scenario through
+GET /pod/<id>/budget/items and saves it through POST /pod/<id>/budget/items.
+"""
+import html
+import json
+import math
+import re
+from dataclasses import dataclass, asdict
+
+import markdown
+import numpy as np
+
+CATEGORIES = ("Travel", "Hotel", "Food", "Sightseeing", "Miscellaneous")
+BASE_CURRENCY = "INR"
+
+# Offline conversion rates into BASE_CURRENCY; good enough for planning.
+FX_TO_INR = {
+    "INR": 1.0, "USD": 83.0, "EUR": 90.0, "GBP": 105.0, "AED": 22.6,
+    "THB": 2.3, "SGD": 62.0, "JPY": 0.56, "LKR": 0.28, "NPR": 0.62,
+}
+
+
+_TRUE = ("true", "1", "yes", "y", "on")
+_FALSE = ("false", "0", "no", "n", "off")
+
+
+def _number(value, default):
+    """A finite float; `default` only when the value is missing."""
+    number = default if value is None or value == "" else float(value)
+    if not math.isfinite(number):
+        raise ValueError(f"Not a finite number: {value!r}")
+    return number
+
+
+def _flag(value, default):
+    if value is None:
+        return default
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"Not a boolean: {value!r}")
+
+
+def check_currency(code):
+    """The upper-cased code if FX_TO_INR can convert it, else ValueError."""
+    code = str(code).strip().upper()
+    if code not in FX_TO_INR:
+        raise ValueError(f"Unknown currency: {code}")
+    return code
+
+
+@dataclass
+class LineItem:
+    category: str
+    description: str
+    quantity: float
+    unit_cost: float
+    currency: str = BASE_CURRENCY
+    day: int = 0              # 0 = whole trip (e.g. flights), otherwise the trip day
+    per_person: bool = True   # cost scales with the number of travellers
+
+    @classmethod
+    def from_dict(cls, data):
+        category = str(data.get("category", "Miscellaneous")).strip().title()
+        return cls(
+            category=category if category in CATEGORIES else "Miscellaneous",
+            description=str(data.get("description", "")).strip()[:255],
+            quantity=max(_number(data.get("quantity"), 1.0), 0.0),
+            unit_cost=max(_number(data.get("unit_cost"), 0.0), 0.0),
+            currency=check_currency(data.get("currency") or BASE_CURRENCY),
+            day=max(int(_number(data.get("day"), 0)), 0),
+            per_person=_flag(data.get("per_person"), True),
+        )
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def parse_line_items(text):
+    """Line items from an LLM reply that should contain a JSON array; bad entries are skipped."""
+    match = re.search(r"\[.*\]", text or "", re.S)
+    if not match:
+        return []
+    try:
+        raw = json.loads(match.group(0))
+    except ValueError:
+        return []
+    items = []
+    for entry in raw if isinstance(raw, list) else []:
+        try:
+            items.append(LineItem.from_dict(entry))
+        except (TypeError, ValueError, AttributeError):
+            continue
+    return items
+
+
+def compute(items, travelers=1, multipliers=None, currency=BASE_CURRENCY, budget_limit=None):
+    """
+    Totals for `items` in `currency`.
+
+    `multipliers` maps category -> factor for what-if scenarios
+    (e.g. {"Hotel": 0.8}); `travelers` scales the per-person items.  Raises
+    ValueError for a currency (of `currency` or an item) FX_TO_INR lacks.
+    """
+    travelers = max(int(travelers or 1), 1)
+    multipliers = multipliers or {}
+    n = len(items)
+    currency = check_currency(currency)
+
+    quantity = np.fromiter((i.quantity for i in items), float, n)
+    unit_cost = np.fromiter((i.unit_cost for i in items), float, n)
+    rate = np.fromiter((FX_TO_INR[check_currency(i.currency)] for i in items), float, n) / FX_TO_INR[currency]
+    heads = np.where(np.fromiter((i.per_person for i in items), bool, n), travelers, 1)
+    day = np.fromiter((i.day for i in items), int, n)
+
+    categories, category_idx = np.unique(np.array([i.category for i in items], dtype=object), return_inverse=True)
+    factor = np.array([float(multipliers.get(c, 1.0)) for c in categories])[category_idx] if n else np.ones(0)
+
+    amount = quantity * unit_cost * rate * heads * factor
+    by_category = np.bincount(category_idx, weights=amount, minlength=len(categories)) if n else np.zeros(0)
+    by_day = np.bincount(day, weights=amount) if n else np.zeros(1)
+
+    total = float(amount.sum())
+    summary = {
+        "currency": currency,
+        "travelers": travelers,
+        "total": round(total, 2),
+        "per_person": round(total / travelers, 2),
+        "by_category": {str(c): round(float(v), 2) for c, v in zip(categories, by_category)},
+        "trip_wide": round(float(by_day[0]), 2),
+        "by_day": {int(d): round(float(v), 2) for d, v in enumerate(by_day) if d and v},
+        "amounts": [round(float(a), 2) for a in amount],
+    }
+    if budget_limit:
+        summary["budget_limit"] = budget_limit
+        summary["within_budget"] = total <= budget_limit
+    return summary
+
+
+def _cell(text):
+    # Item descriptions come from the LLM: no raw HTML, and no "|" or newline breaking the table row.
+    return html.escape(" ".join(text.split())).replace("|", "\\|")
+
+
+def render_html(items, summary):
+    """Budget panel HTML: per-day line items plus category and total rollups."""
+    cur = summary["currency"]
+    lines = [f"**Travellers:** {summary['travelers']}  ", ""]
+    lines += ["| Day | Category | Item | Qty | Unit cost | Amount |", "|---|---|---|---|---|---|"]
+    order = sorted(range(len(items)), key=lambda k: (items[k].day or 0, CATEGORIES.index(items[k].category)))
+    for k in order:
+        item = items[k]
+        lines.append(
+            f"| {item.day or 'Trip'} | {item.category} | {_cell(item.description)} | {item.quantity:g}"
+            f"{' pp' if item.per_person else ''} | {item.currency} {item.unit_cost:,.0f} | {cur} {summary['amounts'][k]:,.0f} |"
+        )
+    lines += ["", "| Category | Amount |", "|---|---|"]
+    lines += [f"| {c} | {cur} {v:,.0f} |" for c, v in summary["by_category"].items()]
+    lines += ["", f"**Grand Total:** {cur} {summary['total']:,.0f} ({cur} {summary['per_person']:,.0f} per person)"]
+    if "within_budget" in summary:
+        status = "Within" if summary["within_budget"] else "Over"
+        lines.append(f"\n**Budget Status:** {status} ({cur} {summary['budget_limit']:,.0f})")
+    return markdown.markdown("\n".join(lines), extensions=["tables"])
@@ -9,7 +9,8 @@ DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
 class Config:
-    DB_URI = (
+    # DATABASE_URL overrides the MySQL settings, e.g. "sqlite://" for the tests.
+    DB_URI = os.getenv("DATABASE_URL") or (
     f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
     SSL_CA_PATH = os.path.join(os.path.dirname(__file__), "certs", "ca.pem")
@@ -19,4 +20,44 @@ class Config:
             "ssl_ca": SSL_CA_PATH
         },
         "echo": True  # Optional: logs queries
-    }
+    } if DB_URI.startswith("mysql") else {}
+
+    # Server-side sessions (auth/session_store.py): the cookie only holds the session id.
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(os.path.dirname(__file__), "sessions.sqlite3"))
+    SESSION_TTL = int(os.getenv("SESSION_TTL", 7 * 24 * 3600))
+
+    # Request profiling (profiling.py), off unless a rate or header is set.
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_HEADER = os.getenv("PROFILE_HEADER")  # e.g. "X-Profile"
+    # Users (Supabase ids or emails, comma-separated) who may read the profiles
+    # at /_debug/profiles; the endpoints aren't registered when empty.
+    PROFILE_VIEWERS = tuple(v.strip() for v in os.getenv("PROFILE_VIEWERS", "").split(",") if v.strip())
+
+    # Log an error and flag the response (X-Query-Budget-Exceeded) instead of a
+    # warning when a route exceeds its @query_budget or repeats a statement like
+    # an N+1 (query_budget.py); under app.testing these raise.
+    SQL_BUDGET_STRICT = os.getenv("SQL_BUDGET_STRICT", "").lower() in ("1", "true", "yes")
+
+    # Background precomputation after an itinerary is saved (speculative.py),
+    # e.g. "summary" or "summary,budget,packing"; off when empty.
+    SPECULATE = tuple(k.strip() for k in os.getenv("SPECULATE", "").split(",") if k.strip())
+
+    # Daily Groq token quotas per user and per pod (usage.py); 0 = no limit.
+    # Past the soft limit responses carry a warning header, past the hard one
+    # the AI routes answer 429.
+    LLM_USER_DAILY_SOFT = int(os.getenv("LLM_USER_DAILY_SOFT", "0"))
+    LLM_USER_DAILY_HARD = int(os.getenv("LLM_USER_DAILY_HARD", "0"))
+    LLM_POD_DAILY_SOFT = int(os.getenv("LLM_POD_DAILY_SOFT", "0"))
+    LLM_POD_DAILY_HARD = int(os.getenv("LLM_POD_DAILY_HARD", "0"))
+
+    # Full-text search backend (search_index.py): "mysql" uses the FULLTEXT
+    # indexes, "sqlite:<path>" a local FTS5 index kept current after commits.
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "mysql")
+
+    # Write-behind note ingestion (note_buffer.py): notes are acknowledged once
+    # in a local durable log and written to MySQL in batches of NOTE_BATCH_ROWS
+    # or every NOTE_FLUSH_MS.
+    NOTE_WRITE_BEHIND = os.getenv("NOTE_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+    NOTE_BATCH_ROWS = int(os.getenv("NOTE_BATCH_ROWS", "50"))
+    NOTE_FLUSH_MS = int(os.getenv("NOTE_FLUSH_MS", "200"))
@@ -0,0 +1,56 @@
+"""
+Per-worker cache of rendered pod page panels (templates/panels/).
+
+Entries are looked up by (pod, panel) and only served when the stored panel
+version matches the one read from the pods table, so another worker's write
+is picked up on the next view; writes in this worker also drop the entries
+straight away through `invalidate`.
+"""
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 4096
+
+
+class FragmentCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (pod_id, panel) -> (version, html)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, pod_id, panel, version):
+        key = (pod_id, panel)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, pod_id, panel, version, html):
+        key = (pod_id, panel)
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, pod_id, panels=None):
+        with self._lock:
+            if panels is None:
+                for key in [k for k in self._entries if k[0] == pod_id]:
+                    del self._entries[key]
+            else:
+                for panel in panels:
+                    self._entries.pop((pod_id, panel), None)
+
+
+panel_cache = FragmentCache()
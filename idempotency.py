@@ -0,0 +1,164 @@
+"""
+Idempotency keys for POST routes that create things or run LLM pipelines.
+
+Clients send an `Idempotency-Key` header (or an `idempotency_key` form field).
+The first request with a key runs the view and its response is kept for
+RESPONSE_TTL; retries with the same key get that response back immediately,
+and a retry arriving while the first is still running waits for it instead of
+starting a second LLM call.  Keys are scoped to the user and the URL.
+
+Responses live in a local SQLite table so every worker on the host sees them.
+"""
+import asyncio
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify, make_response, request, session, Response
+
+RESPONSE_TTL = 24 * 3600
+PENDING_TTL = 300        # a crashed worker's claim expires after this
+WAIT_SECONDS = 90        # how long a retry waits for the original to finish
+POLL_SECONDS = 0.2
+PENDING = "pending"
+
+
+class IdempotencyStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+            " key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key):
+        """True if this request owns `key` and should run the view."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (key, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO idempotency_keys (key, expires_at) VALUES (?, ?)",
+            (key, now + PENDING_TTL),
+        )
+        return cur.rowcount == 1
+
+    def lookup(self, key):
+        """None if unknown, PENDING while the first request runs, else (status, headers, body)."""
+        row = self._conn().execute(
+            "SELECT status, headers, body FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        if row[0] is None:
+            return PENDING
+        return row[0], json.loads(row[1]), row[2]
+
+    def complete(self, key, status, headers, body):
+        self._conn().execute(
+            "UPDATE idempotency_keys SET status = ?, headers = ?, body = ?, expires_at = ? WHERE key = ?",
+            (status, json.dumps(headers), body, time.time() + RESPONSE_TTL, key),
+        )
+
+    def release(self, key):
+        self._conn().execute("DELETE FROM idempotency_keys WHERE key = ?", (key,))
+
+
+class Idempotency:
+    """`@idempotent` view decorator; works for both plain and `async def` views."""
+
+    def __init__(self, store):
+        self.store = store
+
+    def request_key(self):
+        key = request.headers.get("Idempotency-Key") or request.form.get("idempotency_key")
+        if not key:
+            return None
+        user = session.get("user", {}).get("id", "anon")
+        return hashlib.sha256(f"{user}:{request.method}:{request.path}:{key}".encode()).hexdigest()
+
+    def _replay(self, saved):
+        status, headers, body = saved
+        response = Response(body, status=status, headers=headers)
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    def _in_progress(self):
+        return jsonify({"error": "A request with this Idempotency-Key is still in progress."}), 409
+
+    def _save(self, key, response):
+        if response.status_code >= 500 or response.is_streamed:
+            self.store.release(key)
+        else:
+            self.store.complete(key, response.status_code, list(response.headers.items()), response.get_data())
+
+    def _finish(self, key, rv):
+        response = make_response(rv)
+        self._save(key, response)
+        return response
+
+    def __call__(self, view):
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                key = self.request_key()
+                if key is None:
+                    return await view(*args, **kwargs)
+                # The store is blocking sqlite3: keep it off the event loop, like run_db.
+                deadline = time.monotonic() + WAIT_SECONDS
+                while not await asyncio.to_thread(self.store.claim, key):
+                    saved = await asyncio.to_thread(self.store.lookup, key)
+                    if saved is None:
+                        continue  # released after a failure; try to claim it ourselves
+                    if saved != PENDING:
+                        return self._replay(saved)
+                    if time.monotonic() > deadline:
+                        return self._in_progress()
+                    await asyncio.sleep(POLL_SECONDS)
+                try:
+                    rv = await view(*args, **kwargs)
+                except BaseException:
+                    await asyncio.to_thread(self.store.release, key)
+                    raise
+                response = make_response(rv)
+                await asyncio.to_thread(self._save, key, response)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = self.request_key()
+            if key is None:
+                return view(*args, **kwargs)
+            deadline = time.monotonic() + WAIT_SECONDS
+            while not self.store.claim(key):
+                saved = self.store.lookup(key)
+                if saved is None:
+                    continue
+                if saved != PENDING:
+                    return self._replay(saved)
+                if time.monotonic() > deadline:
+                    return self._in_progress()
+                time.sleep(POLL_SECONDS)
+            try:
+                rv = view(*args, **kwargs)
+            except BaseException:
+                self.store.release(key)
+                raise
+            return self._finish(key, rv)
+
+        return wrapper
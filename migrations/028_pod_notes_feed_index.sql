@@ -0,0 +1,3 @@
+-- Keyset pagination of the notes feed (notes_before / notes_after in app.py)
+-- seeks on (pod_id, created_at, id); without it every page scans the pod's notes.
+CREATE INDEX ix_pod_notes_feed ON pod_notes (pod_id, created_at, id);
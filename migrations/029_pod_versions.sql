@@ -0,0 +1,4 @@
+-- Pod-wide version and last change time behind the ETag / Last-Modified
+-- conditional GETs (conditional_page in app.py).
+ALTER TABLE pods ADD COLUMN version INT NOT NULL DEFAULT 1,
+                 ADD COLUMN updated_at DATETIME DEFAULT CURRENT_TIMESTAMP;
@@ -0,0 +1,6 @@
+-- Per-panel versions keying the rendered-fragment cache (fragment_cache.py).
+ALTER TABLE pods ADD COLUMN members_version INT NOT NULL DEFAULT 1,
+                 ADD COLUMN itinerary_version INT NOT NULL DEFAULT 1,
+                 ADD COLUMN packing_version INT NOT NULL DEFAULT 1,
+                 ADD COLUMN budget_version INT NOT NULL DEFAULT 1,
+                 ADD COLUMN notes_version INT NOT NULL DEFAULT 1;
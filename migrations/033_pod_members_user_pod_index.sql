@@ -0,0 +1,2 @@
+-- Dashboard keyset scan of a user's pods in pod id order (dashboard_cards in app.py).
+CREATE INDEX ix_pod_members_user_pod ON pod_members (user_id, pod_id);
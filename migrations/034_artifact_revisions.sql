@@ -0,0 +1,15 @@
+-- Append-only, delta-compressed history of pod artefacts (revisions.py);
+-- save_artifact records a revision on every itinerary/packing/budget save.
+CREATE TABLE artifact_revisions (
+    id INT NOT NULL AUTO_INCREMENT,
+    pod_id INT NOT NULL,
+    kind ENUM('itinerary', 'packing', 'budget') NOT NULL,
+    revision INT NOT NULL,
+    is_snapshot BOOL NOT NULL DEFAULT 0,
+    payload LONGBLOB NOT NULL,
+    created_by VARCHAR(36),
+    created_at DATETIME,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_artifact_revision UNIQUE (pod_id, kind, revision),
+    FOREIGN KEY (pod_id) REFERENCES pods (id) ON DELETE CASCADE
+);
@@ -0,0 +1,6 @@
+-- Optimistic locking of pod artefacts (version_id_col on the models): every
+-- ORM query on these tables selects row_version, so apply this before
+-- deploying the code that needs it.
+ALTER TABLE itinerary_items ADD COLUMN row_version INT NOT NULL DEFAULT 1;
+ALTER TABLE pod_packing ADD COLUMN row_version INT NOT NULL DEFAULT 1;
+ALTER TABLE pod_budgets ADD COLUMN row_version INT NOT NULL DEFAULT 1;
@@ -0,0 +1,20 @@
+-- Structured budgets (budget_engine.py): a pod's budget is kept as priced
+-- line items and its totals are computed in-process; pods.travelers
+-- overrides the member count for per-person costs.
+ALTER TABLE pods ADD COLUMN travelers INT NULL;
+
+CREATE TABLE budget_line_items (
+    id INT NOT NULL AUTO_INCREMENT,
+    pod_id INT NOT NULL,
+    category VARCHAR(30) NOT NULL,
+    day INT NOT NULL DEFAULT 0,
+    description VARCHAR(255),
+    quantity FLOAT NOT NULL DEFAULT 1,
+    unit_cost FLOAT NOT NULL DEFAULT 0,
+    currency VARCHAR(3) NOT NULL DEFAULT 'INR',
+    per_person BOOL NOT NULL DEFAULT 1,
+    created_by VARCHAR(36),
+    PRIMARY KEY (id),
+    FOREIGN KEY (pod_id) REFERENCES pods (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_budget_line_items_pod_id ON budget_line_items (pod_id);
@@ -0,0 +1,15 @@
+-- LLM token accounting (usage.py): one row per UTC day, user, pod and model,
+-- upserted in batches on uq_llm_usage.
+CREATE TABLE llm_usage (
+    id INT NOT NULL AUTO_INCREMENT,
+    day DATE NOT NULL,
+    user_id VARCHAR(36) NOT NULL DEFAULT '',
+    pod_id INT NOT NULL DEFAULT 0,
+    model VARCHAR(64) NOT NULL DEFAULT '',
+    calls INT NOT NULL DEFAULT 0,
+    prompt_tokens BIGINT NOT NULL DEFAULT 0,
+    completion_tokens BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_llm_usage UNIQUE (day, user_id, pod_id, model)
+);
+CREATE INDEX ix_llm_usage_pod_day ON llm_usage (pod_id, day);
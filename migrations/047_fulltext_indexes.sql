@@ -0,0 +1,5 @@
+-- Full-text search (search_index.py, SEARCH_BACKEND=mysql): the MATCH ...
+-- AGAINST queries need these indexes; SEARCH_BACKEND=sqlite:<path> does not.
+CREATE FULLTEXT INDEX ft_pods ON pods (name, description, destination, tags);
+CREATE FULLTEXT INDEX ft_itinerary_items ON itinerary_items (description);
+CREATE FULLTEXT INDEX ft_pod_notes ON pod_notes (note);
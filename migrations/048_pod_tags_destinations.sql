@@ -0,0 +1,57 @@
+-- Normalized pod tags and destination places (pod_taxonomy.py): written with
+-- every pod, and queried by the tag/destination filters and related pods.
+CREATE TABLE pod_tags (
+    id INT NOT NULL AUTO_INCREMENT,
+    pod_id INT NOT NULL,
+    tag VARCHAR(50) NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_pod_tag UNIQUE (pod_id, tag),
+    FOREIGN KEY (pod_id) REFERENCES pods (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_pod_tags_tag ON pod_tags (tag, pod_id);
+
+CREATE TABLE pod_destinations (
+    id INT NOT NULL AUTO_INCREMENT,
+    pod_id INT NOT NULL,
+    place VARCHAR(100) NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT uq_pod_destination UNIQUE (pod_id, place),
+    FOREIGN KEY (pod_id) REFERENCES pods (id) ON DELETE CASCADE
+);
+CREATE INDEX ix_pod_destinations_place ON pod_destinations (place, pod_id);
+
+-- Backfill from the existing pods: split on the separators pod_taxonomy.py
+-- uses, lower-case, turn - and _ into spaces, drop punctuation, squeeze
+-- spaces.  This matches pod_taxonomy.normalize except for its Unicode (NFKC)
+-- folding; `python pod_taxonomy.py backfill` rewrites the rows exactly.
+INSERT IGNORE INTO pod_tags (pod_id, tag)
+WITH RECURSIVE parts (pod_id, part, rest) AS (
+    SELECT id, SUBSTRING_INDEX(src, ',', 1), IF(LOCATE(',', src) > 0, SUBSTRING(src, LOCATE(',', src) + 1), NULL)
+    FROM (SELECT id, REGEXP_REPLACE(tags, '[;#\n]', ',') AS src FROM pods WHERE tags <> '') AS split
+    UNION ALL
+    SELECT pod_id, SUBSTRING_INDEX(rest, ',', 1), IF(LOCATE(',', rest) > 0, SUBSTRING(rest, LOCATE(',', rest) + 1), NULL)
+    FROM parts WHERE rest IS NOT NULL
+)
+SELECT pod_id, tag FROM (
+    SELECT pod_id, TRIM(LEFT(REGEXP_REPLACE(REGEXP_REPLACE(REGEXP_REPLACE(
+        LOWER(part), '[-_]', ' '), '[^[:alnum:][:space:]]', ''), '[[:space:]]+', ' '), 50)) AS tag
+    FROM parts
+) AS normalized
+WHERE tag <> '';
+
+INSERT IGNORE INTO pod_destinations (pod_id, place)
+WITH RECURSIVE parts (pod_id, part, rest) AS (
+    SELECT id, SUBSTRING_INDEX(src, ',', 1), IF(LOCATE(',', src) > 0, SUBSTRING(src, LOCATE(',', src) + 1), NULL)
+    FROM (SELECT id, REGEXP_REPLACE(destination,
+              '[;/&|\n]|[[:space:]]+and[[:space:]]+|[[:space:]]+[-–][[:space:]]+', ',', 1, 0, 'i') AS src
+          FROM pods WHERE destination <> '') AS split
+    UNION ALL
+    SELECT pod_id, SUBSTRING_INDEX(rest, ',', 1), IF(LOCATE(',', rest) > 0, SUBSTRING(rest, LOCATE(',', rest) + 1), NULL)
+    FROM parts WHERE rest IS NOT NULL
+)
+SELECT pod_id, place FROM (
+    SELECT pod_id, TRIM(LEFT(REGEXP_REPLACE(REGEXP_REPLACE(REGEXP_REPLACE(
+        LOWER(part), '[-_]', ' '), '[^[:alnum:][:space:]]', ''), '[[:space:]]+', ' '), 100)) AS place
+    FROM parts
+) AS normalized
+WHERE place <> '';
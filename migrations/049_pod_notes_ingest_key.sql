@@ -0,0 +1,6 @@
+-- Write-behind notes (note_buffer.py): each note carries its log key, so a
+-- batch replayed after a crash is never inserted twice.  NULL for notes
+-- written directly, which the unique key allows any number of.
+ALTER TABLE pod_notes
+    ADD COLUMN ingest_key VARCHAR(32) NULL,
+    ADD UNIQUE KEY ingest_key (ingest_key);
@@ -51,6 +51,8 @@ class LanguagePreference(db.Model):
 
 class Pod(db.Model):
     __tablename__ = 'pods'
+    # Full-text search (search_index.py, SEARCH_BACKEND=mysql)
+    __table_args__ = (db.Index('ft_pods', 'name', 'description', 'destination', 'tags', mysql_prefix='FULLTEXT'),)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -66,12 +68,27 @@ class Pod(db.Model):
     estimated_budget = db.Column(db.Integer)
     preferred_transport = db.Column(db.String(50))
     tags = db.Column(db.String(100))  # comma-separated
+    travelers = db.Column(db.Integer)  # budget head count; None = number of members
+
+    # Bumped by every write to the pod or its itinerary/packing/budget/notes/members;
+    # drives ETag/Last-Modified on the pod page and dashboard.
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(DateTime, default=datetime.utcnow, server_default=db.func.now())
+    # Per-panel versions keying the rendered-fragment cache (fragment_cache.py),
+    # so a new note doesn't re-render the itinerary panel and vice versa.
+    members_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    itinerary_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    packing_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    budget_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    notes_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
     members = db.relationship('PodMember', backref='pod', cascade="all, delete-orphan")
 
 
 class PodMember(db.Model):
     __tablename__ = 'pod_members'
+    # Dashboard keyset scan: a user's pods in pod id order (see dashboard_cards in app.py)
+    __table_args__ = (db.Index('ix_pod_members_user_pod', 'user_id', 'pod_id'),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(36), nullable=False)  # Supabase UUID (not FK if user table is external)
@@ -83,12 +100,16 @@ class PodMember(db.Model):
 
 class PodItinerary(db.Model):
     __tablename__ = 'itinerary_items'
+    __table_args__ = (db.Index('ft_itinerary_items', 'description', mysql_prefix='FULLTEXT'),)
 
     id = db.Column(db.Integer, primary_key=True)
     pod_id = db.Column(db.Integer, db.ForeignKey('pods.id', ondelete="CASCADE"))
     description = db.Column(db.Text, nullable=True)
     created_by = db.Column(db.String(36))  # user_id who added it
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Optimistic lock: UPDATEs match on the version they read, see save_artifact in app.py.
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {"version_id_col": row_version}
 
     pod = db.relationship("Pod", backref="itinerary_items")
 
@@ -100,6 +121,9 @@ class PodPacking(db.Model):
     description = db.Column(db.Text)
     created_by = db.Column(db.String(36))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Optimistic lock: UPDATEs match on the version they read, see save_artifact in app.py.
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {"version_id_col": row_version}
 
 
 class PodBudget(db.Model):
@@ -110,17 +134,98 @@ class PodBudget(db.Model):
     description = db.Column(db.Text, nullable=False)
     created_by = db.Column(db.String(36))  # UUID of user
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Optimistic lock: UPDATEs match on the version they read, see save_artifact in app.py.
+    row_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    __mapper_args__ = {"version_id_col": row_version}
     
     
+class BudgetLineItem(db.Model):
+    """One priced line of a pod's budget; totals are computed by budget_engine.py."""
+    __tablename__ = 'budget_line_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    pod_id = db.Column(db.Integer, db.ForeignKey('pods.id', ondelete='CASCADE'), nullable=False, index=True)
+    category = db.Column(db.String(30), nullable=False)
+    day = db.Column(db.Integer, nullable=False, default=0)  # 0 = whole trip
+    description = db.Column(db.String(255))
+    quantity = db.Column(db.Float, nullable=False, default=1)
+    unit_cost = db.Column(db.Float, nullable=False, default=0)
+    currency = db.Column(db.String(3), nullable=False, default='INR')
+    per_person = db.Column(db.Boolean, nullable=False, default=True)
+    created_by = db.Column(db.String(36))
+
+
 class PodNote(db.Model):
     __tablename__ = 'pod_notes'
+    # Keyset index for the paginated notes feed (see notes_before/notes_after in app.py)
+    __table_args__ = (
+        db.Index('ix_pod_notes_feed', 'pod_id', 'created_at', 'id'),
+        db.Index('ft_pod_notes', 'note', mysql_prefix='FULLTEXT'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     pod_id = db.Column(db.Integer, db.ForeignKey('pods.id', ondelete='CASCADE'), nullable=False)
     user_id = db.Column(db.String(36), nullable=False)  # Supabase UUID
     note = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Write-behind log key (note_buffer.py); makes re-flushing a batch a no-op.
+    ingest_key = db.Column(db.String(32), unique=True)
+
+
+class ArtifactRevision(db.Model):
+    """Append-only history of a pod's itinerary/packing/budget text (see revisions.py)."""
+    __tablename__ = 'artifact_revisions'
+    __table_args__ = (db.UniqueConstraint('pod_id', 'kind', 'revision', name='uq_artifact_revision'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    pod_id = db.Column(db.Integer, db.ForeignKey('pods.id', ondelete='CASCADE'), nullable=False)
+    kind = db.Column(Enum('itinerary', 'packing', 'budget', name='artifact_kind'), nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    is_snapshot = db.Column(db.Boolean, nullable=False, default=False)
+    payload = db.Column(db.LargeBinary(length=2**24), nullable=False)  # zlib(JSON): full text or line diff
+    created_by = db.Column(db.String(36))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class LLMUsage(db.Model):
+    """Groq tokens per UTC day, user, pod and model (see usage.py); upserted in batches."""
+    __tablename__ = 'llm_usage'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'user_id', 'pod_id', 'model', name='uq_llm_usage'),
+        db.Index('ix_llm_usage_pod_day', 'pod_id', 'day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(Date, nullable=False)
+    user_id = db.Column(db.String(36), nullable=False, default='')  # '' = not tied to a user
+    pod_id = db.Column(db.Integer, nullable=False, default=0)       # 0 = not tied to a pod
+    model = db.Column(db.String(64), nullable=False, default='')
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    completion_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class PodTag(db.Model):
+    """One normalized tag of a pod, parsed from Pod.tags (see pod_taxonomy.py)."""
+    __tablename__ = 'pod_tags'
+    __table_args__ = (
+        db.UniqueConstraint('pod_id', 'tag', name='uq_pod_tag'),
+        db.Index('ix_pod_tags_tag', 'tag', 'pod_id'),
+    )
 
+    id = db.Column(db.Integer, primary_key=True)
+    pod_id = db.Column(db.Integer, db.ForeignKey('pods.id', ondelete='CASCADE'), nullable=False)
+    tag = db.Column(db.String(50), nullable=False)
 
 
+class PodDestination(db.Model):
+    """One normalized place of a pod's destination ("Panaji, Goa" -> panaji, goa), see pod_taxonomy.py."""
+    __tablename__ = 'pod_destinations'
+    __table_args__ = (
+        db.UniqueConstraint('pod_id', 'place', name='uq_pod_destination'),
+        db.Index('ix_pod_destinations_place', 'place', 'pod_id'),
+    )
 
+    id = db.Column(db.Integer, primary_key=True)
+    pod_id = db.Column(db.Integer, db.ForeignKey('pods.id', ondelete='CASCADE'), nullable=False)
+    place = db.Column(db.String(100), nullable=False)
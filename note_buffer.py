@@ -0,0 +1,209 @@
+"""
+Write-behind ingestion of pod notes (NOTE_WRITE_BEHIND).
+
+`add_note` normally commits one transaction per note to MySQL.  In write-behind
+mode the note is appended to a local SQLite log (fsynced, shared by the workers
+on the host) and acknowledged with 202; a background thread in every worker
+moves the log into MySQL in one transaction per batch, once NOTE_BATCH_ROWS
+notes are waiting or every NOTE_FLUSH_MS, whichever comes first, then bumps the
+pods' notes panel and publishes `note_added`.
+
+An acknowledged note survives a worker crash: it stays in the log until the
+MySQL commit has succeeded.  A worker claims a batch with a lease, and a batch
+whose worker died is picked up again once the lease expires.  Every note
+carries its log key into PodNote.ingest_key (unique), so a batch that was
+committed but not yet removed from the log is never inserted twice.
+
+A note's created_at is stamped when its batch is written, not when it was
+queued, so the feed's (created_at, id) order is the order notes become
+visible and a client polling with ?after= never skips a late batch.  A batch
+MySQL rejects for anything but a lost connection is retried a note at a time;
+notes that still fail are moved to the log's `dead_notes` table (with the
+error) so they cannot hold up the notes queued behind them.
+"""
+import atexit
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+import pod_events
+from model import db, PodNote
+
+LEASE_SECONDS = 30
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)  # the database, not the notes
+
+
+class NoteLog:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS pending_notes ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, ingest_key TEXT NOT NULL UNIQUE,"
+            " pod_id INTEGER NOT NULL, user_id TEXT NOT NULL, note TEXT NOT NULL, created_at TEXT NOT NULL,"
+            " lease TEXT, lease_until REAL NOT NULL DEFAULT 0)"
+        )
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS dead_notes ("
+            " ingest_key TEXT PRIMARY KEY, pod_id INTEGER NOT NULL, user_id TEXT NOT NULL, note TEXT NOT NULL,"
+            " created_at TEXT NOT NULL, error TEXT NOT NULL, failed_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # The append is the acknowledgement, so it has to reach the disk.
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, pod_id, user_id, note, created_at):
+        key = uuid.uuid4().hex
+        self._conn().execute(
+            "INSERT INTO pending_notes (ingest_key, pod_id, user_id, note, created_at) VALUES (?, ?, ?, ?, ?)",
+            (key, pod_id, user_id, note, created_at.isoformat()),
+        )
+        return key
+
+    def claim(self, limit):
+        """Leases up to `limit` unleased (or expired) notes, oldest first; returns (lease, rows)."""
+        lease = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "UPDATE pending_notes SET lease = ?, lease_until = ? WHERE seq IN ("
+            " SELECT seq FROM pending_notes WHERE lease_until <= ? ORDER BY seq LIMIT ?)",
+            (lease, now + LEASE_SECONDS, now, limit),
+        )
+        rows = conn.execute(
+            "SELECT ingest_key, pod_id, user_id, note, created_at FROM pending_notes WHERE lease = ? ORDER BY seq",
+            (lease,),
+        ).fetchall()
+        return lease, rows
+
+    def done(self, lease):
+        self._conn().execute("DELETE FROM pending_notes WHERE lease = ?", (lease,))
+
+    def release(self, lease):
+        self._conn().execute("UPDATE pending_notes SET lease = NULL, lease_until = 0 WHERE lease = ?", (lease,))
+
+    def bury(self, key, error):
+        """Moves a note MySQL will not take from pending_notes to dead_notes."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO dead_notes (ingest_key, pod_id, user_id, note, created_at, error, failed_at)"
+                " SELECT ingest_key, pod_id, user_id, note, created_at, ?, ? FROM pending_notes WHERE ingest_key = ?",
+                (error, time.time(), key),
+            )
+            conn.execute("DELETE FROM pending_notes WHERE ingest_key = ?", (key,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class NoteBuffer:
+    def __init__(self, log, touch, batch_rows=50, flush_ms=200):
+        self.log = log
+        self.touch = touch  # touch_pod from app.py, bumps a pod's notes panel
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_ms / 1000
+        self._appended = 0
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        threading.Thread(target=self._run, name="note-write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def add(self, pod_id, user_id, note):
+        """Durably queues a note; returns (ingest key, time queued)."""
+        created_at = datetime.utcnow()
+        key = self.log.append(pod_id, user_id, note, created_at)
+        self._appended += 1
+        if self._appended >= self.batch_rows:
+            self._wakeup.set()
+        return key, created_at
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[NOTES] write-behind flush failed: {e}")
+
+    def flush(self):
+        """Moves the log into MySQL, a batch per transaction, until it is empty."""
+        with self._flush_lock:
+            self._appended = 0
+            while True:
+                lease, rows = self.log.claim(self.batch_rows)
+                if not rows:
+                    return
+                try:
+                    with self.app.app_context():
+                        pod_ids = self._write_batch(rows)
+                except Exception:
+                    self.log.release(lease)
+                    raise
+                self.log.done(lease)
+                for pod_id in pod_ids:
+                    pod_events.publish(pod_id, "note_added", panel="notes")
+                if len(rows) < self.batch_rows:
+                    return
+
+    def _write_batch(self, rows):
+        """Writes the batch, falling back to one note at a time if MySQL rejects it; returns the pods bumped."""
+        try:
+            return self._write(rows)
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            if len(rows) == 1:
+                self._bury(rows[0], e)
+                return []
+            print(f"[NOTES] batch of {len(rows)} notes rejected ({e}); writing them one at a time")
+        pod_ids = set()
+        for row in rows:
+            try:
+                pod_ids.update(self._write([row]))
+            except TRANSIENT_ERRORS:
+                raise
+            except Exception as e:
+                self._bury(row, e)
+        return sorted(pod_ids)
+
+    def _bury(self, row, error):
+        print(f"[NOTES] note {row[0]} for pod {row[1]} moved to dead_notes: {error}")
+        self.log.bury(row[0], f"{type(error).__name__}: {error}")
+
+    def _write(self, rows):
+        """Inserts the notes not already in MySQL and bumps their pods, in one transaction."""
+        keys = [row[0] for row in rows]
+        try:
+            stored = {k for (k,) in db.session.query(PodNote.ingest_key).filter(PodNote.ingest_key.in_(keys))}
+            new = [row for row in rows if row[0] not in stored]
+            now = datetime.utcnow()
+            db.session.add_all([
+                PodNote(ingest_key=key, pod_id=pod_id, user_id=user_id, note=note, created_at=now)
+                for key, pod_id, user_id, note, _queued_at in new
+            ])
+            pod_ids = sorted({row[1] for row in new})
+            for pod_id in pod_ids:
+                self.touch(pod_id, "notes")
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return pod_ids
@@ -0,0 +1,318 @@
+"""
+Deterministic packing lists from trip facts.
+
+The base list comes from precomputed item tables keyed by trip length,
+season and climate, activities found in the itinerary, and the travellers'
+health conditions and allergies (from their profiles).  Only items specific to
+the destination are left to the LLM, and that call is small and optional.
+"""
+import json
+import math
+import re
+from dataclasses import dataclass, field
+
+import markdown
+
+CATEGORIES = (
+    "Travel Essentials", "Clothing", "Toiletries", "Electronics",
+    "Activity Gear", "Health & Medical", "Destination Extras",
+)
+
+# Values people type into profile fields to mean "nothing".
+_EMPTY = {"", "none", "nil", "na", "n/a", "no", "nothing", "-", "null"}
+
+# ========== ITEM TABLES ==========
+
+ALWAYS = (
+    ("Travel Essentials", "Government photo ID (and passport if crossing borders)"),
+    ("Travel Essentials", "Tickets and hotel bookings (printed or offline copies)"),
+    ("Travel Essentials", "Cash and one backup card"),
+    ("Travel Essentials", "Daypack"),
+    ("Travel Essentials", "Reusable water bottle"),
+    ("Toiletries", "Toothbrush and toothpaste"),
+    ("Toiletries", "Deodorant"),
+    ("Toiletries", "Hand sanitizer and tissues"),
+    ("Toiletries", "Sunscreen"),
+    ("Electronics", "Phone and charger"),
+    ("Electronics", "Power bank"),
+    ("Health & Medical", "Basic first-aid kit (plasters, antiseptic)"),
+    ("Health & Medical", "Paracetamol and ORS sachets"),
+)
+
+LONG_TRIP = (  # more than a week away
+    ("Toiletries", "Travel-size laundry detergent"),
+    ("Toiletries", "Nail clipper"),
+    ("Electronics", "Extension cord / multi-plug"),
+)
+
+# Month -> season, following the Indian calendar most pods travel in.
+SEASON_BY_MONTH = {
+    12: "winter", 1: "winter", 2: "winter",
+    3: "summer", 4: "summer", 5: "summer",
+    6: "monsoon", 7: "monsoon", 8: "monsoon", 9: "monsoon",
+    10: "autumn", 11: "autumn",
+}
+
+SEASON_ITEMS = {
+    "winter": (("Clothing", "Light jacket or sweater"), ("Toiletries", "Moisturiser and lip balm")),
+    "summer": (("Clothing", "Breathable cotton clothes"), ("Clothing", "Sun hat or cap"),
+               ("Travel Essentials", "Sunglasses")),
+    "monsoon": (("Clothing", "Rain jacket or poncho"), ("Clothing", "Quick-dry clothes"),
+                ("Travel Essentials", "Compact umbrella"), ("Travel Essentials", "Waterproof pouch for phone"),
+                ("Health & Medical", "Mosquito repellent")),
+    "autumn": (("Clothing", "Light layer for evenings"),),
+}
+
+# Destination keywords -> climate, for places whose weather overrides the season.
+CLIMATE_KEYWORDS = {
+    "cold": ("ladakh", "leh", "spiti", "manali", "shimla", "kashmir", "gulmarg", "sonmarg", "sikkim",
+             "gangtok", "darjeeling", "auli", "mussoorie", "tawang", "kedarnath", "badrinath", "himalaya", "himalayas",
+             "himalayan", "nepal", "bhutan", "switzerland", "iceland", "norway", "alps", "snow"),
+    "beach": ("goa", "andaman", "havelock", "pondicherry", "puducherry", "gokarna", "varkala", "kovalam",
+              "lakshadweep", "maldives", "bali", "phuket", "krabi", "beach"),
+    "desert": ("jaisalmer", "bikaner", "thar", "kutch", "dubai", "abu dhabi", "desert"),
+}
+
+CLIMATE_ITEMS = {
+    "cold": (("Clothing", "Thermal innerwear"), ("Clothing", "Down or fleece jacket"),
+             ("Clothing", "Woollen cap, gloves and socks"), ("Toiletries", "Cold cream and lip balm"),
+             ("Health & Medical", "Altitude sickness tablets (ask your doctor)")),
+    "beach": (("Clothing", "Swimwear"), ("Clothing", "Flip-flops"), ("Toiletries", "Water-resistant sunscreen SPF 50"),
+              ("Travel Essentials", "Beach towel or sarong")),
+    "desert": (("Clothing", "Loose full-sleeve clothing"), ("Clothing", "Scarf or stole against sand"),
+               ("Clothing", "Warm layer for desert nights"), ("Toiletries", "Lip balm and saline eye drops")),
+}
+
+# Keywords match whole words, so inflected forms are listed; a trailing "*"
+# marks a stem that matches any word it starts ("diabet*": diabetes, diabetic).
+
+# Itinerary keywords -> activity.
+ACTIVITY_KEYWORDS = {
+    "trek": ("trek", "treks", "trekking", "hike", "hikes", "hiking", "trail", "trails", "summit", "climb",
+             "climbing"),
+    "water": ("snorkel", "snorkelling", "snorkeling", "scuba", "dive", "diving", "swim", "swimming", "kayak",
+              "kayaking", "surf", "surfing", "water sports", "parasailing"),
+    "rafting": ("rafting", "river crossing"),
+    "worship": ("temple", "temples", "mosque", "mosques", "gurudwara", "church", "churches", "monastery",
+                "monasteries", "shrine", "shrines", "dargah", "cathedral"),
+    "safari": ("safari", "safaris", "wildlife", "national park", "tiger reserve", "bird watching"),
+    "snow": ("ski", "skiing", "snowboard", "snowboarding", "snow point", "glacier", "glaciers"),
+    "camping": ("camp", "camps", "camping", "campsite", "tent", "tents", "bonfire"),
+    "nightlife": ("nightlife", "club", "clubs", "clubbing", "party", "parties", "pub", "pubs", "bar crawl"),
+    "road_trip": ("road trip", "self-drive", "drive to", "bike ride", "motorbike"),
+    "boat": ("boat", "boats", "boating", "cruise", "ferry", "houseboat", "shikara"),
+    "formal": ("conference", "business meeting", "wedding", "formal dinner", "reception"),
+}
+
+ACTIVITY_ITEMS = {
+    "trek": (("Clothing", "Trekking shoes (broken in)"), ("Clothing", "Moisture-wicking T-shirts"),
+             ("Activity Gear", "Trekking pole"), ("Activity Gear", "Headlamp"),
+             ("Health & Medical", "Blister plasters and muscle-relief spray")),
+    "water": (("Clothing", "Swimwear"), ("Activity Gear", "Quick-dry towel"),
+              ("Activity Gear", "Dry bag"), ("Toiletries", "Reef-safe sunscreen")),
+    "rafting": (("Clothing", "Quick-dry shorts and T-shirt"), ("Clothing", "Strapped sandals"),
+                ("Activity Gear", "Dry bag"), ("Clothing", "Spare change of clothes")),
+    "worship": (("Clothing", "Modest clothing covering shoulders and knees"), ("Clothing", "Scarf or head covering"),
+                ("Clothing", "Easy slip-on footwear"), ("Clothing", "Socks for hot temple floors")),
+    "safari": (("Clothing", "Neutral-coloured clothing (khaki, olive)"), ("Activity Gear", "Binoculars"),
+               ("Activity Gear", "Dust cover for camera"), ("Clothing", "Hat with a brim")),
+    "snow": (("Clothing", "Waterproof gloves"), ("Clothing", "Waterproof snow boots"),
+             ("Travel Essentials", "UV-protection sunglasses")),
+    "camping": (("Activity Gear", "Headlamp or torch with spare batteries"), ("Activity Gear", "Sleeping bag liner"),
+                ("Health & Medical", "Insect repellent"), ("Activity Gear", "Toilet paper and wet wipes")),
+    "nightlife": (("Clothing", "One smart-casual outfit"), ("Clothing", "Dress shoes")),
+    "road_trip": (("Electronics", "Car charger / USB adapter"), ("Travel Essentials", "Driving licence and vehicle papers"),
+                  ("Health & Medical", "Motion sickness tablets"), ("Travel Essentials", "Snacks and water for the road")),
+    "boat": (("Health & Medical", "Motion sickness tablets"), ("Clothing", "Windcheater")),
+    "formal": (("Clothing", "Formal or festive outfit"), ("Clothing", "Formal footwear"),
+               ("Toiletries", "Grooming kit")),
+}
+
+# Profile health conditions -> items.
+HEALTH_KEYWORDS = {
+    "asthma": ("asthma", "asthmatic", "copd", "breathing", "respiratory"),
+    "diabetes": ("diabet*", "sugar", "insulin"),
+    "blood_pressure": ("hypertension", "blood pressure", "bp", "high bp"),
+    "heart": ("heart", "cardiac", "angina"),
+    "migraine": ("migraine", "migraines", "headache", "headaches"),
+    "motion": ("motion sickness", "travel sickness", "vertigo", "nausea"),
+    "joints": ("arthritis", "joint", "joints", "knee", "knees", "back pain", "spondyl*"),
+    "thyroid": ("thyroid*",),
+    "epilepsy": ("epilep*", "seizure", "seizures"),
+    "pregnancy": ("pregnan*",),
+}
+
+HEALTH_ITEMS = {
+    "asthma": (("Health & Medical", "Inhaler (plus a spare) and spacer"), ("Health & Medical", "Face masks for dust")),
+    "diabetes": (("Health & Medical", "Glucometer, strips and lancets"), ("Health & Medical", "Insulin cooling pouch"),
+                 ("Health & Medical", "Glucose tablets or sweets")),
+    "blood_pressure": (("Health & Medical", "Blood pressure medication"),),
+    "heart": (("Health & Medical", "Heart medication and cardiologist's letter"),),
+    "migraine": (("Health & Medical", "Migraine medication"), ("Travel Essentials", "Eye mask and earplugs")),
+    "motion": (("Health & Medical", "Motion sickness tablets"),),
+    "joints": (("Health & Medical", "Pain-relief gel"), ("Health & Medical", "Knee or back support")),
+    "thyroid": (("Health & Medical", "Thyroid medication"),),
+    "epilepsy": (("Health & Medical", "Anti-seizure medication"), ("Travel Essentials", "Medical alert card")),
+    "pregnancy": (("Health & Medical", "Pregnancy records and doctor's contact"),
+                  ("Clothing", "Compression socks")),
+}
+
+# Profile allergies -> items.
+ALLERGY_KEYWORDS = {
+    "severe_food": ("peanut", "peanuts", "nut", "nuts", "tree nuts", "shellfish", "seafood", "prawn", "prawns",
+                    "fish", "egg", "eggs", "sesame"),
+    "gluten": ("gluten", "wheat", "celiac", "coeliac"),
+    "lactose": ("lactose", "dairy", "milk"),
+    "airborne": ("pollen", "dust", "hay fever", "mould", "mold"),
+    "insect": ("bee", "bees", "wasp", "wasps", "insect", "insects", "sting", "stings"),
+    "drug": ("penicillin", "sulfa", "sulpha", "aspirin", "ibuprofen", "antibiotic", "antibiotics", "medicine",
+             "medicines", "drug", "drugs"),
+}
+
+ALLERGY_ITEMS = {
+    "severe_food": (("Health & Medical", "Epinephrine auto-injector (if prescribed)"),
+                    ("Travel Essentials", "Allergy card in the local language"),
+                    ("Travel Essentials", "Safe snacks")),
+    "gluten": (("Travel Essentials", "Gluten-free snacks"), ("Travel Essentials", "Allergy card in the local language")),
+    "lactose": (("Health & Medical", "Lactase tablets"),),
+    "airborne": (("Health & Medical", "Face masks"), ("Health & Medical", "Antihistamine eye drops")),
+    "insect": (("Health & Medical", "Epinephrine auto-injector (if prescribed)"), ("Health & Medical", "Insect repellent")),
+    "drug": (("Travel Essentials", "Medical alert bracelet or card listing the drug allergy"),),
+}
+
+
+class KeywordIndex:
+    """One compiled regex over every keyword of a table; `match` returns the table keys found."""
+
+    def __init__(self, table):
+        self.key_of = {kw.rstrip("*"): key for key, keywords in table.items() for kw in keywords}
+        self.stems = tuple(sorted((kw[:-1] for keywords in table.values() for kw in keywords if kw.endswith("*")),
+                                  key=len, reverse=True))
+        alternation = "|".join(re.escape(kw) + (r"\w*" if kw in self.stems else "")
+                               for kw in sorted(self.key_of, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b(?:{alternation})\b", re.I)
+
+    def _key(self, word):
+        word = word.lower()
+        if word in self.key_of:
+            return self.key_of[word]
+        return self.key_of[next(stem for stem in self.stems if word.startswith(stem))]
+
+    def match(self, text):
+        return {self._key(m.group(0)) for m in self.pattern.finditer(text or "")}
+
+
+_CLIMATES = KeywordIndex(CLIMATE_KEYWORDS)
+_ACTIVITIES = KeywordIndex(ACTIVITY_KEYWORDS)
+_HEALTH = KeywordIndex(HEALTH_KEYWORDS)
+_ALLERGIES = KeywordIndex(ALLERGY_KEYWORDS)
+
+
+# ========== TRIP FACTS ==========
+
+@dataclass
+class TripFacts:
+    destination: str = ""
+    nights: int = 3
+    season: str = ""
+    climates: set = field(default_factory=set)
+    activities: set = field(default_factory=set)
+    health: set = field(default_factory=set)
+    allergies: set = field(default_factory=set)
+    has_medical_notes: bool = False
+
+
+def _meaningful(text):
+    return (text or "").strip().lower().strip(".") not in _EMPTY
+
+
+def trip_facts(destination="", start_date=None, end_date=None, text="", profiles=()):
+    """
+    Facts the tables are keyed on.  `text` is whatever describes the trip
+    (itinerary, pod description, tags); `profiles` are the travellers'
+    UserProfile rows (anything with `health_conditions` and `allergies`).
+    """
+    nights = (end_date - start_date).days if start_date and end_date else 3
+    health_text = " ".join(p.health_conditions for p in profiles if _meaningful(p.health_conditions))
+    allergy_text = " ".join(p.allergies for p in profiles if _meaningful(p.allergies))
+    return TripFacts(
+        destination=(destination or "").strip(),
+        nights=max(nights, 1),
+        season=SEASON_BY_MONTH.get(start_date.month, "") if start_date else "",
+        climates=_CLIMATES.match(destination),
+        activities=_ACTIVITIES.match(text),
+        health=_HEALTH.match(health_text),
+        allergies=_ALLERGIES.match(allergy_text),
+        has_medical_notes=bool(health_text or allergy_text),
+    )
+
+
+# ========== BUILD ==========
+
+def _clothing(nights):
+    days = nights + 1
+    # Plan on doing laundry once a week.
+    per_cycle = min(days, 7)
+    return (
+        ("Clothing", f"T-shirts / tops x{per_cycle}"),
+        ("Clothing", f"Underwear x{min(days + 1, 8)}"),
+        ("Clothing", f"Socks x{min(days, 7)} pairs"),
+        ("Clothing", f"Trousers / bottoms x{min(max(math.ceil(days / 3), 2), 4)}"),
+        ("Clothing", f"Sleepwear x{1 if days <= 7 else 2}"),
+        ("Clothing", "Comfortable walking shoes"),
+    )
+
+
+def build(facts):
+    """Category -> item names, in CATEGORIES order, without duplicates."""
+    rows = list(ALWAYS) + list(_clothing(facts.nights))
+    if facts.nights > 7:
+        rows += LONG_TRIP
+    # A cold or desert destination dresses for that instead of the calendar; rain still applies.
+    if facts.season == "monsoon" or not {"cold", "desert"} & facts.climates:
+        rows += SEASON_ITEMS.get(facts.season, ())
+    for table, keys in ((CLIMATE_ITEMS, facts.climates), (ACTIVITY_ITEMS, facts.activities),
+                        (HEALTH_ITEMS, facts.health), (ALLERGY_ITEMS, facts.allergies)):
+        for key in sorted(keys):
+            rows += table[key]
+    if facts.has_medical_notes:
+        rows.append(("Health & Medical", "Regular medication, prescriptions and doctor's contact"))
+        if facts.allergies:
+            rows.append(("Health & Medical", "Antihistamine tablets"))
+
+    packing = {category: [] for category in CATEGORIES}
+    seen = set()
+    for category, item in rows:
+        if item.lower() not in seen:
+            seen.add(item.lower())
+            packing[category].append(item)
+    return {c: items for c, items in packing.items() if items}
+
+
+def parse_extras(text, limit=8):
+    """Item names from an LLM reply that should contain a JSON array of strings."""
+    match = re.search(r"\[.*\]", text or "", re.S)
+    if not match:
+        return []
+    try:
+        raw = json.loads(match.group(0))
+    except ValueError:
+        return []
+    return [str(item).strip()[:120] for item in raw if isinstance(item, str) and item.strip()][:limit] \
+        if isinstance(raw, list) else []
+
+
+def with_extras(packing, extras):
+    seen = {item.lower() for items in packing.values() for item in items}
+    fresh = [e for e in extras if e.lower() not in seen]
+    return {**packing, "Destination Extras": fresh} if fresh else packing
+
+
+def render_html(packing, facts):
+    days = facts.nights + 1
+    where = f" to {facts.destination}" if facts.destination else ""
+    lines = [f"**Packing list for {days} days{where}**" + (f" ({facts.season})" if facts.season else ""), ""]
+    for category, items in packing.items():
+        lines += [f"### {category}", ""] + [f"- {item}" for item in items] + [""]
+    lines.append("_Clothing quantities are per person._")
+    return markdown.markdown("\n".join(lines))
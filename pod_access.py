@@ -0,0 +1,149 @@
+"""
+Pod membership checks for the pod routes.
+
+`@pod_access` lets a request through only when the logged-in user is a member
+of the route's pod (its `pod_id` argument) and puts their role in `g.pod_role`;
+`@pod_access(role="admin")` also requires that role.  Anonymous users are sent
+to the login page (401 for JSON/fetch calls) and non-members get 403.
+
+Roles are cached per worker for TTL_SECONDS, so the check costs no query on
+most requests.  Only memberships are cached, never their absence, so a user
+who just joined through another worker gets in straight away.  A PodMember
+row this worker inserts, updates or deletes through the ORM drops its cache
+entry when the transaction commits, so a removal or role change applies here
+at once; one made by another worker (or by bulk SQL) applies once the entry
+expires.
+"""
+import asyncio
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import abort, g, jsonify, redirect, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from model import db, PodMember
+
+TTL_SECONDS = 60
+MAX_ENTRIES = 16384
+
+
+class MembershipCache:
+    def __init__(self, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (user_id, pod_id) -> (role, expires_at)
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, user_id, pod_id):
+        """The cached role, or None when it has to be looked up."""
+        key = (user_id, pod_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def role(self, user_id, pod_id):
+        """The user's role in the pod ('admin' / 'member'), or None if not a member."""
+        role = self.cached(user_id, pod_id)
+        return role if role is not None else self.load(user_id, pod_id)
+
+    def load(self, user_id, pod_id):
+        """Reads the role from pod_members and caches it."""
+        row = (
+            db.session.query(PodMember.role)
+            .filter(PodMember.user_id == user_id, PodMember.pod_id == pod_id)
+            .first()
+        )
+        if row is None:
+            return None
+        role = row[0] or "member"
+        with self._lock:
+            self._entries[(user_id, pod_id)] = (role, time.monotonic() + self.ttl)
+            self._entries.move_to_end((user_id, pod_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return role
+
+    def invalidate(self, user_id=None, pod_id=None):
+        """Drops the entries of a user, a pod, or one (user, pod) pair."""
+        with self._lock:
+            for key in [k for k in self._entries
+                        if (user_id is None or k[0] == user_id) and (pod_id is None or k[1] == pod_id)]:
+                del self._entries[key]
+
+
+memberships = MembershipCache()
+
+
+def _member_changed(mapper, connection, member):
+    changed = object_session(member).info.setdefault("pod_access_changed", set())
+    changed.add((member.user_id, member.pod_id))
+
+
+def _apply_changes(sess):
+    for user_id, pod_id in sess.info.pop("pod_access_changed", ()):
+        memberships.invalidate(user_id, pod_id)
+
+
+def _discard_changes(sess, previous_transaction):
+    sess.info.pop("pod_access_changed", None)
+
+
+for _event in ("after_insert", "after_update", "after_delete"):
+    event.listen(PodMember, _event, _member_changed)
+# Flask-SQLAlchemy's sessions subclass Session, so this sees every commit.
+event.listen(Session, "after_commit", _apply_changes)
+event.listen(Session, "after_soft_rollback", _discard_changes)
+
+
+def _denied(status):
+    if status == 403:
+        abort(403)
+    if request.is_json or request.headers.get("X-Requested-With") == "fetch":
+        return jsonify({"error": "login required"}), 401
+    return redirect('/login')
+
+
+def pod_access(view=None, *, role=None):
+    """Route decorator enforcing pod membership (and `role`, if given)."""
+    if view is None:
+        return lambda v: pod_access(v, role=role)
+
+    def allowed(found):
+        if found is None or (role and found != role):
+            return False
+        g.pod_role = found
+        return True
+
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            if 'user' not in session:
+                return _denied(401)
+            user_id, pod_id = session['user']['id'], kwargs['pod_id']
+            found = memberships.cached(user_id, pod_id)
+            if found is None:
+                found = await asyncio.to_thread(memberships.load, user_id, pod_id)  # blocking DB read, like run_db
+            if not allowed(found):
+                return _denied(403)
+            return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'user' not in session:
+            return _denied(401)
+        if not allowed(memberships.role(session['user']['id'], kwargs['pod_id'])):
+            return _denied(403)
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,95 @@
+"""
+Per-pod change events pushed to open pod pages over Server-Sent Events.
+
+Write routes call `publish(pod_id, event, panel=...)`; every browser that has
+`/pod/<id>/events` open then re-fetches just that panel.  The broker lives in
+process memory, so events reach the clients connected to the same worker --
+run the event stream under the single-worker ASGI mode (asgi.py) where one
+event loop holds all the open streams.
+
+Under a plain WSGI server (`python app.py`, gunicorn sync or gthread workers)
+every open pod page holds a worker thread for as long as the page is open,
+so a handful of open tabs can take all of a worker's threads; size the
+thread pool for it or serve through asgi.py.
+"""
+import asyncio
+import json
+import queue
+import threading
+from collections import defaultdict
+
+KEEPALIVE_SECONDS = 15
+
+_lock = threading.Lock()
+_subscribers = defaultdict(set)  # pod_id -> {deliver callables}
+
+
+def publish(pod_id, event, **data):
+    message = json.dumps({"event": event, **data})
+    with _lock:
+        targets = list(_subscribers.get(pod_id, ()))
+    for deliver in targets:
+        try:
+            deliver(message)
+        except RuntimeError:
+            # The subscriber's event loop is already closed; close() will drop it.
+            pass
+
+
+def subscriber_count(pod_id):
+    with _lock:
+        return len(_subscribers.get(pod_id, ()))
+
+
+class EventStream:
+    """
+    `text/event-stream` body for one pod.
+
+    Iterating it blocks on a thread queue (plain WSGI workers); async iteration
+    waits on the event loop instead (asgi.py), so idle streams cost no thread.
+    """
+
+    def __init__(self, pod_id):
+        self.pod_id = pod_id
+        self._deliver = None
+
+    def _subscribe(self, deliver):
+        self._deliver = deliver
+        with _lock:
+            _subscribers[self.pod_id].add(deliver)
+
+    def close(self):
+        if self._deliver is None:
+            return
+        with _lock:
+            subscribers = _subscribers.get(self.pod_id)
+            if subscribers is not None:
+                subscribers.discard(self._deliver)
+                if not subscribers:
+                    del _subscribers[self.pod_id]
+        self._deliver = None
+
+    def __iter__(self):
+        messages = queue.Queue()
+        self._subscribe(messages.put)
+        yield ": connected\n\n"
+        while True:
+            try:
+                message = messages.get(timeout=KEEPALIVE_SECONDS)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {message}\n\n"
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        messages = asyncio.Queue()
+        self._subscribe(lambda message: loop.call_soon_threadsafe(messages.put_nowait, message))
+        yield ": connected\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(messages.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield f"data: {message}\n\n"
@@ -0,0 +1,165 @@
+"""
+Normalized tags and destinations of pods.
+
+Pod.tags is free comma-separated text and Pod.destination free text, so
+"adventure pods" or "pods going to Goa" used to mean scanning and splitting
+every row.  Each pod's tags and destination places are also kept as rows in
+`pod_tags` and `pod_destinations` (normalized: casefolded, punctuation and
+extra spaces dropped), indexed by tag / place, and written with the pod.
+
+    "Trek, #Adventure , road-trip"  ->  trek, adventure, road trip
+    "Panaji, Goa"                   ->  panaji, goa
+
+The tables come from migrations/048_pod_tags_destinations.sql, which also
+fills them from existing pods.  To rewrite every pod's rows with exactly the
+normalization below (idempotent, resumable):
+
+    python pod_taxonomy.py backfill
+"""
+import argparse
+import re
+import unicodedata
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+
+from model import db, Pod, PodDestination, PodTag
+
+TAG_LENGTH = PodTag.tag.type.length
+PLACE_LENGTH = PodDestination.place.type.length
+DESTINATION_WEIGHT = 2  # a shared place counts as much as two shared tags in related_pods
+
+_TAG_SPLIT = re.compile(r"[,;#\n]")
+_PLACE_SPLIT = re.compile(r"[,;/&|\n]|\s+and\s+|\s+[-–]\s+", re.I)
+_JUNK = re.compile(r"[^\w\s]")
+
+
+def normalize(text, length=TAG_LENGTH):
+    text = unicodedata.normalize("NFKC", text or "").casefold().replace("-", " ").replace("_", " ")
+    return " ".join(_JUNK.sub("", text).split())[:length].strip()
+
+
+def _unique(values):
+    return list(dict.fromkeys(v for v in values if v))
+
+
+def parse_tags(text):
+    """Normalized tags of a Pod.tags string, in order, without duplicates."""
+    return _unique(normalize(t) for t in _TAG_SPLIT.split(text or ""))
+
+
+def parse_places(text):
+    """Normalized places of a destination, most specific first."""
+    return _unique(normalize(p, PLACE_LENGTH) for p in _PLACE_SPLIT.split(text or ""))
+
+
+def destination_key(text):
+    """The most specific place of a destination ("Panaji, Goa" -> "panaji"), or ''."""
+    places = parse_places(text)
+    return places[0] if places else ""
+
+
+def _rows(pod_id, tags, destination):
+    return ([{"pod_id": pod_id, "tag": t} for t in parse_tags(tags)],
+            [{"pod_id": pod_id, "place": p} for p in parse_places(destination)])
+
+
+def sync(pod):
+    """Rewrites the pod's tag and place rows from its columns; the caller commits."""
+    if pod.id is None:
+        db.session.flush()
+    db.session.execute(delete(PodTag).where(PodTag.pod_id == pod.id))
+    db.session.execute(delete(PodDestination).where(PodDestination.pod_id == pod.id))
+    tags, places = _rows(pod.id, pod.tags, pod.destination)
+    if tags:
+        db.session.execute(insert(PodTag), tags)
+    if places:
+        db.session.execute(insert(PodDestination), places)
+
+
+# ========== QUERIES ==========
+
+def tagged_pod_ids(*tags, match_all=False):
+    """Select of the ids of pods with any (or all) of the tags."""
+    wanted = _unique(normalize(t) for t in tags)
+    query = select(PodTag.pod_id).where(PodTag.tag.in_(wanted))
+    if match_all and len(wanted) > 1:
+        query = query.group_by(PodTag.pod_id).having(func.count() == len(wanted))
+    return query
+
+
+def destination_pod_ids(destination):
+    """Select of the ids of pods going to the destination's most specific place."""
+    return select(PodDestination.pod_id).where(PodDestination.place == destination_key(destination))
+
+
+def pods_tagged(*tags, match_all=False):
+    return Pod.query.filter(Pod.id.in_(tagged_pod_ids(*tags, match_all=match_all)))
+
+
+def pods_going_to(destination):
+    return Pod.query.filter(Pod.id.in_(destination_pod_ids(destination)))
+
+
+def related_pod_ids(pod_id, limit=10):
+    """[(pod id, score)] of other pods sharing places or tags with this one, best first."""
+    places = select(PodDestination.place).where(PodDestination.pod_id == pod_id)
+    tags = select(PodTag.tag).where(PodTag.pod_id == pod_id)
+    shared = union_all(
+        select(PodDestination.pod_id.label("pod_id"), literal(DESTINATION_WEIGHT).label("weight"))
+        .where(PodDestination.place.in_(places), PodDestination.pod_id != pod_id),
+        select(PodTag.pod_id.label("pod_id"), literal(1).label("weight"))
+        .where(PodTag.tag.in_(tags), PodTag.pod_id != pod_id),
+    ).subquery()
+    score = func.sum(shared.c.weight)
+    rows = (
+        db.session.query(shared.c.pod_id, score)
+        .group_by(shared.c.pod_id)
+        .order_by(score.desc(), shared.c.pod_id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [(pod_id, int(total)) for pod_id, total in rows]
+
+
+# ========== BACKFILL ==========
+
+def backfill(batch_size=500):
+    """Rewrites every pod's rows, batch_size pods per transaction."""
+    last_id, total = 0, 0
+    while True:
+        pods = (
+            db.session.query(Pod.id, Pod.tags, Pod.destination)
+            .filter(Pod.id > last_id)
+            .order_by(Pod.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not pods:
+            break
+        ids = [pod_id for pod_id, _, _ in pods]
+        tags, places = [], []
+        for pod_id, pod_tags, destination in pods:
+            t, p = _rows(pod_id, pod_tags, destination)
+            tags += t
+            places += p
+        db.session.execute(delete(PodTag).where(PodTag.pod_id.in_(ids)))
+        db.session.execute(delete(PodDestination).where(PodDestination.pod_id.in_(ids)))
+        if tags:
+            db.session.execute(insert(PodTag), tags)
+        if places:
+            db.session.execute(insert(PodDestination), places)
+        db.session.commit()
+        last_id = ids[-1]
+        total += len(ids)
+        print(f"[TAXONOMY] {total} pods backfilled (up to id {last_id})")
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the normalized pod tag and destination tables.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=500, help="pods per transaction")
+    args = parser.parse_args()
+    from app import app
+    with app.app_context():
+        backfill(max(args.batch_size, 1))
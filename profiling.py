@@ -0,0 +1,140 @@
+"""
+Opt-in sampling profiler for Flask requests.
+
+Profiles a fraction of requests (PROFILE_SAMPLE_RATE) plus any request that
+carries the PROFILE_HEADER header, and writes one cProfile file per request
+to PROFILE_DIR, named after the time, endpoint, pod id and duration.
+
+    GET /_debug/profiles             slowest recent profiles (JSON)
+    GET /_debug/profiles/<name>      top functions of one profile (text)
+
+Profiles show call stacks, SQL and timings, so these two views only exist when
+PROFILE_VIEWERS names the users (Supabase ids or emails) allowed to read them,
+and answer 404 to anyone else.
+
+Only one request is profiled at a time (cProfile can't nest); while one is
+running, other sampled requests go unprofiled.  Under the ASGI mode an async
+view's profile also contains whatever else ran on the event loop meanwhile.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+from flask import abort, g, jsonify, request, session, Response
+
+RECENT_FILES = 500
+_NAME = re.compile(r"^(\d+)_([\w.]+)_(\d+|-)_(\d+)ms\.prof$")
+SORT_KEYS = ("cumulative", "tottime", "calls")
+
+
+class RequestProfiler:
+    def __init__(self, app=None, directory="profiles", sample_rate=0.0, header=None, viewers=()):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.header = header
+        self.viewers = set(viewers)
+        self._busy = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0 or bool(self.header)
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self.start)
+        app.teardown_request(self.stop)
+        if self.viewers:
+            app.add_url_rule("/_debug/profiles", "list_profiles", self.list_profiles)
+            app.add_url_rule("/_debug/profiles/<name>", "show_profile", self.show_profile)
+
+    def require_viewer(self):
+        user = session.get("user") or {}
+        if not ({user.get("id"), user.get("email")} & self.viewers):
+            abort(404)  # don't advertise the endpoints
+
+    def wanted(self):
+        if request.endpoint in (None, "static", "list_profiles", "show_profile"):
+            return False
+        if self.header and request.headers.get(self.header):
+            return True
+        return random.random() < self.sample_rate
+
+    def start(self):
+        if not self.wanted() or not self._busy.acquire(blocking=False):
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns the hook.
+            self._busy.release()
+            return
+        g._profiler = profiler
+        g._profile_started = time.perf_counter()
+
+    def stop(self, exc=None):
+        profiler = g.pop("_profiler", None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+            duration_ms = int((time.perf_counter() - g.pop("_profile_started")) * 1000)
+            pod_id = (request.view_args or {}).get("pod_id", "-")
+            name = f"{int(time.time() * 1000)}_{request.endpoint}_{pod_id}_{duration_ms}ms.prof"
+            profiler.dump_stats(os.path.join(self.directory, name))
+            self.prune()
+        finally:
+            self._busy.release()
+
+    def prune(self):
+        # Keep the directory bounded: drop the oldest files beyond RECENT_FILES.
+        names = sorted(n for n in os.listdir(self.directory) if _NAME.match(n))
+        for name in names[:-RECENT_FILES]:
+            os.remove(os.path.join(self.directory, name))
+
+    def recent(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            match = _NAME.match(name)
+            if match:
+                started, endpoint, pod_id, duration = match.groups()
+                entries.append({
+                    "name": name,
+                    "endpoint": endpoint,
+                    "pod_id": None if pod_id == "-" else pod_id,
+                    "duration_ms": int(duration),
+                    "at": int(started) / 1000,
+                })
+        entries.sort(key=lambda e: e["at"], reverse=True)
+        return entries[:RECENT_FILES]
+
+    def list_profiles(self):
+        self.require_viewer()
+        top = request.args.get("top", 20, type=int)
+        endpoint = request.args.get("endpoint")
+        entries = [e for e in self.recent() if not endpoint or e["endpoint"] == endpoint]
+        entries.sort(key=lambda e: e["duration_ms"], reverse=True)
+        return jsonify({"profiles": entries[:top]})
+
+    def show_profile(self, name):
+        self.require_viewer()
+        if not _NAME.match(name):
+            abort(404)
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            abort(404)
+        out = io.StringIO()
+        stats = pstats.Stats(path, stream=out)
+        sort = request.args.get("sort", "cumulative")
+        stats.sort_stats(sort if sort in SORT_KEYS else "cumulative")
+        stats.print_stats(request.args.get("limit", 40, type=int))
+        return Response(out.getvalue(), mimetype="text/plain")
@@ -0,0 +1,115 @@
+"""
+Per-request SQL accounting: query count and time, N+1 detection and budgets.
+
+Every statement run during a request is counted by shape (its SQL text, which
+SQLAlchemy keeps parameterised).  After the view:
+
+  * `Server-Timing: db;dur=...;desc="N queries"` is added to the response;
+  * a shape run N_PLUS_ONE_THRESHOLD times or more is reported as a likely
+    N+1 (a query inside a loop);
+  * a view declared with `@query_budget(n)` that ran more than n statements
+    is reported too.
+
+Reports are logged as warnings.  With SQL_BUDGET_STRICT they are logged as
+errors and the response is flagged with an X-Query-Budget-Exceeded header;
+under app.testing they raise QueryBudgetExceeded, so a regression fails the
+test that made the request (tests/test_query_budget.py covers the budgeted
+routes).
+"""
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = 5
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Declares the most SQL statements one request to this view may run."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def _stats():
+    if not has_app_context():
+        return None
+    return g.get("_query_stats")
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _stats() is not None:
+        conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats()
+    if stats is None:
+        return
+    started = conn.info.get("_query_started")
+    if started:
+        stats.seconds += time.perf_counter() - started.pop()
+    stats.count += 1
+    stats.shapes[" ".join(statement.split())] += 1
+
+
+class QueryBudget:
+    def __init__(self, app=None, strict=False):
+        self.strict = strict
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        # Listening on the Engine class covers the engine Flask-SQLAlchemy
+        # creates lazily.
+        if not event.contains(Engine, "before_cursor_execute", _before_execute):
+            event.listen(Engine, "before_cursor_execute", _before_execute)
+            event.listen(Engine, "after_cursor_execute", _after_execute)
+        app.before_request(self.start)
+        app.after_request(self.finish)
+
+    def start(self):
+        g._query_stats = QueryStats()
+
+    def finish(self, response):
+        stats = g.pop("_query_stats", None)
+        if stats is None:
+            return response
+        response.headers.add("Server-Timing", f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"')
+
+        problems = []
+        view = self.app.view_functions.get(request.endpoint)
+        budget = getattr(view, "query_budget", None)
+        if budget is not None and stats.count > budget:
+            problems.append(f"{stats.count} queries, budget is {budget}")
+        for shape, n in stats.repeated():
+            problems.append(f"possible N+1, ran {n}x: {shape[:200]}")
+
+        if problems:
+            message = f"[SQL] {request.method} {request.path} ({request.endpoint}): " + "; ".join(problems)
+            if self.app.testing:
+                raise QueryBudgetExceeded(message)
+            if self.strict:
+                self.app.logger.error(message)
+                response.headers["X-Query-Budget-Exceeded"] = "; ".join(problems)[:500]
+            else:
+                self.app.logger.warning(message)
+        return response
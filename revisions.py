@@ -0,0 +1,127 @@
+"""
+Append-only revision history for a pod's itinerary, packing list and budget.
+
+Each save appends one `ArtifactRevision` row.  Most rows hold a zlib-compressed
+line diff against the previous revision; every SNAPSHOT_EVERY-th row (and any
+row whose diff would not be smaller) holds the full text instead.  Rebuilding
+revision N therefore reads one snapshot plus at most SNAPSHOT_EVERY - 1 diffs
+in a single query, however long the history gets.
+"""
+import difflib
+import json
+import zlib
+
+from sqlalchemy import func
+
+from model import db, ArtifactRevision
+
+KINDS = ("itinerary", "packing", "budget")
+SNAPSHOT_EVERY = 20
+
+
+def _lines(text):
+    return (text or "").splitlines(keepends=True)
+
+
+def make_delta(old, new):
+    """Line ops turning `old` into `new`: ["=", i1, i2] copies old[i1:i2], ["+", lines] inserts."""
+    a, b = _lines(old), _lines(new)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", b[j1:j2]])
+    return ops
+
+
+def apply_delta(old, ops):
+    a = _lines(old)
+    out = []
+    for op in ops:
+        out.extend(a[op[1]:op[2]] if op[0] == "=" else op[1])
+    return "".join(out)
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _unpack(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def latest_revision(pod_id, kind):
+    return (
+        db.session.query(func.max(ArtifactRevision.revision))
+        .filter_by(pod_id=pod_id, kind=kind).scalar()
+    ) or 0
+
+
+def record_revision(pod_id, kind, previous_text, text, user_id):
+    """
+    Adds the revision for `text` to the session (the caller commits).
+
+    `previous_text` is the artefact's current content; when it predates the
+    history it is recorded first, so the original is revertible too.
+    """
+    revision = latest_revision(pod_id, kind)
+    if revision == 0 and previous_text:
+        db.session.add(ArtifactRevision(
+            pod_id=pod_id, kind=kind, revision=1, is_snapshot=True, payload=_pack(previous_text),
+        ))
+        revision = 1
+
+    revision += 1
+    snapshot = _pack(text)
+    is_snapshot = (revision - 1) % SNAPSHOT_EVERY == 0
+    payload = snapshot
+    if not is_snapshot:
+        delta = _pack(make_delta(previous_text, text))
+        if len(delta) < len(snapshot):
+            payload = delta
+        else:
+            is_snapshot = True
+
+    row = ArtifactRevision(
+        pod_id=pod_id, kind=kind, revision=revision, is_snapshot=is_snapshot,
+        payload=payload, created_by=user_id,
+    )
+    db.session.add(row)
+    return row
+
+
+def load_revision(pod_id, kind, revision):
+    """Full text of `revision`, or None if it doesn't exist."""
+    base = (
+        db.session.query(func.max(ArtifactRevision.revision))
+        .filter(ArtifactRevision.pod_id == pod_id, ArtifactRevision.kind == kind,
+                ArtifactRevision.is_snapshot.is_(True), ArtifactRevision.revision <= revision)
+        .scalar_subquery()
+    )
+    rows = (
+        ArtifactRevision.query
+        .filter(ArtifactRevision.pod_id == pod_id, ArtifactRevision.kind == kind,
+                ArtifactRevision.revision >= base, ArtifactRevision.revision <= revision)
+        .order_by(ArtifactRevision.revision)
+        .all()
+    )
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    text = None
+    for row in rows:
+        value = _unpack(row.payload)
+        text = value if row.is_snapshot else apply_delta(text, value)
+    return text
+
+
+def list_revisions(pod_id, kind, limit=100):
+    """Newest-first revision metadata (no payloads)."""
+    return (
+        db.session.query(ArtifactRevision.revision, ArtifactRevision.created_by, ArtifactRevision.created_at)
+        .filter_by(pod_id=pod_id, kind=kind)
+        .order_by(ArtifactRevision.revision.desc())
+        .limit(limit)
+        .all()
+    )
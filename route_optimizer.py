@@ -0,0 +1,232 @@
+"""
+Local ordering of each itinerary day's stops.
+
+The itinerary agent decides which places go on which day; this stage only
+reorders the stops within a day so the route is short.  Places are found in
+the day's bullet points by name (data/places.csv, an offline gazetteer),
+distances come from a vectorized haversine matrix cached per set of places,
+and the order is a nearest-neighbour tour improved by 2-opt.  No LLM calls.
+
+Bullets that name no known place (meals, check-in, free time) or are tied to a
+time of day (sunset, dinner, a show) stay where they are; time-of-day labels ("Morning:", "10:00 AM -") stay on their line while
+the stops under them move.
+"""
+import csv
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+import tracing
+
+PLACES_CSV = os.getenv("PLACES_CSV", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "places.csv"))
+EARTH_RADIUS_KM = 6371.0
+
+# Only rewrite a day when it saves at least this much.
+MIN_SAVING_KM = 0.5
+MIN_SAVING_RATIO = 0.05
+
+_DAY = re.compile(r"^\W*day\s*\d+", re.I)
+_BULLET = re.compile(r"^(\s*)([*+\-]|\d+[.)])\s+(.*)$")
+_CLOCK = r"\d{1,2}(?::\d{2})?\s*(?:[AaPp]\.?[Mm]\.?)?"
+_LABEL = re.compile(
+    rf"^((?:\*\*)?(?:{_CLOCK}(?:\s*(?:-|–|to)\s*{_CLOCK})?|[A-Za-z][A-Za-z ()]{{0,20}}?)"
+    r"(?:\*\*)?\s*(?::|-|–)(?:\*\*)?\s+)"
+)
+_TIME_WORD = re.compile(r"\d|morning|afternoon|evening|night|noon|sunrise|sunset", re.I)
+# Stops tied to a time of day keep their slot even when they name a place.
+_PINNED = re.compile(r"sunrise|sunset|night|dinner|breakfast|show|aarti|ceremony|check[- ]?(?:in|out)", re.I)
+
+
+class Gazetteer:
+    """Places with coordinates, plus one compiled regex over all their names."""
+
+    def __init__(self, path):
+        self.names, self.cities, lat, lon = [], [], [], []
+        self.ids_by_name = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                place_id = len(self.names)
+                self.names.append(row["name"])
+                self.cities.append(row["city"])
+                lat.append(float(row["lat"]))
+                lon.append(float(row["lon"]))
+                for name in [row["name"]] + [a for a in (row["aliases"] or "").split("|") if a]:
+                    self.ids_by_name.setdefault(name.lower(), []).append(place_id)
+        self.lat = np.radians(np.array(lat))
+        self.lon = np.radians(np.array(lon))
+        alternation = "|".join(re.escape(n) for n in sorted(self.ids_by_name, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b(?:{alternation})\b", re.I)
+
+    def candidates(self, text):
+        """Place-id lists for each place name in `text`, in order of appearance."""
+        return [self.ids_by_name[m.group(0).lower()] for m in self.pattern.finditer(text)]
+
+
+_gazetteer = None
+
+
+def gazetteer():
+    global _gazetteer
+    if _gazetteer is None:
+        _gazetteer = Gazetteer(PLACES_CSV)
+    return _gazetteer
+
+
+@lru_cache(maxsize=1024)
+def _matrix(ids):
+    places = gazetteer()
+    lat, lon = places.lat[list(ids)], places.lon[list(ids)]
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    matrix = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    matrix.setflags(write=False)
+    return matrix
+
+
+def distance_matrix(place_ids):
+    """Haversine km between the given places (duplicates allowed), rows in the given order."""
+    unique = tuple(sorted(set(place_ids)))
+    position = {p: k for k, p in enumerate(unique)}
+    index = [position[p] for p in place_ids]
+    return _matrix(unique)[np.ix_(index, index)]
+
+
+def path_length(dist, order):
+    return float(sum(dist[a, b] for a, b in zip(order, order[1:])))
+
+
+def solve_path(dist):
+    """Short open path through every stop, starting at stop 0 (nearest neighbour + 2-opt)."""
+    n = len(dist)
+    order, left = [0], set(range(1, n))
+    while left:
+        here = order[-1]
+        nearest = min(left, key=lambda k: dist[here, k])
+        order.append(nearest)
+        left.remove(nearest)
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, n - 1):
+            for k in range(i + 1, n):
+                tail = k + 1 < n
+                before = dist[order[i - 1], order[i]] + (dist[order[k], order[k + 1]] if tail else 0)
+                after = dist[order[i - 1], order[k]] + (dist[order[i], order[k + 1]] if tail else 0)
+                if after < before - 1e-9:
+                    order[i:k + 1] = reversed(order[i:k + 1])
+                    improved = True
+    return order
+
+
+# ========== ITINERARY TEXT ==========
+
+def _split_days(lines):
+    """(start, end) line ranges of each day section."""
+    starts = [k for k, line in enumerate(lines) if _DAY.match(line)]
+    return list(zip(starts, starts[1:] + [len(lines)]))
+
+
+def _blocks(lines, start, end):
+    """Top-level bullets of a day as (first, last) line ranges; sub-bullets belong to their parent."""
+    bullets = [(k, len(m.group(1))) for k in range(start + 1, end) if (m := _BULLET.match(lines[k]))]
+    if not bullets:
+        return []
+    top = min(indent for _, indent in bullets)
+    firsts = [k for k, indent in bullets if indent == top]
+    blocks = []
+    for n, first in enumerate(firsts):
+        last = first
+        limit = firsts[n + 1] if n + 1 < len(firsts) else end
+        for k in range(first + 1, limit):
+            line = lines[k]
+            if not line.strip() or _DAY.match(line) or len(line) - len(line.lstrip()) <= top:
+                break
+            last = k
+        blocks.append((first, last))
+    return blocks
+
+
+def _split_label(line):
+    """(marker + time label, rest of the line) for a bullet line."""
+    m = _BULLET.match(line)
+    head, body = line[:m.start(3)], m.group(3)
+    label = _LABEL.match(body)
+    if label and _TIME_WORD.search(label.group(1)):
+        head, body = head + label.group(1), body[label.end():]
+    return head, body
+
+
+def _resolve(candidates, home_city):
+    places = gazetteer()
+    for ids in candidates:
+        preferred = [p for p in ids if places.cities[p] == home_city]
+        return (preferred or ids)[0]
+    return None
+
+
+def _home_city(lines):
+    # The city most unambiguous place names belong to settles names like "City Palace".
+    places = gazetteer()
+    counts = {}
+    for ids in places.candidates("\n".join(lines)):
+        if len(ids) == 1:
+            city = places.cities[ids[0]]
+            counts[city] = counts.get(city, 0) + 1
+    return max(counts, key=counts.get) if counts else None
+
+
+def optimize_day(lines, start, end, home_city=None):
+    """Reorders the located stops of one day in place; returns km saved (0 if unchanged)."""
+    places = gazetteer()
+    stops = []  # (block, place id)
+    for first, last in _blocks(lines, start, end):
+        body = _split_label(lines[first])[1]
+        if _PINNED.search(body):
+            continue
+        place = _resolve(places.candidates(body), home_city)
+        if place is not None:
+            stops.append(((first, last), place))
+    if len(stops) < 3:
+        return 0.0
+
+    dist = distance_matrix([place for _, place in stops])
+    current = list(range(len(stops)))
+    order = solve_path(dist)
+    saved = path_length(dist, current) - path_length(dist, order)
+    if saved < MIN_SAVING_KM or saved < MIN_SAVING_RATIO * path_length(dist, current):
+        return 0.0
+
+    # Located blocks trade places; their slots (and time labels) stay put.
+    originals = [lines[first:last + 1] for (first, last), _ in stops]
+    rebuilt = {}
+    for slot, pick in zip(stops, order):
+        (first, _), _ = slot
+        head, _ = _split_label(lines[first])
+        moved = originals[pick]
+        rebuilt[slot[0]] = [head + _split_label(moved[0])[1]] + moved[1:]
+    # Blocks can change length, so splice from the bottom up.
+    for (first, last) in sorted(rebuilt, reverse=True):
+        lines[first:last + 1] = rebuilt[(first, last)]
+    return saved
+
+
+@tracing.traced("itinerary.optimize_routes")
+def optimize_itinerary(text):
+    """Itinerary markdown with each day's stops reordered into a short route."""
+    if not text or text.startswith("["):  # agent error strings look like "[Groq API Error] ..."
+        return text
+    lines = text.split("\n")
+    home_city = _home_city(lines)
+    days = _split_days(lines)
+    saved = 0.0
+    # Bottom-up, so a day whose blocks change length doesn't shift the ranges above it.
+    for start, end in reversed(days):
+        saved += optimize_day(lines, start, end, home_city)
+    span = tracing.current_span()
+    span.set("route.days", len(days))
+    span.set("route.km_saved", round(saved, 2))
+    return "\n".join(lines)
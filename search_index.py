@@ -0,0 +1,272 @@
+"""
+Full-text search over pods, itineraries and notes, limited to the user's pods.
+
+One interface, two backends (SEARCH_BACKEND):
+
+    mysql            MATCH ... AGAINST on the FULLTEXT indexes declared in
+                     model.py; MySQL keeps them current on every write.
+    sqlite:<path>    a local SQLite FTS5 index ranked with bm25, updated
+                     incrementally after every commit that adds, changes or
+                     deletes a pod, itinerary or note (whatever route or
+                     script made it).  Fill or repair it with
+                     `python search_index.py rebuild`.
+
+    GET /search?q=kyoto+ramen&limit=20
+
+Queries are split into words and every word must match; the last one also
+matches as a prefix, so results show up while the user is still typing.
+MySQL never indexes stopwords or words shorter than innodb_ft_min_token_size,
+so the mysql backend leaves those out of the query rather than requiring a
+word no row can contain.
+"""
+import abc
+import json
+import re
+import sqlite3
+import sys
+import threading
+
+from flask import abort, jsonify, request, session
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from model import db, Pod, PodItinerary, PodMember, PodNote
+
+KINDS = ("pod", "itinerary", "note")
+MAX_RESULTS = 50
+SNIPPET_CHARS = 160
+
+# InnoDB's defaults (innodb_ft_min_token_size, INFORMATION_SCHEMA.INNODB_FT_DEFAULT_STOPWORD).
+FT_MIN_TOKEN_SIZE = 3
+FT_STOPWORDS = frozenset((
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en", "for", "from", "how", "i", "in",
+    "is", "it", "la", "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "who",
+    "will", "with", "und", "www",
+))
+
+_TAGS = re.compile(r"<[^>]+>")
+_WORD = re.compile(r"\w+", re.U)
+
+
+def plain_text(html):
+    return " ".join(_TAGS.sub(" ", html or "").split())
+
+
+def query_words(q):
+    return _WORD.findall(q or "")[:12]
+
+
+def snippet(text, words):
+    """A SNIPPET_CHARS window of `text` around the first matched word."""
+    lower = text.lower()
+    hits = [lower.find(w.lower()) for w in words]
+    start = max(min([h for h in hits if h >= 0], default=0) - SNIPPET_CHARS // 4, 0)
+    window = text[start:start + SNIPPET_CHARS]
+    return ("…" if start else "") + window + ("…" if start + SNIPPET_CHARS < len(text) else "")
+
+
+def document(obj):
+    """(kind, ref_id, pod_id, title, body) for a searchable row, else None."""
+    if isinstance(obj, Pod):
+        return "pod", obj.id, obj.id, obj.name or "", " ".join(filter(None, (obj.destination, obj.tags, obj.description)))
+    if isinstance(obj, PodItinerary):
+        return "itinerary", obj.id, obj.pod_id, "", plain_text(obj.description)
+    if isinstance(obj, PodNote):
+        return "note", obj.id, obj.pod_id, "", obj.note or ""
+    return None
+
+
+def member_pods(user_id):
+    """{pod_id: name} of the user's pods."""
+    return dict(
+        db.session.query(Pod.id, Pod.name)
+        .join(PodMember, PodMember.pod_id == Pod.id)
+        .filter(PodMember.user_id == user_id)
+        .all()
+    )
+
+
+class SearchIndex(abc.ABC):
+    """Backend interface; `search` returns ranked dicts (kind, pod_id, ref_id, title, snippet, score)."""
+
+    def init_app(self, app):
+        app.add_url_rule("/search", "search", self.search_view)
+
+    @abc.abstractmethod
+    def search(self, user_id, q, limit=20):
+        """Results of `q` in the user's pods, best first, at most `limit`."""
+
+    def search_view(self):
+        if 'user' not in session:
+            abort(401)
+        q = request.args.get("q", "")
+        limit = min(max(request.args.get("limit", 20, type=int), 1), MAX_RESULTS)
+        return jsonify({"query": q, "results": self.search(session['user']['id'], q, limit) if q.strip() else []})
+
+
+# ========== MYSQL FULLTEXT ==========
+
+def boolean_query(words):
+    """
+    AGAINST string requiring every indexable word.  The last word is kept
+    whatever it is: with the truncation operator MySQL matches it as a prefix
+    even if it is short or a stopword.
+    """
+    required = [f"+{w}" for w in words[:-1] if len(w) >= FT_MIN_TOKEN_SIZE and w.lower() not in FT_STOPWORDS]
+    return " ".join(required + [f"+{words[-1]}*"])
+
+
+class MySQLSearchIndex(SearchIndex):
+    def search(self, user_id, q, limit=20):
+        words = query_words(q)
+        if not words:
+            return []
+        against = boolean_query(words)
+        mine = db.session.query(PodMember.pod_id).filter(PodMember.user_id == user_id)
+        sources = (
+            ("pod", Pod.id, Pod.id, (Pod.name, Pod.description, Pod.destination, Pod.tags), Pod.description),
+            ("itinerary", PodItinerary.id, PodItinerary.pod_id, (PodItinerary.description,), PodItinerary.description),
+            ("note", PodNote.id, PodNote.pod_id, (PodNote.note,), PodNote.note),
+        )
+        results = []
+        for kind, ref_id, pod_id, columns, body in sources:
+            score = match(*columns, against=against).in_boolean_mode()
+            rows = (
+                db.session.query(ref_id, pod_id, Pod.name, body, score.label("score"))
+                .join(Pod, Pod.id == pod_id)
+                .filter(score, pod_id.in_(mine))
+                .order_by(score.desc())
+                .limit(limit)
+                .all()
+            )
+            for ref, pod, name, text, rank in rows:
+                results.append({"kind": kind, "pod_id": pod, "ref_id": ref, "title": name,
+                                "snippet": snippet(plain_text(text), words), "score": round(float(rank), 4)})
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:limit]
+
+
+# ========== SQLITE FTS5 ==========
+
+class SQLiteSearchIndex(SearchIndex):
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_docs USING fts5("
+            " kind UNINDEXED, ref_id UNINDEXED, pod_id UNINDEXED, title, body,"
+            " tokenize = 'porter unicode61')"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _rowid(kind, ref_id):
+        # One stable rowid per source row, so updates and deletes are point lookups.
+        return (KINDS.index(kind) + 1) * 10**12 + ref_id
+
+    def init_app(self, app):
+        super().init_app(app)
+        # Flask-SQLAlchemy's sessions subclass Session, so this sees every commit.
+        if not event.contains(Session, "after_flush", self._collect):
+            event.listen(Session, "after_flush", self._collect)
+            event.listen(Session, "after_commit", self._apply)
+            event.listen(Session, "after_soft_rollback", self._discard)
+
+    def _collect(self, sess, flush_context):
+        pending = sess.info.setdefault("search_pending", {})
+        for obj in list(sess.new) + list(sess.dirty):
+            doc = document(obj)
+            if doc:
+                pending[doc[:2]] = doc
+        for obj in sess.deleted:
+            doc = document(obj)
+            if doc:
+                pending[doc[:2]] = None
+
+    def _apply(self, sess):
+        pending = sess.info.pop("search_pending", None)
+        if not pending:
+            return
+        try:
+            self.write(pending.items())
+        except sqlite3.Error as e:
+            print(f"[SEARCH] index update failed: {e}")
+
+    def _discard(self, sess, previous_transaction):
+        sess.info.pop("search_pending", None)
+
+    def write(self, changes):
+        """Applies ((kind, ref_id), document-or-None) changes in one transaction."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            for (kind, ref_id), doc in changes:
+                rowid = self._rowid(kind, ref_id)
+                conn.execute("DELETE FROM search_docs WHERE rowid = ?", (rowid,))
+                if doc:
+                    conn.execute("INSERT INTO search_docs (rowid, kind, ref_id, pod_id, title, body)"
+                                 " VALUES (?, ?, ?, ?, ?, ?)", (rowid, *doc))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rebuild(self, batch_size=1000):
+        """Re-indexes every pod, itinerary and note from the database."""
+        self._conn().execute("DELETE FROM search_docs")
+        for model in (Pod, PodItinerary, PodNote):
+            batch = []
+            for obj in model.query.yield_per(batch_size):
+                doc = document(obj)
+                batch.append((doc[:2], doc))
+                if len(batch) >= batch_size:
+                    self.write(batch)
+                    batch = []
+            self.write(batch)
+        self._conn().execute("INSERT INTO search_docs (search_docs) VALUES ('optimize')")
+
+    def search(self, user_id, q, limit=20):
+        words = query_words(q)
+        pods = member_pods(user_id)
+        if not words or not pods:
+            return []
+        terms = " ".join(f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*'
+        rows = self._conn().execute(
+            "SELECT kind, ref_id, pod_id, snippet(search_docs, 4, '', '', '…', 24),"
+            " bm25(search_docs, 0, 0, 0, 4.0, 1.0) AS score"
+            " FROM search_docs"
+            " WHERE search_docs MATCH ? AND pod_id IN (SELECT value FROM json_each(?))"
+            " ORDER BY score LIMIT ?",
+            (terms, json.dumps(list(pods)), limit),
+        ).fetchall()
+        return [{"kind": kind, "pod_id": pod_id, "ref_id": ref_id, "title": pods.get(pod_id, ""),
+                 "snippet": text, "score": round(-score, 4)}
+                for kind, ref_id, pod_id, text, score in rows]
+
+
+def from_config(spec):
+    """`mysql` or `sqlite:<path>`."""
+    if not spec or spec == "mysql":
+        return MySQLSearchIndex()
+    if spec.startswith("sqlite:"):
+        return SQLiteSearchIndex(spec[len("sqlite:"):])
+    raise ValueError(f"Unknown SEARCH_BACKEND: {spec}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python search_index.py rebuild")
+    from app import app, search
+    if not isinstance(search, SQLiteSearchIndex):
+        sys.exit("SEARCH_BACKEND=mysql is maintained by MySQL itself; nothing to rebuild.")
+    with app.app_context():
+        search.rebuild()
+    print("[SEARCH] index rebuilt")
@@ -0,0 +1,139 @@
+"""
+Speculative precomputation after an itinerary is saved.
+
+Budget and packing requests almost always follow a new or edited itinerary,
+and the budget pipeline starts with a cold itinerary summary.  With SPECULATE
+set, saving an itinerary queues that work on a small background pool:
+
+    SPECULATE=summary                  summarize the itinerary
+    SPECULATE=summary,budget,packing   also draft budget line items and
+                                       fetch the packing destination extras
+
+Results are stored under the job kind and the itinerary's hash, so the
+follow-up click picks them up instead of waiting on the model, and a result
+for an itinerary that has changed since is simply never looked up again.
+They live in a local SQLite table so every worker on the host sees them.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+import usage
+
+KINDS = ("summary", "budget", "packing")
+RESULT_TTL = 6 * 3600
+PENDING_TTL = 300  # a crashed worker's claim expires after this
+
+
+def digest(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class SpeculativeStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS speculative_results ("
+            " key TEXT PRIMARY KEY, value TEXT, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key):
+        """True if no worker has this result (or is computing it) yet."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("DELETE FROM speculative_results WHERE expires_at <= ?", (now,))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO speculative_results (key, expires_at) VALUES (?, ?)",
+            (key, now + PENDING_TTL),
+        )
+        return cur.rowcount == 1
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM speculative_results WHERE key = ? AND value IS NOT NULL AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, value):
+        self._conn().execute(
+            "UPDATE speculative_results SET value = ?, expires_at = ? WHERE key = ?",
+            (json.dumps(value), time.time() + RESULT_TTL, key),
+        )
+
+    def release(self, key):
+        self._conn().execute("DELETE FROM speculative_results WHERE key = ?", (key,))
+
+
+class Speculator:
+    def __init__(self, store, kinds=(), workers=2):
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            raise ValueError(f"Unknown SPECULATE kinds: {', '.join(sorted(unknown))}")
+        self.store = store
+        self.kinds = tuple(kinds)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="speculate") if kinds else None
+
+    @property
+    def enabled(self):
+        return bool(self.kinds)
+
+    def wants(self, kind):
+        return kind in self.kinds
+
+    @staticmethod
+    def key(kind, text):
+        return f"{kind}:{digest(text)}"
+
+    def result(self, kind, text):
+        """The stored result of `kind` for this itinerary text, or None."""
+        if not self.wants(kind) or not text:
+            return None
+        return self.store.get(self.key(kind, text))
+
+    def schedule(self, text, jobs):
+        """
+        Runs `jobs` ([(kind, fn)], in order, in one background task) for this
+        itinerary text.  Kinds that are disabled, already stored or being
+        computed by another worker are skipped; each fn returns a JSON value.
+        """
+        if not self.enabled or not text:
+            return
+        claimed = [(kind, fn) for kind, fn in jobs if self.wants(kind) and self.store.claim(self.key(kind, text))]
+        if claimed:
+            # The pool thread starts from a clean context; only the usage
+            # subject is carried over, so the LLM calls are counted against
+            # the user and pod that saved the itinerary.
+            self._pool.submit(self._run, text, claimed, usage.subject())
+
+    def _run(self, text, jobs, subject):
+        with usage.attributed(*subject):
+            self._run_jobs(text, jobs)
+
+    def _run_jobs(self, text, jobs):
+        for kind, fn in jobs:
+            key = self.key(kind, text)
+            try:
+                with tracing.span("speculate", kind=kind):
+                    value = fn()
+            except Exception as e:
+                print(f"[SPECULATE] {kind} failed: {e}")
+                self.store.release(key)
+                continue
+            if value is None:
+                self.store.release(key)
+            else:
+                self.store.put(key, value)
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import pytest
+
+# The app reads its settings at import time: point it at an in-memory SQLite
+# database and a throwaway session store before importing it.
+_tmp = tempfile.mkdtemp(prefix="travy-tests-")
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["SESSION_DB_PATH"] = os.path.join(_tmp, "sessions.sqlite3")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+
+import app as web  # noqa: E402
+from model import db, User, Pod, PodMember, PodItinerary, PodNote  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    web.app.config.update(TESTING=True)
+    with web.app.app_context():
+        db.create_all()
+    yield web.app
+    with web.app.app_context():
+        db.session.remove()
+        db.drop_all()
+    # The per-worker caches outlive the database.
+    web.panel_cache.clear()
+    web.memberships.invalidate()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id, email):
+    """Logs `client` in as the user, with a token the identity cache already trusts."""
+    token = f"token-{user_id}"
+    with client.session_transaction() as sess:
+        sess["user"] = {"id": user_id, "email": email}
+        sid = sess.sid
+    web.session_store.save_tokens(sid, token, f"refresh-{user_id}", time.time() + 3600)
+    web.identity.remember(token, {"id": user_id, "email": email})
+
+
+@pytest.fixture
+def pod(app):
+    """A pod with two members, an itinerary and a page and a half of notes; returns its id."""
+    with app.app_context():
+        db.session.add_all([
+            User(id="u-1", email="asha@example.com", name="Asha"),
+            User(id="u-2", email="ravi@example.com", name="Ravi"),
+        ])
+        pod = Pod(name="Goa offsite", destination="Panaji, Goa", tags="beach, team",
+                  start_date=date(2026, 12, 1), end_date=date(2026, 12, 4),
+                  invite_code="GOA123", created_by="u-1", estimated_budget=50000)
+        db.session.add(pod)
+        db.session.flush()
+        db.session.add_all([
+            PodMember(user_id="u-1", pod_id=pod.id, role="admin"),
+            PodMember(user_id="u-2", pod_id=pod.id, role="member"),
+            PodItinerary(pod_id=pod.id, description="<p>Day 1: Fort Aguada</p>", created_by="u-1"),
+        ])
+        start = datetime(2026, 11, 1, 9, 0)
+        db.session.add_all([
+            PodNote(pod_id=pod.id, user_id="u-1" if n % 2 else "u-2", note=f"note {n}",
+                    created_at=start + timedelta(minutes=n))
+            for n in range(web.NOTES_PAGE_SIZE + 10)
+        ])
+        db.session.commit()
+        return pod.id
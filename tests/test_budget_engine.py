@@ -0,0 +1,62 @@
+"""
+Line item parsing and the what-if route of budget_engine.
+"""
+import math
+
+import pytest
+
+import budget_engine
+from budget_engine import LineItem
+
+from conftest import login
+
+
+def test_from_dict_keeps_explicit_zero_and_parses_flags():
+    item = LineItem.from_dict({"category": "Food", "quantity": 0, "unit_cost": "250", "per_person": "false"})
+    assert item.quantity == 0
+    assert item.unit_cost == 250
+    assert item.per_person is False
+    assert LineItem.from_dict({"category": "Food"}).quantity == 1
+
+
+@pytest.mark.parametrize("data", [
+    {"category": "Food", "unit_cost": "nan"},
+    {"category": "Food", "quantity": math.inf},
+    {"category": "Food", "per_person": "maybe"},
+    {"category": "Food", "currency": "XYZ"},
+])
+def test_from_dict_rejects_bad_values(data):
+    with pytest.raises(ValueError):
+        LineItem.from_dict(data)
+
+
+def test_compute_rejects_unknown_currency():
+    items = [LineItem.from_dict({"category": "Hotel", "unit_cost": 1000})]
+    assert budget_engine.compute(items, currency="usd")["currency"] == "USD"
+    with pytest.raises(ValueError):
+        budget_engine.compute(items, currency="XYZ")
+
+
+def test_render_html_escapes_descriptions():
+    items = [LineItem.from_dict({"category": "Food", "description": "Thali | dosa <b>", "unit_cost": 300})]
+    html = budget_engine.render_html(items, budget_engine.compute(items))
+    assert "<b>" not in html
+    assert html.count("<tr>") == 4  # two header rows, the item, the Food rollup
+
+
+def test_what_if_route_rejects_bad_parameters(client, pod):
+    login(client, "u-1", "asha@example.com")
+    assert client.get(f"/pod/{pod}/budget/items?currency=USD&scale=Hotel:0.8").status_code == 200
+    for query in ("currency=XYZ", "scale=Hotel:nan", "scale=Hotel:-1", "scale=Spa:0.5", "scale=Hotel:cheap"):
+        assert client.get(f"/pod/{pod}/budget/items?{query}").status_code == 400, query
+
+
+def test_save_route_rejects_bad_travelers_and_version(client, pod):
+    login(client, "u-1", "asha@example.com")
+    items = [{"category": "Hotel", "unit_cost": 2000, "quantity": 3}]
+    for body in ({"travelers": 0}, {"travelers": -2}, {"travelers": 2.5}, {"travelers": "four"},
+                 {"version": -1}, {"version": "latest"}, {"version": True}):
+        assert client.post(f"/pod/{pod}/budget/items", json={"items": items, **body}).status_code == 400, body
+    response = client.post(f"/pod/{pod}/budget/items", json={"items": items, "travelers": 4, "version": 0})
+    assert response.status_code == 200
+    assert response.get_json()["summary"]["travelers"] == 4
@@ -0,0 +1,53 @@
+"""
+@idempotent on async views: replays the first response, and keeps the
+blocking SQLite store off the event loop.
+"""
+import asyncio
+
+from flask import Flask
+
+from idempotency import Idempotency, IdempotencyStore
+
+
+def on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class RecordingStore(IdempotencyStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.on_loop = []
+
+    def claim(self, key):
+        self.on_loop.append(on_event_loop())
+        return super().claim(key)
+
+    def complete(self, *args):
+        self.on_loop.append(on_event_loop())
+        return super().complete(*args)
+
+
+def test_async_view_is_replayed_and_store_stays_off_the_loop(tmp_path):
+    store = RecordingStore(str(tmp_path / "idem.sqlite3"))
+    idempotent = Idempotency(store)
+    app = Flask(__name__)
+    app.secret_key = "test"
+    calls = []
+
+    @app.post("/generate")
+    @idempotent
+    async def generate():
+        calls.append(1)
+        return {"n": len(calls)}, 201
+
+    client = app.test_client()
+    first = client.post("/generate", headers={"Idempotency-Key": "k1"})
+    again = client.post("/generate", headers={"Idempotency-Key": "k1"})
+    assert first.status_code == again.status_code == 201
+    assert again.get_json() == {"n": 1} and again.headers["Idempotent-Replayed"] == "true"
+    assert len(calls) == 1
+    assert store.on_loop and not any(store.on_loop)
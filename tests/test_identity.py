@@ -0,0 +1,67 @@
+"""
+Token verification: a rejection is cached as one, an outage falls back to
+the last verified identity only for a while.
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+from supabase import AuthApiError
+
+from auth import identity as identity_module
+from auth.identity import SupabaseIdentity
+
+USER = {"id": "u-1", "email": "asha@example.com"}
+
+
+class FakeAuth:
+    def __init__(self):
+        self.error = None
+        self.calls = 0
+
+    def get_user(self, token):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return SimpleNamespace(user=SimpleNamespace(id=USER["id"], email=USER["email"]))
+
+
+@pytest.fixture
+def auth():
+    return FakeAuth()
+
+
+@pytest.fixture
+def identity(auth):
+    return SupabaseIdentity(SimpleNamespace(auth=auth), store=None)
+
+
+def expire(identity, token, seconds_ago):
+    key = identity._key(token)
+    identity._cache[key] = (time.monotonic() - seconds_ago, identity._cache[key][1])
+
+
+def test_rejected_token_is_negatively_cached(identity, auth):
+    assert identity.verify("tok") == USER
+    expire(identity, "tok", 1)
+    auth.error = AuthApiError("invalid JWT", 401, "bad_jwt")
+    assert identity.verify("tok") is None
+    auth.error = None
+    assert identity.verify("tok") is None  # still rejected, without asking again
+    assert auth.calls == 2
+
+
+def test_outage_keeps_identity_within_grace(identity, auth):
+    assert identity.verify("tok") == USER
+    expire(identity, "tok", 1)
+    auth.error = ConnectionError("unreachable")
+    assert identity.verify("tok") == USER
+    auth.error = AuthApiError("upstream down", 503, None)
+    assert identity.verify("tok") == USER
+
+
+def test_outage_past_grace_denies(identity, auth):
+    assert identity.verify("tok") == USER
+    expire(identity, "tok", identity_module.STALE_GRACE + 1)
+    auth.error = ConnectionError("unreachable")
+    assert identity.verify("tok") is None
@@ -0,0 +1,42 @@
+"""
+Write-behind notes: stamped when written, and a bad note cannot block the log.
+"""
+import pytest
+
+import app as web
+from model import db, PodNote
+from note_buffer import NoteBuffer, NoteLog
+
+
+@pytest.fixture
+def buffer(app, tmp_path):
+    def touch(pod_id, *panels):
+        if pod_id == 999:
+            raise ValueError("no such pod")
+        web.touch_pod(pod_id, *panels)
+
+    buffer = NoteBuffer(NoteLog(str(tmp_path / "notes.sqlite3")), touch, batch_rows=10)
+    buffer.app = app  # flushed by hand, without the background thread
+    return buffer
+
+
+def test_flush_stamps_notes_when_written(buffer, pod, app):
+    key, queued_at = buffer.add(pod, "u-1", "bring sunscreen")
+    buffer.flush()
+    with app.app_context():
+        note = PodNote.query.filter_by(ingest_key=key).one()
+        assert note.created_at >= queued_at
+
+
+def test_rejected_note_is_dead_lettered(buffer, pod, app):
+    good = buffer.add(pod, "u-1", "first")[0]
+    bad = buffer.add(999, "u-1", "lost pod")[0]
+    later = buffer.add(pod, "u-2", "second")[0]
+    buffer.flush()
+    with app.app_context():
+        stored = {k for (k,) in db.session.query(PodNote.ingest_key).filter(PodNote.ingest_key.isnot(None))}
+    assert stored == {good, later}
+    conn = buffer.log._conn()
+    assert conn.execute("SELECT count(*) FROM pending_notes").fetchone()[0] == 0
+    key, error = conn.execute("SELECT ingest_key, error FROM dead_notes").fetchone()
+    assert key == bad and "no such pod" in error
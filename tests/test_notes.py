@@ -0,0 +1,15 @@
+"""
+Adding a pod note.
+"""
+from model import PodNote
+
+from conftest import login
+
+
+def test_note_author_is_the_logged_in_user(client, pod, app):
+    login(client, "u-2", "ravi@example.com")
+    response = client.post(f"/pods/{pod}/notes", json={"user_id": "u-1", "note": "posing as Asha"})
+    assert response.status_code == 201
+    with app.app_context():
+        note = PodNote.query.get(response.get_json()["id"])
+        assert note.user_id == "u-2"
@@ -0,0 +1,46 @@
+"""
+Trip facts and the deterministic packing list.
+"""
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from packing_rules import build, trip_facts
+
+
+def profile(health="", allergies=""):
+    return SimpleNamespace(health_conditions=health, allergies=allergies)
+
+
+@pytest.mark.parametrize("text", [
+    "We may skip the museum; bring skincare",
+    "A tentative plan around the campus",
+])
+def test_keywords_do_not_match_inside_longer_words(text):
+    assert trip_facts(text=text).activities == set()
+
+
+def test_health_and_allergy_keywords_match_whole_words():
+    facts = trip_facts(profiles=[profile("BPD", "beef")])
+    assert facts.health == set() and facts.allergies == set()
+    packing = build(facts)
+    assert "Epinephrine auto-injector (if prescribed)" not in packing["Health & Medical"]
+    assert "Blood pressure medication" not in packing["Health & Medical"]
+
+
+def test_stems_and_inflections_match():
+    facts = trip_facts(text="Trekking to the temples, then camping", profiles=[profile("Diabetic, high BP", "bees")])
+    assert facts.activities == {"trek", "worship", "camping"}
+    assert facts.health == {"diabetes", "blood_pressure"}
+    assert facts.allergies == {"insect"}
+
+
+def test_build_follows_climate_and_length():
+    facts = trip_facts("Leh, Ladakh", date(2026, 6, 1), date(2026, 6, 10), profiles=[profile("none", "n/a")])
+    packing = build(facts)
+    assert facts.climates == {"cold"} and facts.season == "monsoon" and not facts.has_medical_notes
+    assert "Thermal innerwear" in packing["Clothing"]
+    assert "Rain jacket or poncho" in packing["Clothing"]  # rain still applies somewhere cold
+    assert "Travel-size laundry detergent" in packing["Toiletries"]
+    assert "T-shirts / tops x7" in packing["Clothing"]
@@ -0,0 +1,61 @@
+"""
+@pod_access: members only, with the per-worker membership cache kept in step
+with joins and removals.
+"""
+from model import db, PodMember
+from pod_access import memberships
+
+from conftest import login
+
+
+def panel(client, pod, **headers):
+    return client.get(f"/pod/{pod}/panel/details", headers=headers)
+
+
+def test_anonymous_users_are_sent_to_login(client, pod):
+    assert panel(client, pod).status_code == 302
+    assert panel(client, pod, **{"X-Requested-With": "fetch"}).status_code == 401
+
+
+def test_members_get_in_and_others_get_403(client, pod):
+    login(client, "u-3", "meera@example.com")
+    assert panel(client, pod).status_code == 403
+    login(client, "u-2", "ravi@example.com")
+    assert panel(client, pod).status_code == 200
+
+
+def test_joining_applies_at_once(client, pod):
+    login(client, "u-3", "meera@example.com")
+    assert panel(client, pod).status_code == 403  # a refusal is never cached
+    assert client.post("/join_pod", data={"invite_code": "GOA123"}).status_code == 302
+    assert panel(client, pod).status_code == 200
+
+
+def test_removed_member_loses_access_within_the_ttl(client, pod, app):
+    login(client, "u-2", "ravi@example.com")
+    assert panel(client, pod).status_code == 200
+    assert memberships.cached("u-2", pod) == "member"
+    with app.app_context():
+        db.session.delete(PodMember.query.filter_by(user_id="u-2", pod_id=pod).one())
+        db.session.commit()
+    assert memberships.cached("u-2", pod) is None
+    assert panel(client, pod).status_code == 403
+
+
+def test_role_change_applies_at_once(client, pod, app):
+    login(client, "u-2", "ravi@example.com")
+    assert panel(client, pod).status_code == 200
+    with app.app_context():
+        PodMember.query.filter_by(user_id="u-2", pod_id=pod).one().role = "admin"
+        db.session.commit()
+        assert memberships.role("u-2", pod) == "admin"
+
+
+def test_rolled_back_removal_keeps_the_cache(client, pod, app):
+    login(client, "u-2", "ravi@example.com")
+    assert panel(client, pod).status_code == 200
+    with app.app_context():
+        db.session.delete(PodMember.query.filter_by(user_id="u-2", pod_id=pod).one())
+        db.session.flush()
+        db.session.rollback()
+    assert memberships.cached("u-2", pod) == "member"
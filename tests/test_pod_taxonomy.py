@@ -0,0 +1,52 @@
+"""
+Normalized pod tags and destinations, and the filters built on them.
+"""
+from datetime import date
+
+import pytest
+
+import pod_taxonomy
+from model import db, Pod, PodDestination, PodTag
+
+
+def make_pod(name, destination, tags):
+    pod = Pod(name=name, destination=destination, tags=tags, start_date=date(2026, 12, 1),
+              end_date=date(2026, 12, 4), invite_code=name[:6].upper(), created_by="u-1")
+    db.session.add(pod)
+    pod_taxonomy.sync(pod)
+    db.session.commit()
+    return pod.id
+
+
+@pytest.fixture
+def pods(app):
+    with app.app_context():
+        yield {
+            "goa": make_pod("Goa offsite", "Panaji, Goa", "Beach;  #Team-Outing, beach"),
+            "trek": make_pod("Hampta trek", "Manali / Spiti", "Trek, #Adventure , road-trip"),
+            "north_goa": make_pod("Calangute weekend", "Calangute and Goa", "beach, party"),
+        }
+
+
+def test_sync_normalizes_tags_and_places(pods):
+    tags = {t for (t,) in db.session.query(PodTag.tag).filter_by(pod_id=pods["trek"])}
+    places = {p for (p,) in db.session.query(PodDestination.place).filter_by(pod_id=pods["trek"])}
+    assert tags == {"trek", "adventure", "road trip"}
+    assert places == {"manali", "spiti"}
+    assert {t for (t,) in db.session.query(PodTag.tag).filter_by(pod_id=pods["goa"])} == {"beach", "team outing"}
+
+
+def test_sync_rewrites_rows_when_the_pod_changes(pods):
+    pod = db.session.get(Pod, pods["goa"])
+    pod.tags = "Food"
+    pod_taxonomy.sync(pod)
+    db.session.commit()
+    assert [t for (t,) in db.session.query(PodTag.tag).filter_by(pod_id=pod.id)] == ["food"]
+
+
+def test_filters_use_the_normalized_rows(pods):
+    assert {p.id for p in pod_taxonomy.pods_tagged("BEACH")} == {pods["goa"], pods["north_goa"]}
+    assert {p.id for p in pod_taxonomy.pods_tagged("beach", "party", match_all=True)} == {pods["north_goa"]}
+    assert {p.id for p in pod_taxonomy.pods_going_to("Manali, Himachal")} == {pods["trek"]}
+    related = pod_taxonomy.related_pod_ids(pods["goa"])
+    assert related == [(pods["north_goa"], pod_taxonomy.DESTINATION_WEIGHT + 1)]
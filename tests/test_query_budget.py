@@ -0,0 +1,92 @@
+"""
+The @query_budget routes stay within their budgets.  Under app.testing a
+breach raises QueryBudgetExceeded out of the request, failing the test.
+"""
+import pytest
+from flask import Flask
+
+from query_budget import QueryBudget, QueryBudgetExceeded, query_budget
+from model import db, PodNote
+
+from conftest import login
+
+
+@pytest.fixture
+def member(client, pod):
+    login(client, "u-1", "asha@example.com")
+    return client
+
+
+@pytest.mark.parametrize("path", [
+    "/pod/{pod}",
+    "/pod/{pod}/panel/details",
+    "/pod/{pod}/panel/members",
+    "/pod/{pod}/panel/itinerary",
+    "/pod/{pod}/panel/packing",
+    "/pod/{pod}/panel/budget",
+    "/pod/{pod}/panel/notes",
+    "/pods/{pod}/notes",
+    "/dashboard",
+    "/profile",
+    "/display",
+])
+def test_budgeted_routes_stay_within_budget(member, pod, path):
+    response = member.get(path.format(pod=pod))
+    assert response.status_code == 200
+    assert "queries" in response.headers["Server-Timing"]
+
+
+def test_notes_pages_stay_within_budget(member, pod):
+    first = member.get(f"/pods/{pod}/notes").get_json()
+    older = member.get(f"/pods/{pod}/notes", query_string={"before": first["cursor"]}).get_json()
+    assert first["count"] + older["count"] == 30
+
+
+def test_view_profile_stays_within_budget(member, pod):
+    assert member.get("/user/u-2").status_code == 200
+
+
+def make_app(strict=False, testing=False):
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI="sqlite://", TESTING=testing)
+    db.init_app(app)
+    QueryBudget(app, strict=strict)
+
+    @app.route("/two")
+    @query_budget(1)
+    def two():
+        PodNote.query.count()
+        PodNote.query.first()
+        return "ok"
+
+    @app.route("/loop")
+    def loop():
+        for pod_id in range(6):
+            PodNote.query.filter_by(pod_id=pod_id).count()
+        return "ok"
+
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_over_budget_raises_under_testing():
+    with pytest.raises(QueryBudgetExceeded, match="2 queries, budget is 1"):
+        make_app(testing=True).test_client().get("/two")
+
+
+def test_repeated_statement_raises_under_testing():
+    with pytest.raises(QueryBudgetExceeded, match="possible N\\+1"):
+        make_app(testing=True).test_client().get("/loop")
+
+
+def test_strict_mode_flags_the_response_instead_of_failing_it():
+    response = make_app(strict=True).test_client().get("/two")
+    assert response.status_code == 200
+    assert "budget is 1" in response.headers["X-Query-Budget-Exceeded"]
+
+
+def test_default_mode_only_logs():
+    response = make_app().test_client().get("/two")
+    assert response.status_code == 200
+    assert "X-Query-Budget-Exceeded" not in response.headers
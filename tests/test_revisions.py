@@ -0,0 +1,67 @@
+"""
+Artefact history and optimistic locking: every revision rebuilds exactly
+across snapshot boundaries, and a stale or racing save is a 409.
+"""
+import pytest
+from sqlalchemy import text
+
+import app as web
+import revisions
+from model import db, ArtifactRevision, PodBudget
+
+from conftest import login
+
+
+def version_text(n):
+    # Long enough that a one-line change is stored as a diff rather than in full.
+    lines = [f"Day {d}: {place} at {d + 8}:00, lunch near the {place.lower()} market, back by sunset"
+             for d in range(1, 31) for place in ("Fort Aguada", "Old Goa", "Anjuna")]
+    lines[n % len(lines)] = f"Day {n}: revised in save {n}"
+    return "\n".join(lines) + "\n"
+
+
+def test_history_round_trips_across_snapshots(app, pod):
+    saves = 2 * revisions.SNAPSHOT_EVERY + 5
+    with app.app_context():
+        for n in range(1, saves + 1):
+            web.save_artifact("itinerary", pod, version_text(n), "u-1")
+        # The fixture's itinerary predates the history and is revision 1.
+        assert revisions.load_revision(pod, "itinerary", 1) == "<p>Day 1: Fort Aguada</p>"
+        for n in range(1, saves + 1):
+            assert revisions.load_revision(pod, "itinerary", n + 1) == version_text(n)
+        snapshots = [r for (r,) in db.session.query(ArtifactRevision.revision)
+                     .filter_by(pod_id=pod, kind="itinerary", is_snapshot=True).order_by(ArtifactRevision.revision)]
+        # 2 replaces the one-line original outright, so storing it whole is smaller than a diff.
+        assert snapshots == [1, 2, 21, 41]
+        assert revisions.load_revision(pod, "itinerary", saves + 2) is None
+
+
+def test_stale_version_is_a_409(client, pod, app):
+    login(client, "u-1", "asha@example.com")
+    headers = {"X-Requested-With": "fetch"}
+    first = client.post(f"/pod/{pod}/budget/edit", data={"description": "Hotel 4000", "version": 0}, headers=headers)
+    assert first.status_code < 400
+    stale = client.post(f"/pod/{pod}/budget/edit", data={"description": "Hotel 5000", "version": 0}, headers=headers)
+    assert stale.status_code == 409
+    body = stale.get_json()
+    assert (body["kind"], body["version"], body["description"]) == ("budget", 1, "Hotel 4000")
+
+
+def test_racing_save_is_a_conflict(app, pod, monkeypatch):
+    with app.app_context():
+        web.save_artifact("budget", pod, "Hotel 4000", "u-1")
+        record = revisions.record_revision
+
+        def concurrent_save(*args):
+            # Another writer commits between our version check and our UPDATE.
+            db.session.execute(text("UPDATE pod_budgets SET row_version = row_version + 1, description = 'theirs'"
+                                    " WHERE pod_id = :pod"), {"pod": pod})
+            return record(*args)
+
+        monkeypatch.setattr(revisions, "record_revision", concurrent_save)
+        with pytest.raises(web.EditConflict) as conflict:
+            web.save_artifact("budget", pod, "Hotel 5000", "u-1", expected_version=1)
+        # With one in-memory connection, the rollback also undoes the other writer's UPDATE.
+        assert conflict.value.version == 1
+        assert PodBudget.query.filter_by(pod_id=pod).one().description == "Hotel 4000"
+        assert revisions.latest_revision(pod, "budget") == 1
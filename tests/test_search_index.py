@@ -0,0 +1,53 @@
+"""
+Full-text search: the MySQL boolean query, the SQLite FTS5 backend and the
+/search route.
+"""
+import pytest
+from flask import Flask
+
+from model import db, PodNote
+from search_index import SearchIndex, SQLiteSearchIndex, boolean_query, query_words
+
+
+def test_boolean_query_drops_words_mysql_never_indexes():
+    assert boolean_query(query_words("the best of goa")) == "+best +goa*"
+    assert boolean_query(query_words("ramen in kyoto")) == "+ramen +kyoto*"
+    assert boolean_query(query_words("go to")) == "+to*"  # the prefix term is kept, whatever it is
+
+
+@pytest.fixture
+def index(app, pod, tmp_path):
+    index = SQLiteSearchIndex(str(tmp_path / "search.sqlite3"))
+    with app.app_context():
+        db.session.add(PodNote(pod_id=pod, user_id="u-1", note="Book the Dudhsagar waterfall jeep early"))
+        db.session.commit()
+        index.rebuild()
+    return index
+
+
+def test_sqlite_backend_finds_members_documents(index, pod, app):
+    with app.app_context():
+        results = index.search("u-1", "dudhsagar water")
+        assert [(r["kind"], r["pod_id"]) for r in results] == [("note", pod)]
+        assert "waterfall" in results[0]["snippet"]
+        assert index.search("u-1", "fort")[0]["kind"] == "itinerary"
+        assert index.search("u-3", "dudhsagar") == []  # not a member
+
+
+class RecordingIndex(SearchIndex):
+    def search(self, user_id, q, limit=20):
+        self.limit = limit
+        return []
+
+
+@pytest.mark.parametrize("query, expected", [("", 20), ("&limit=-5", 1), ("&limit=0", 1), ("&limit=500", 50)])
+def test_search_route_clamps_limit(query, expected):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    index = RecordingIndex()
+    index.init_app(app)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"id": "u-1"}
+    assert client.get(f"/search?q=goa{query}").status_code == 200
+    assert index.limit == expected
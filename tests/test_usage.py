@@ -0,0 +1,20 @@
+"""
+Flushing LLM usage counts adds onto the day's row instead of duplicating it.
+"""
+import usage
+from model import db, LLMUsage
+
+import app as web
+
+
+def test_flush_upserts_counts(app):
+    body = {"model": "llama", "usage": {"prompt_tokens": 100, "completion_tokens": 20}}
+    with usage.attributed("u-1", 7):
+        usage.record(body)
+        web.llm_usage.flush()
+        usage.record(body)
+        usage.record(body)
+        web.llm_usage.flush()
+    with app.app_context():
+        row = db.session.query(LLMUsage).filter_by(user_id="u-1", pod_id=7).one()
+        assert (row.calls, row.prompt_tokens, row.completion_tokens) == (3, 300, 60)
@@ -0,0 +1,260 @@
+"""
+Lightweight tracing: nested spans for routes, agent steps, graph nodes, LLM
+and tool calls, exported as JSON lines or OTLP/HTTP JSON.
+
+    TRACE_EXPORT=file:traces.jsonl           one span per line
+    TRACE_EXPORT=otlp:http://localhost:4318  batched POSTs to /v1/traces
+
+With TRACE_EXPORT unset every helper here is a no-op.  The current span is
+kept in a contextvar, so spans nest across `await`s, `asyncio.to_thread` and
+LangGraph's node executors without passing anything around.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("current_span", default=None)
+_exporter = None
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {k: v for k, v in (attributes or {}).items() if v is not None}
+        self.error = None
+
+    def set(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    def set(self, key, value):
+        pass
+
+
+NOOP = _NoopSpan()
+
+
+def enabled():
+    return _exporter is not None
+
+
+def current_span():
+    return _current.get() or NOOP
+
+
+def start_span(name, **attributes):
+    """Starts a child of the current span and makes it current; pair with end_span."""
+    if _exporter is None:
+        return None, None
+    span = Span(name, _current.get(), attributes)
+    return span, _current.set(span)
+
+
+def end_span(span, token, error=None):
+    if span is None:
+        return
+    span.end_ns = time.time_ns()
+    if error is not None:
+        span.error = repr(error)
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Ended from another context (e.g. a Flask teardown in a different task).
+        _current.set(None)
+    _exporter.export(span)
+
+
+@contextmanager
+def span(name, **attributes):
+    current, token = start_span(name, **attributes)
+    if current is None:
+        yield NOOP
+        return
+    try:
+        yield current
+    except BaseException as e:
+        end_span(current, token, e)
+        raise
+    end_span(current, token)
+
+
+def traced(name, **attributes):
+    """Decorator running each call of a (sync or async) function in a span."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(target, data):
+    """Copies the token counts of an OpenAI-style completion body onto `target`."""
+    usage = data.get("usage") if isinstance(data, dict) else None
+    if not usage:
+        return
+    target.set("llm.model", data.get("model"))
+    target.set("llm.prompt_tokens", usage.get("prompt_tokens"))
+    target.set("llm.completion_tokens", usage.get("completion_tokens"))
+    target.set("llm.total_tokens", usage.get("total_tokens"))
+
+
+# ========== EXPORTERS ==========
+
+class FileExporter:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OTLPExporter:
+    """Batches spans to an OTLP/HTTP collector (JSON encoding) from a background thread."""
+
+    BATCH_SIZE = 256
+    FLUSH_SECONDS = 2
+
+    def __init__(self, endpoint, service="travelpods"):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service = service
+        self._queue = queue.Queue(maxsize=10000)
+        threading.Thread(target=self._run, name="otlp-exporter", daemon=True).start()
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # never block a request on tracing
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.FLUSH_SECONDS
+            while len(batch) < self.BATCH_SIZE and time.monotonic() < deadline:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._post(batch)
+            except Exception as e:
+                print(f"[TRACE] export failed: {e}")
+
+    def _attr(self, key, value):
+        if isinstance(value, bool):
+            v = {"boolValue": value}
+        elif isinstance(value, int):
+            v = {"intValue": str(value)}
+        elif isinstance(value, float):
+            v = {"doubleValue": value}
+        else:
+            v = {"stringValue": str(value)}
+        return {"key": key, "value": v}
+
+    def _post(self, batch):
+        spans = [{
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": s.parent_id or "",
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [self._attr(k, v) for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        } for s in batch]
+        body = {"resourceSpans": [{
+            "resource": {"attributes": [self._attr("service.name", self.service)]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": spans}],
+        }]}
+        req = urllib.request.Request(self.url, data=json.dumps(body).encode(),
+                                     headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(req, timeout=5).close()
+
+
+def configure(spec):
+    """`file:<path>`, `otlp:<endpoint>`, or None to turn tracing off."""
+    global _exporter
+    if not spec:
+        _exporter = None
+    elif spec.startswith("file:"):
+        _exporter = FileExporter(spec[len("file:"):])
+    elif spec.startswith("otlp:"):
+        _exporter = OTLPExporter(spec[len("otlp:"):])
+    else:
+        raise ValueError(f"Unknown TRACE_EXPORT: {spec}")
+
+
+configure(os.getenv("TRACE_EXPORT"))
+
+
+# ========== FLASK ==========
+
+def init_app(app):
+    """One root span per request, named after the matched route."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_span():
+        if _exporter is None:
+            return
+        rule = request.url_rule.rule if request.url_rule else request.path
+        g._trace = start_span(
+            f"{request.method} {rule}",
+            **{"http.method": request.method, "http.route": rule,
+               "pod.id": (request.view_args or {}).get("pod_id")},
+        )
+
+    @app.after_request
+    def _tag_status(response):
+        trace = g.get("_trace")
+        if trace and trace[0] is not None:
+            trace[0].set("http.status_code", response.status_code)
+        return response
+
+    @app.teardown_request
+    def _end_request_span(exc=None):
+        trace = g.pop("_trace", None)
+        if trace:
+            end_span(*trace, error=exc)
@@ -0,0 +1,316 @@
+"""
+LLM token accounting, quotas and usage reports.
+
+Every Groq response passing through the agents' transports (agent/cassette.py)
+is counted against the current user and pod, taken from the request (or set
+with `attributed()` in background jobs and the batch CLI).  Counts are
+buffered in memory and upserted into `llm_usage`, one row per day, user, pod
+and model, every FLUSH_SECONDS from a background thread.
+
+`@llm_quota` on a route checks today's tokens before any LLM call: past the
+soft limit the response carries an X-LLM-Usage-Warning header, past the hard
+limit QuotaExceeded is raised (the app answers 429).  Limits are per user and
+per pod, in tokens per UTC day; 0 disables a limit.
+
+    GET /usage                  the user's usage and cost by day and by pod
+    GET /pod/<pod_id>/usage     a pod's usage by member (members only)
+"""
+import asyncio
+import atexit
+import contextvars
+import inspect
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import abort, g, jsonify, request, session
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects import mysql, sqlite
+
+from model import db, LLMUsage
+from pod_access import memberships
+
+FLUSH_SECONDS = 5
+FLUSH_KEYS = 500          # flush early when this many (day, user, pod, model) rows are pending
+
+# USD per million (prompt, completion) tokens, for the report.
+PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "gemma2-9b-it": (0.20, 0.20),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
+_subject = contextvars.ContextVar("llm_usage_subject", default=("", 0))
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, scope, used, limit):
+        super().__init__(f"Daily AI quota for this {scope} reached ({used:,} of {limit:,} tokens).")
+        self.scope = scope
+        self.used = used
+        self.limit = limit
+
+
+def _today():
+    return datetime.utcnow().date()
+
+
+def cost(model, prompt_tokens, completion_tokens):
+    prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def subject():
+    """(user_id, pod_id) the current LLM calls are counted against."""
+    return _subject.get()
+
+
+@contextmanager
+def attributed(user_id, pod_id=None):
+    """Counts LLM calls made inside the block against this user and pod."""
+    token = _subject.set((user_id or "", pod_id or 0))
+    try:
+        yield
+    finally:
+        _subject.reset(token)
+
+
+class UsageBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = defaultdict(lambda: [0, 0, 0])  # (day, user, pod, model) -> calls, prompt, completion
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, key, calls, prompt_tokens, completion_tokens):
+        with self._lock:
+            row = self._rows[key]
+            row[0] += calls
+            row[1] += prompt_tokens
+            row[2] += completion_tokens
+
+    def drain(self):
+        with self._lock:
+            rows, self._rows = self._rows, defaultdict(lambda: [0, 0, 0])
+        return rows
+
+    def pending(self, day, user_id, pod_id):
+        """Unflushed (user tokens, pod tokens) for `day`."""
+        user_tokens = pod_tokens = 0
+        with self._lock:
+            for (d, user, pod, _), (_, prompt, completion) in self._rows.items():
+                if d == day:
+                    user_tokens += prompt + completion if user == user_id else 0
+                    pod_tokens += prompt + completion if pod_id and pod == pod_id else 0
+        return user_tokens, pod_tokens
+
+
+_buffer = UsageBuffer()
+_wakeup = threading.Event()
+
+
+def record(data):
+    """Counts one OpenAI-style completion body against the current subject."""
+    usage = data.get("usage") if isinstance(data, dict) else None
+    if not usage:
+        return
+    user_id, pod_id = _subject.get()
+    _buffer.add((_today(), user_id, pod_id, data.get("model") or ""), 1,
+                int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0))
+    if len(_buffer) >= FLUSH_KEYS:
+        _wakeup.set()
+
+
+def _upsert(dialect, values):
+    """INSERT of `values` adding onto existing rows: MySQL in production, SQLite in tests and dev."""
+    table = LLMUsage.__table__
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table).values(values)
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.user_id, table.c.pod_id, table.c.model],
+            set_={
+                "calls": table.c.calls + stmt.excluded.calls,
+                "prompt_tokens": table.c.prompt_tokens + stmt.excluded.prompt_tokens,
+                "completion_tokens": table.c.completion_tokens + stmt.excluded.completion_tokens,
+            },
+        )
+    stmt = mysql.insert(table).values(values)
+    return stmt.on_duplicate_key_update(
+        calls=table.c.calls + stmt.inserted.calls,
+        prompt_tokens=table.c.prompt_tokens + stmt.inserted.prompt_tokens,
+        completion_tokens=table.c.completion_tokens + stmt.inserted.completion_tokens,
+    )
+
+
+class Usage:
+    def __init__(self, app=None, user_soft=0, user_hard=0, pod_soft=0, pod_hard=0):
+        self.limits = {"user": (user_soft, user_hard), "pod": (pod_soft, pod_hard)}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.before_request(self._attribute_request)
+        app.teardown_request(self._end_request)
+        app.after_request(self._warn)
+        app.add_url_rule("/usage", "usage_report", self.user_report)
+        app.add_url_rule("/pod/<int:pod_id>/usage", "pod_usage_report", self.pod_report)
+        threading.Thread(target=self._run, name="llm-usage-flush", daemon=True).start()
+        atexit.register(self.flush)
+
+    # ========== ATTRIBUTION ==========
+
+    def _attribute_request(self):
+        user_id = session.get("user", {}).get("id", "")
+        g._usage_token = _subject.set((user_id, (request.view_args or {}).get("pod_id") or 0))
+
+    def _end_request(self, exc=None):
+        token = g.pop("_usage_token", None)
+        if token is not None:
+            try:
+                _subject.reset(token)
+            except ValueError:
+                _subject.set(("", 0))
+
+    # ========== FLUSHING ==========
+
+    def _run(self):
+        while True:
+            _wakeup.wait(FLUSH_SECONDS)
+            _wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[USAGE] flush failed: {e}")
+
+    def flush(self):
+        rows = _buffer.drain()
+        if not rows:
+            return
+        values = [
+            {"day": day, "user_id": user, "pod_id": pod, "model": model,
+             "calls": calls, "prompt_tokens": prompt, "completion_tokens": completion}
+            for (day, user, pod, model), (calls, prompt, completion) in rows.items()
+        ]
+        try:
+            with self.app.app_context(), db.engine.begin() as conn:
+                conn.execute(_upsert(conn.dialect.name, values))
+        except Exception:
+            # Keep the counts for the next attempt.
+            for key, (calls, prompt, completion) in rows.items():
+                _buffer.add(key, calls, prompt, completion)
+            raise
+
+    # ========== QUOTAS ==========
+
+    def used_today(self, user_id, pod_id):
+        day = _today()
+        tokens = LLMUsage.prompt_tokens + LLMUsage.completion_tokens
+        user_tokens, pod_tokens = db.session.query(
+            func.coalesce(func.sum(case((LLMUsage.user_id == user_id, tokens), else_=0)), 0),
+            func.coalesce(func.sum(case((LLMUsage.pod_id == (pod_id or -1), tokens), else_=0)), 0),
+        ).filter(LLMUsage.day == day, or_(LLMUsage.user_id == user_id, LLMUsage.pod_id == (pod_id or -1))).one()
+        pending_user, pending_pod = _buffer.pending(day, user_id, pod_id)
+        return {"user": int(user_tokens) + pending_user, "pod": int(pod_tokens) + pending_pod}
+
+    def check(self, user_id, pod_id=None):
+        """Raises QuotaExceeded past a hard limit; returns the scopes past their soft limit."""
+        used = self.used_today(user_id, pod_id)
+        warnings = []
+        for scope, (soft, hard) in self.limits.items():
+            if scope == "pod" and not pod_id:
+                continue
+            if hard and used[scope] >= hard:
+                raise QuotaExceeded(scope, used[scope], hard)
+            if soft and used[scope] >= soft:
+                warnings.append(f"{scope} {used[scope]}/{soft}")
+        return warnings
+
+    def quota(self, view):
+        """Route decorator enforcing the quotas before the view (and its LLM calls) runs."""
+        def before():
+            user_id = session.get("user", {}).get("id")
+            if user_id and any(hard or soft for soft, hard in self.limits.values()):
+                g._usage_warnings = self.check(user_id, (request.view_args or {}).get("pod_id"))
+
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                await asyncio.to_thread(before)  # blocking DB read, like the views' run_db
+                return await view(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            before()
+            return view(*args, **kwargs)
+        return wrapper
+
+    def _warn(self, response):
+        warnings = g.pop("_usage_warnings", None)
+        if warnings:
+            response.headers["X-LLM-Usage-Warning"] = "; ".join(warnings)
+        return response
+
+    # ========== REPORTS ==========
+
+    def _rows(self, since, *criteria, group_by):
+        self.flush()
+        return (
+            db.session.query(*group_by, LLMUsage.model, func.sum(LLMUsage.calls),
+                             func.sum(LLMUsage.prompt_tokens), func.sum(LLMUsage.completion_tokens))
+            .filter(LLMUsage.day >= since, *criteria)
+            .group_by(*group_by, LLMUsage.model)
+            .all()
+        )
+
+    @staticmethod
+    def _rollup(rows, key):
+        totals = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+        for row in rows:
+            model, calls, prompt, completion = row[-4:]
+            entry = totals[key(row)]
+            entry["calls"] += int(calls)
+            entry["prompt_tokens"] += int(prompt)
+            entry["completion_tokens"] += int(completion)
+            entry["cost_usd"] = round(entry["cost_usd"] + cost(model, int(prompt), int(completion)), 6)
+        return totals
+
+    def user_report(self):
+        if 'user' not in session:
+            abort(401)
+        user_id = session['user']['id']
+        since = _today() - timedelta(days=request.args.get("days", 30, type=int) - 1)
+        rows = self._rows(since, LLMUsage.user_id == user_id, group_by=(LLMUsage.day, LLMUsage.pod_id))
+        by_day = self._rollup(rows, lambda r: r[0].isoformat())
+        by_pod = self._rollup(rows, lambda r: r[1] or None)
+        used = self.used_today(user_id, None)["user"]
+        soft, hard = self.limits["user"]
+        return jsonify({
+            "since": since.isoformat(),
+            "today": {"tokens": used, "soft_limit": soft or None, "hard_limit": hard or None},
+            "total": self._rollup(rows, lambda r: "total")["total"],
+            "by_day": [{"day": day, **v} for day, v in sorted(by_day.items())],
+            "by_pod": [{"pod_id": pod, **v} for pod, v in by_pod.items()],
+        })
+
+    def pod_report(self, pod_id):
+        if 'user' not in session:
+            abort(401)
+        if memberships.role(session['user']['id'], pod_id) is None:
+            abort(403)
+        since = _today() - timedelta(days=request.args.get("days", 30, type=int) - 1)
+        rows = self._rows(since, LLMUsage.pod_id == pod_id, group_by=(LLMUsage.user_id,))
+        by_user = self._rollup(rows, lambda r: r[0] or None)
+        soft, hard = self.limits["pod"]
+        return jsonify({
+            "pod_id": pod_id,
+            "since": since.isoformat(),
+            "today": {"tokens": self.used_today("", pod_id)["pod"], "soft_limit": soft or None,
+                      "hard_limit": hard or None},
+            "total": self._rollup(rows, lambda r: "total")["total"],
+            "by_user": [{"user_id": user, **v} for user, v in by_user.items()],
+        })